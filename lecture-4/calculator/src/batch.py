@@ -0,0 +1,248 @@
+"""
+電卓の計算を配列・CSV の列にまとめて適用する
+
+engine の式（sin などの関数や x * 2 + 1 のような式）を、要素ごとに NumPy で計算する。
+意味は電卓と同じにする。
+
+- sin cos tan は度数法
+- 0 での除算や定義域の外（log(0), √-1 など）の要素は、例外にせずマスクする
+  （numpy.ma.MaskedArray。format_batch では "Error" になる）
+- format_batch は format_number と同じく、整数になる値を int の形で表示する
+
+NumPy は任意の依存で、ないときは engine で1要素ずつ計算する（結果はリストで、
+エラーの要素は None）。
+
+使い方:
+    python batch.py data.csv "sin(angle) * 2" [--column result] [--output out.csv]
+"""
+import argparse
+import csv
+import sys
+
+from engine import (BinOp, Call, CalcError, Num, Var, compile_expression, fold,
+                    format_result, parse)
+
+try:
+    import numpy as np
+except ImportError:  # 任意の依存
+    np = None
+
+
+# ---- NumPy での要素ごとの計算 ----
+# どれも (値, マスク) を返す。マスクが True の要素は計算できなかったもの
+
+def _sin(x):
+    return np.sin(np.radians(x)), np.isinf(x)
+
+
+def _cos(x):
+    return np.cos(np.radians(x)), np.isinf(x)
+
+
+def _tan(x):
+    return np.tan(np.radians(x)), np.isinf(x)
+
+
+def _log(x):
+    return np.log10(x), x <= 0
+
+
+def _ln(x):
+    return np.log(x), x <= 0
+
+
+def _sqrt(x):
+    return np.sqrt(x), x < 0
+
+
+FUNCTIONS = {
+    "sin": _sin,
+    "cos": _cos,
+    "tan": _tan,
+    "log": _log,
+    "ln": _ln,
+    "√": _sqrt,
+    "sqrt": _sqrt,
+}
+
+
+def _pow(a, b):
+    result = np.power(a, b)
+    # math.pow と同じく、負の数の非整数乗・0 の負の乗・桁あふれはエラー
+    invalid = np.isfinite(a) & np.isfinite(b) & (((a < 0) & (b % 1 != 0)) | ((a == 0) & (b < 0)))
+    overflow = np.isinf(result) & np.isfinite(a) & np.isfinite(b)
+    return result, invalid | overflow
+
+
+BINARY = {
+    "+": lambda a, b: (a + b, False),
+    "-": lambda a, b: (a - b, False),
+    "*": lambda a, b: (a * b, False),
+    "/": lambda a, b: (a / b, b == 0),
+    "^": _pow,
+}
+
+
+def _evaluate(node, columns):
+    if isinstance(node, Num):
+        return np.float64(node.value), False
+    if isinstance(node, Var):
+        if node.name not in columns:
+            raise CalcError(f"変数 {node.name} の値がありません")
+        return columns[node.name]
+    if isinstance(node, Call):
+        value, mask = _evaluate(node.arg, columns)
+        result, invalid = FUNCTIONS[node.name](value)
+        return result, mask | invalid
+    if isinstance(node, BinOp):
+        left, left_mask = _evaluate(node.left, columns)
+        right, right_mask = _evaluate(node.right, columns)
+        result, invalid = BINARY[node.op](left, right)
+        return result, left_mask | right_mask | invalid
+    value, mask = _evaluate(node.operand, columns)
+    return -value, mask
+
+
+def _as_column(values):
+    """入力を (float64 の配列, マスク) にする。MaskedArray のマスクは引き継ぐ"""
+    mask = np.ma.getmaskarray(values) if np.ma.isMaskedArray(values) else False
+    data = np.asarray(np.ma.getdata(values), dtype=np.float64)
+    return data, mask | np.zeros(data.shape, dtype=bool)
+
+
+def evaluate_batch(expr, **columns):
+    """式を列ごとに計算する
+
+    Args:
+        expr: engine の式（変数名は columns のキー）
+        columns: 変数名 -> 配列（list, numpy.ndarray, numpy.ma.MaskedArray）
+
+    Returns:
+        numpy.ma.MaskedArray（NumPy がないときは、エラーを None にしたリスト）
+    """
+    if np is None:
+        return _evaluate_scalar(expr, columns)
+
+    tree = fold(parse(expr))
+    arrays = {name: _as_column(values) for name, values in columns.items()}
+    with np.errstate(all="ignore"):
+        result, mask = _evaluate(tree, arrays)
+
+    shape = np.broadcast_shapes(*(data.shape for data, _ in arrays.values()))
+    result = np.broadcast_to(np.asarray(result, dtype=np.float64), shape).copy()
+    mask = np.broadcast_to(mask, shape).copy()
+    result[mask] = np.nan
+    return np.ma.MaskedArray(result, mask=mask)
+
+
+def _evaluate_scalar(expr, columns):
+    """1要素ずつ engine で計算する（NumPy がないとき・比較用）"""
+    compiled = compile_expression(expr)
+    names = list(columns)
+    results = []
+    for values in zip(*(columns[name] for name in names)):
+        if None in values:
+            results.append(None)
+            continue
+        try:
+            results.append(compiled(**dict(zip(names, values))))
+        except CalcError:
+            results.append(None)
+    return results
+
+
+def apply(name, values):
+    """関数（sin, log, √ など）を配列の要素ごとに適用する"""
+    if name not in FUNCTIONS:
+        raise CalcError(f"関数 {name} はありません")
+    return evaluate_batch(f"{name}(x)", x=values)
+
+
+def pipeline(values, steps, **columns):
+    """steps を順に適用する（電卓でボタンを続けて押すのと同じ）
+
+    各ステップは関数名（"sin" など）か、前の結果を x とする式（"x * 2" など）。
+    途中でエラーになった要素は、最後までマスクされたままになる。
+    """
+    for step in steps:
+        expr = f"{step}(x)" if step in FUNCTIONS else step
+        values = evaluate_batch(expr, x=values, **columns)
+    return values
+
+
+def format_batch(results):
+    """表示用の文字列のリスト（エラーは "Error"、整数になる値は int の形）"""
+    if np is not None and np.ma.isMaskedArray(results):
+        results = [None if masked else value for value, masked
+                   in zip(results.data.tolist(), np.ma.getmaskarray(results).tolist())]
+    return ["Error" if value is None else format_result(value) for value in results]
+
+
+# ---- CSV ----
+
+def read_csv_columns(path, names):
+    """CSV から names の列を読む（数値でないセルはマスク / None）"""
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        rows = list(reader)
+        fieldnames = reader.fieldnames or []
+
+    missing = [name for name in names if name not in fieldnames]
+    if missing:
+        raise CalcError(f"CSV に列がありません: {', '.join(missing)}")
+
+    columns = {}
+    for name in names:
+        values = []
+        for row in rows:
+            try:
+                values.append(float(row[name]))
+            except (TypeError, ValueError):
+                values.append(None)
+        if np is not None:
+            mask = [value is None for value in values]
+            data = [0.0 if value is None else value for value in values]
+            values = np.ma.MaskedArray(np.array(data, dtype=np.float64), mask=mask)
+        columns[name] = values
+    return fieldnames, rows, columns
+
+
+def evaluate_csv(path, expr, column="result", output=None):
+    """CSV の列を変数として式を計算し、結果の列を足して output（省略時は標準出力）に書く"""
+    variables = sorted(compile_expression(expr).variables)
+    fieldnames, rows, columns = read_csv_columns(path, variables)
+    if variables:
+        results = format_batch(evaluate_batch(expr, **columns))
+    else:
+        results = [format_result(compile_expression(expr)())] * len(rows)
+
+    out = open(output, "w", newline="", encoding="utf-8") if output else sys.stdout
+    try:
+        writer = csv.DictWriter(out, fieldnames=fieldnames + [column])
+        writer.writeheader()
+        for row, result in zip(rows, results):
+            row[column] = result
+            writer.writerow(row)
+    finally:
+        if output:
+            out.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CSV の列に電卓の式を適用する")
+    parser.add_argument("path", help="入力の CSV（1行目は列名）")
+    parser.add_argument("expr", help="式（列名を変数として使う）")
+    parser.add_argument("--column", default="result", help="結果の列名")
+    parser.add_argument("--output", default=None, help="出力先（省略時は標準出力）")
+    args = parser.parse_args()
+
+    try:
+        evaluate_csv(args.path, args.expr, args.column, args.output)
+    except CalcError as e:
+        print(f"エラー: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+"""
+電卓の式エンジンのベンチマーク（Flet は不要）
+
+使い方:
+    python benchmark.py engine [--expressions 1000000] [--distinct 1000]
+    python benchmark.py batch [--size 1000000]
+    python benchmark.py backends [--steps 2000] [--precision 16]
+    python benchmark.py memo [--events 200000] [--entries 1024] [--repeat 5]
+    python benchmark.py replay [--events 1000000] [--backend float] [--memo] [--trace keys.log]
+"""
+import argparse
+import random
+import time
+from decimal import Decimal, localcontext
+
+import batch
+from engine import FLOAT, FRACTION, Compiled, DecimalBackend, compile_expression, evaluate, get_backend
+from memo import MemoizedBackend
+from replay import format_stats, read_keystrokes, replay, write_keystrokes
+from state import FUNCTION_KEYS, CalculatorState
+
+OPERATORS = ["+", "-", "*", "/", "^"]
+FUNCTIONS = ["sin", "cos", "tan", "log", "ln", "√"]
+
+
+def random_expression(rng, terms=6):
+    """電卓で入力するような式（数・演算子・関数・括弧）を作る"""
+    parts = []
+    for i in range(terms):
+        number = str(rng.choice([rng.randint(1, 99), round(rng.uniform(0, 100), 2)]))
+        if rng.random() < 0.2:
+            number = f"{rng.choice(FUNCTIONS)}({number})"
+        parts.append(number)
+        if i < terms - 1:
+            # 累乗は桁あふれしにくいように小さい指数だけにする
+            operator = rng.choice(OPERATORS)
+            if operator == "^":
+                parts.append(f"^ {rng.randint(0, 3)} *")
+            else:
+                parts.append(operator)
+    if rng.random() < 0.5:
+        parts.insert(0, "(")
+        parts.insert(4, ")")
+    return " ".join(parts)
+
+
+def measure(label, func, items):
+    start = time.perf_counter()
+    errors = 0
+    for item in items:
+        try:
+            func(item)
+        except ValueError:
+            errors += 1
+    elapsed = time.perf_counter() - start
+    print(f"{label:>28}: {len(items) / elapsed:12,.0f} 式/秒 "
+          f"({elapsed * 1e6 / len(items):7.2f} µs/式, エラー {errors})")
+
+
+def bench_engine(args):
+    """構文解析からの評価と、キャッシュ済みの評価の比較"""
+    rng = random.Random(0)
+    distinct = [random_expression(rng) for _ in range(args.distinct)]
+    trace = [rng.choice(distinct) for _ in range(args.expressions)]
+    print(f"{args.expressions:,} 式（異なる式 {args.distinct:,} 個）")
+
+    # 毎回トークン分割・構文解析・畳み込み・コンパイルする
+    uncached = trace[:min(len(trace), 100_000)]
+    measure("parse + compile every time", lambda expr: Compiled(expr)(), uncached)
+
+    compile_expression.cache_clear()
+    measure("evaluate (cached)", evaluate, trace)
+    info = compile_expression.cache_info()
+    print(f"{'':>28}  キャッシュ: ヒット {info.hits:,} / ミス {info.misses:,}")
+
+    # 変数を含む式は、コンパイル済みの関数を値を変えて呼ぶ
+    compiled = compile_expression("x * 2 + sin(x) - 3 ^ 2 / 4")
+    values = [{"x": rng.uniform(-360, 360)} for _ in range(args.expressions)]
+    measure("compiled with variable", lambda env: compiled(**env), values)
+
+
+def bench_batch(args):
+    """配列への一括適用（NumPy）と、1要素ずつの計算の比較"""
+    if batch.np is None:
+        print("NumPy がインストールされていないため測定できません")
+        return
+    np = batch.np
+
+    rng = np.random.default_rng(0)
+    # 定義域の外（負の数・0）も混ぜる
+    x = rng.uniform(-360, 360, args.size)
+    x[::1000] = 0
+    values = x.tolist()
+    print(f"{args.size:,} 要素")
+    print(f"{'式':>28} {'1要素ずつ':>12} {'NumPy':>12} {'倍率':>8} {'エラー':>8} {'不一致':>6} {'最大相対誤差':>12}")
+
+    for expr in ("sin(x)", "log(x)", "√x + x ^ 2 / 3", "tan(x) * 2 - ln(x) + cos(x)"):
+        start = time.perf_counter()
+        scalar = batch._evaluate_scalar(expr, {"x": values})
+        scalar_elapsed = time.perf_counter() - start
+
+        start = time.perf_counter()
+        vectorized = batch.evaluate_batch(expr, x=x)
+        vector_elapsed = time.perf_counter() - start
+
+        # エラーの位置と値が1要素ずつの計算と一致するか
+        expected = np.array([np.nan if value is None else value for value in scalar])
+        mismatched = int((np.isnan(expected) != vectorized.mask).sum())
+        valid = ~vectorized.mask & (expected != 0)
+        error = np.max(np.abs(vectorized.data[valid] / expected[valid] - 1)) if valid.any() else 0.0
+
+        print(f"{expr:>28} {args.size / scalar_elapsed:10,.0f}/s {args.size / vector_elapsed:10,.0f}/s "
+              f"{scalar_elapsed / vector_elapsed:7.1f}x {int(vectorized.mask.sum()):>8} {mismatched:>6} {error:12.1e}")
+
+    start = time.perf_counter()
+    batch.format_batch(vectorized)
+    print(f"{'format_batch':>28} {args.size / (time.perf_counter() - start):10,.0f}/s")
+
+
+def chain_workloads(rng, steps):
+    """前の結果 x に1ステップずつ適用する式の列（電卓で続けて計算するのと同じ）"""
+    # 金額: 小数2桁の足し引き
+    money = [f"x {rng.choice('+-')} {rng.randint(1, 9999) / 100}" for _ in range(steps)]
+    # 四則演算: 掛けると割る、足すと引くを同じ割合で混ぜる（値が発散しないように）
+    operations = ["x * 1.05", "x / 1.05", "x * 0.7", "x / 0.7", "x + 0.1", "x - 0.1", "x * 3", "x / 3"]
+    mixed = [rng.choice(operations) for _ in range(steps)]
+    # 関数: √・累乗・三角関数・対数を混ぜる（1 以上の値を 1 以上に移す）
+    functions = ["√x * 3 + 1", "(sin(x) + 2) ^ 3", "log(x) * 40 + 2", "ln(x) + x / 2 + 1",
+                 "cos(x * 7) * 50 + 51"]
+    scientific = [rng.choice(functions) for _ in range(steps)]
+    return {"money": money, "mixed": mixed, "scientific": scientific}
+
+
+def run_chain(chain, backend, start=1):
+    x = start
+    for step in chain:
+        x = compile_expression(step, backend)(x=x)
+    return x
+
+
+def bench_backends(args):
+    """float / Decimal / Fraction で、同じ計算の列にかかる時間と誤差を比較"""
+    rng = random.Random(0)
+    workloads = chain_workloads(rng, args.steps)
+    backends = [FLOAT, DecimalBackend(args.precision), FRACTION]
+    reference = DecimalBackend(60)
+
+    print(f"{args.steps:,} ステップ（基準: Decimal 60桁）")
+    print(f"{'計算':>10} {'数値の種類':>24} {'ステップ/秒':>14} {'相対誤差':>10} {'15桁一致':>8}")
+    for name, chain in workloads.items():
+        expected = Decimal(run_chain(chain, reference))
+        for backend in backends:
+            # 式のキャッシュが温まった状態で測る
+            for step in chain:
+                compile_expression(step, backend)
+            start = time.perf_counter()
+            value = run_chain(chain, backend)
+            elapsed = time.perf_counter() - start
+
+            with localcontext() as ctx:
+                ctx.prec = 60
+                if hasattr(value, "denominator") and not isinstance(value, int):
+                    actual = Decimal(value.numerator) / value.denominator
+                else:
+                    actual = Decimal(value)
+                error = abs(actual - expected) / abs(expected) if expected else abs(actual)
+            match = f"{float(actual):.15g}" == f"{float(expected):.15g}"
+            print(f"{name:>10} {backend!r:>24} {len(chain) / elapsed:12,.0f}/s "
+                  f"{float(error):10.1e} {'yes' if match else 'no':>8}")
+
+
+# よく入力される値（角度・2・10 など）
+COMMON_OPERANDS = ["30", "45", "60", "90", "180", "2", "10", "100", "0.5", "3"]
+
+
+def keystroke_trace(rng, events, common=0.7):
+    """電卓のキー入力の記録を作る（数を入力して関数・演算子・= などを押す）
+
+    数の common の割合はよく使う値で、残りは 1〜999 の整数。
+    """
+    keys = []
+    while len(keys) < events:
+        if rng.random() < common:
+            operand = rng.choice(COMMON_OPERANDS)
+        else:
+            operand = str(rng.randint(1, 999))
+        keys += list(operand)
+        if rng.random() < 0.05:
+            keys.append("+/-")
+        keys.append(rng.choice(FUNCTION_KEYS) if rng.random() < 0.6 else rng.choice("+-*/^"))
+        if rng.random() < 0.2:
+            keys.append(rng.choice(["=", "=", "=", "%", "π", "AC"]))
+    return keys[:events]
+
+
+def bench_memo(args):
+    """関数の結果のキャッシュの効果を、キー入力の記録の再生で測定（関数以外のキーも含む）"""
+    trace = keystroke_trace(random.Random(0), args.events)
+    decimal = DecimalBackend(args.precision)
+    cases = [
+        ("float", FLOAT, None),
+        ("float + memo", None, lambda: MemoizedBackend(FLOAT, args.entries)),
+        (f"Decimal({args.precision})", decimal, None),
+        (f"Decimal({args.precision}) + memo", None, lambda: MemoizedBackend(decimal, args.entries)),
+        (f"Decimal({args.precision}) + memo, 表なし", None,
+         lambda: MemoizedBackend(decimal, args.entries, degree_table=False)),
+        ("Fraction", FRACTION, None),
+        ("Fraction + memo", None, lambda: MemoizedBackend(FRACTION, args.entries)),
+    ]
+
+    print(f"{len(trace):,} キー（キャッシュ {args.entries} 件）")
+    print(f"{'':>30} {'キー/秒':>12} {'準備':>8} {'ヒット率':>8} {'表':>8} {'追い出し':>8}")
+    for label, backend, make in cases:
+        # 毎回キャッシュを作り直して repeat 回再生し、いちばん速い回を使う
+        setup = elapsed = float("inf")
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            if make is not None:
+                backend = make()
+            setup = min(setup, time.perf_counter() - start)
+
+            stats = replay(trace, CalculatorState(backend), latencies=False)
+            elapsed = min(elapsed, stats["elapsed"])
+
+        line = f"{label:>30} {len(trace) / elapsed:10,.0f}/s {setup * 1000:6.1f}ms"
+        if isinstance(backend, MemoizedBackend):
+            stats = backend.stats()
+            calls = stats["hits"] + stats["table_hits"] + stats["misses"]
+            line += (f" {stats['hit_rate']:8.1%} {stats['table_hits'] / calls:8.1%}"
+                     f" {stats['evictions']:>8,}")
+        print(line)
+
+
+def bench_replay(args):
+    """キー入力の記録を UI なしで再生し、キー/秒とキーごとの時間を測る"""
+    if args.trace:
+        trace = read_keystrokes(args.trace)
+    else:
+        trace = keystroke_trace(random.Random(0), args.events)
+    if args.save:
+        write_keystrokes(args.save, trace)
+
+    def make_state():
+        backend = get_backend(args.backend, args.precision)
+        return CalculatorState(MemoizedBackend(backend) if args.memo else backend)
+
+    print(f"数値: {args.backend}{' + memo' if args.memo else ''}")
+    for label, log_events, latencies in (
+        ("出力あり", True, True),
+        ("出力なし", False, True),
+        ("出力なし・時間測定なし", False, False),
+    ):
+        stats = replay(trace, make_state(), log_events=log_events, latencies=latencies)
+        print(f"{label:>14}: {format_stats(stats)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="電卓のベンチマーク")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    engine = sub.add_parser("engine", help="式エンジンの評価速度を測定")
+    engine.add_argument("--expressions", type=int, default=1_000_000)
+    engine.add_argument("--distinct", type=int, default=1000, help="異なる式の数")
+    engine.set_defaults(func=bench_engine)
+
+    batch_parser = sub.add_parser("batch", help="配列への一括適用と1要素ずつの計算を比較（NumPy が必要）")
+    batch_parser.add_argument("--size", type=int, default=1_000_000)
+    batch_parser.set_defaults(func=bench_batch)
+
+    backends = sub.add_parser("backends", help="float / Decimal / Fraction の速さと誤差を比較")
+    backends.add_argument("--steps", type=int, default=2000, help="1つの計算の列のステップ数")
+    backends.add_argument("--precision", type=int, default=16, help="Decimal の有効桁数")
+    backends.set_defaults(func=bench_backends)
+
+    memo = sub.add_parser("memo", help="関数の結果のキャッシュの効果をキー入力の記録で測定")
+    memo.add_argument("--events", type=int, default=200_000, help="キー入力の数")
+    memo.add_argument("--entries", type=int, default=1024, help="キャッシュの件数")
+    memo.add_argument("--precision", type=int, default=16, help="Decimal の有効桁数")
+    memo.add_argument("--repeat", type=int, default=5, help="再生の回数（いちばん速い回を使う）")
+    memo.set_defaults(func=bench_memo)
+
+    replay_parser = sub.add_parser("replay", help="キー入力の記録を UI なしで再生して測定")
+    replay_parser.add_argument("--events", type=int, default=1_000_000, help="作るキー入力の数")
+    replay_parser.add_argument("--trace", default=None, help="再生する記録（省略時は作る）")
+    replay_parser.add_argument("--save", default=None, help="作った記録の保存先")
+    replay_parser.add_argument("--backend", default="float", help="float, decimal, fraction")
+    replay_parser.add_argument("--precision", type=int, default=16, help="Decimal の有効桁数")
+    replay_parser.add_argument("--memo", action="store_true", help="関数の結果をキャッシュする")
+    replay_parser.set_defaults(func=bench_replay)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
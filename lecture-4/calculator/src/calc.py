@@ -1,5 +1,8 @@
 import flet as ft
-import math  # 科学計算に必要な関数のためにmathモジュールをインポート
+
+from engine import DecimalBackend
+from memo import MemoizedBackend
+from state import CalculatorState
 
 
 class CalcButton(ft.ElevatedButton):
@@ -40,9 +43,12 @@ class ScientificButton(CalcButton):
 
 
 class CalculatorApp(ft.Container):
-    def __init__(self):
+    def __init__(self, backend=None, log_events=True):
         super().__init__()
-        self.reset()
+        # キー入力の処理（表示する文字列を返す）。backend は数値の種類（省略時は float）
+        self.state = CalculatorState(backend)
+        # キーごとにデバッグ用の出力をするか
+        self.log_events = log_events
         self.scientific_mode = False
 
         self.result = ft.Text(value="0", color=ft.Colors.WHITE, size=20)
@@ -149,132 +155,17 @@ class CalculatorApp(ft.Container):
 
     def button_clicked(self, e):
         data = e.control.data
-        print(f"Button clicked with data = {data, type(data)}")
-        if self.result.value == "Error" or data == "AC":
-            self.result.value = "0"
-            self.reset()
-
-        elif data in ("1", "2", "3", "4", "5", "6", "7", "8", "9", "0", "."):
-            if self.result.value == "0" or self.new_operand == True:
-                self.result.value = data
-                self.new_operand = False
-            else:
-                self.result.value = str(self.result.value) + str(data)
-
-        elif data in ("+", "-", "*", "/", "^"):
-            self.result.value = str(self.calculate(self.operand1, float(str(self.result.value)), self.operator))
-            self.operator = data
-            if self.result.value == "Error":
-                self.operand1 = "0"
-            else:
-                self.operand1 = float(self.result.value)
-            self.new_operand = True
-
-        elif data in ("="):
-            self.result.value = str(self.calculate(self.operand1, float(str(self.result.value)), self.operator))
-            self.reset()
-
-        elif data in ("%"):
-            self.result.value = str(float(str(self.result.value)) / 100)
-            self.reset()
-
-        elif data in ("+/-"):
-            if float(str(self.result.value)) > 0:
-                self.result.value = "-" + str(self.result.value)
-
-            elif float(str(self.result.value)) < 0:
-                self.result.value = str(self.format_number(abs(float(str(self.result.value)))))
-        
-        # 科学計算関数
-        elif data == "sin":
-            value = float(str(self.result.value))
-            self.result.value = str(self.format_number(math.sin(math.radians(value))))
-            self.new_operand = True
-            
-        elif data == "cos":
-            value = float(str(self.result.value))
-            self.result.value = str(self.format_number(math.cos(math.radians(value))))
-            self.new_operand = True
-            
-        elif data == "tan":
-            value = float(str(self.result.value))
-            try:
-                self.result.value = str(self.format_number(math.tan(math.radians(value))))
-            except:
-                self.result.value = "Error"
-            self.new_operand = True
-            
-        elif data == "log":
-            value = float(str(self.result.value))
-            if value <= 0:
-                self.result.value = "Error"
-            else:
-                self.result.value = str(self.format_number(math.log10(value)))
-            self.new_operand = True
-            
-        elif data == "ln":
-            value = float(str(self.result.value))
-            if value <= 0:
-                self.result.value = "Error"
-            else:
-                self.result.value = str(self.format_number(math.log(value)))
-            self.new_operand = True
-            
-        elif data == "√":
-            value = float(str(self.result.value))
-            if value < 0:
-                self.result.value = "Error"
-            else:
-                self.result.value = str(self.format_number(math.sqrt(value)))
-            self.new_operand = True
-            
-        elif data == "π":
-            self.result.value = str(self.format_number(math.pi))
-            self.new_operand = True
-            
-        elif data == "e":
-            self.result.value = str(self.format_number(math.e))
-            self.new_operand = True
-
+        if self.log_events:
+            print(f"Button clicked with data = {data, type(data)}")
+        self.result.value = self.state.press(data)
         self.update()
 
-    def format_number(self, num):
-        if num % 1 == 0:
-            return int(num)
-        else:
-            return num
-
-    def calculate(self, operand1, operand2, operator):
-        if operator == "+":
-            return self.format_number(operand1 + operand2)
-
-        elif operator == "-":
-            return self.format_number(operand1 - operand2)
-
-        elif operator == "*":
-            return self.format_number(operand1 * operand2)
-
-        elif operator == "/":
-            if operand2 == 0:
-                return "Error"
-            else:
-                return self.format_number(operand1 / operand2)
-        
-        elif operator == "^":
-            try:
-                return self.format_number(math.pow(operand1, operand2))
-            except:
-                return "Error"
-
-    def reset(self):
-        self.operator = "+"
-        self.operand1 = 0
-        self.new_operand = True
-
 
 def main(page: ft.Page):
     page.title = "Scientific Calculator"
-    calc = CalculatorApp()
+    # 0.1 + 0.2 が 0.3 になるよう、表示の桁数（16桁）の Decimal で計算する。
+    # Decimal の三角関数は遅いので、関数の結果をキャッシュする
+    calc = CalculatorApp(backend=MemoizedBackend(DecimalBackend(precision=16)))
     page.add(calc)
 
 
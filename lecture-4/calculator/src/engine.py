@@ -0,0 +1,692 @@
+"""
+電卓の式エンジン
+
+式の文字列をトークンに分け、Pratt パーサで構文木（AST）にし、定数の部分を
+畳み込んでから Python の関数（クロージャ）にコンパイルする。コンパイル結果は
+式の文字列ごとにキャッシュするので、同じ式は2回目から呼び出すだけで済む。
+Flet に依存しないので、UI なしで使える。
+
+    >>> evaluate("1 + 2 * 3")
+    7
+    >>> evaluate("2 ^ 3 ^ 2")
+    512
+    >>> evaluate("x * 2 + 1", x=4)
+    9
+    >>> evaluate("0.1 + 0.2"), evaluate("0.1 + 0.2", backend=DecimalBackend())
+    (0.30000000000000004, Decimal('0.3'))
+    >>> evaluate("1 / 3 + 1 / 6", backend=FRACTION)
+    Fraction(1, 2)
+
+- 演算子: + - * / ^ と括弧。^ は右結合で、単項の - より強い（-2^2 は -4）
+- 関数: sin cos tan（度数法）, log（常用対数）, ln, √ / sqrt。√9 のように括弧なしでもよい
+- 定数: π / pi, e。それ以外の名前は変数として、評価時に値を渡す
+- 0 での除算や定義域の外は CalcError（電卓の表示では "Error"）
+- 数値の種類（backend）は float（既定）, Decimal（精度を指定）, Fraction（有理数で厳密に計算）
+"""
+import decimal
+import math
+import re
+from contextlib import nullcontext
+from decimal import Decimal, localcontext
+from fractions import Fraction
+from functools import lru_cache
+
+
+class CalcError(ValueError):
+    """計算できない式（構文エラー・0 での除算・定義域の外など）"""
+
+
+def format_number(num):
+    """整数になる値は int にする（2.0 -> 2）。Decimal は末尾の 0 を落とす"""
+    if isinstance(num, Fraction):
+        return int(num) if num.denominator == 1 else num
+    if isinstance(num, Decimal):
+        # 有効桁数より大きい整数は 1E+20 のような指数表記のままにする
+        # （int にすると、とても大きな累乗では変換だけで数秒かかる）
+        if (num.is_finite() and num == num.to_integral_value()
+                and num.adjusted() < decimal.getcontext().prec):
+            return int(num)
+        return num.normalize()
+    if num % 1 == 0:
+        return int(num)
+    return num
+
+
+def _format_float(num):
+    """float の format_number（型の判定を省く）"""
+    if num % 1 == 0:
+        return int(num)
+    return num
+
+
+def format_result(value):
+    """表示用の文字列"""
+    if isinstance(value, Decimal):
+        # 計算時のコンテキスト（backend の桁数）で format_number 済み
+        return str(value)
+    try:
+        return str(format_number(value))
+    except ValueError as e:
+        # 桁が多すぎて文字列にできない整数（Fraction の大きな累乗など）
+        raise CalcError(f"値が大きすぎて表示できません: {e}") from None
+
+
+# ---- 数値の種類（backend） ----
+
+FUNCTION_NAMES = ("sin", "cos", "tan", "log", "ln", "√", "sqrt")
+CONSTANT_NAMES = {"π": "pi", "pi": "pi", "e": "e"}
+
+# 値が有理数になる角度（度）
+_EXACT_SIN = {0: 0, 30: Fraction(1, 2), 90: 1, 150: Fraction(1, 2),
+              180: 0, 210: Fraction(-1, 2), 270: -1, 330: Fraction(-1, 2)}
+_EXACT_TAN = {0: 0, 45: 1, 135: -1, 180: 0, 225: 1, 315: -1}
+
+
+def _exact_trig(name, angle):
+    """角度（0 以上 360 未満の Fraction）が値が有理数になるものなら、その値を返す。それ以外は None"""
+    if angle.denominator != 1:
+        return None
+    angle = int(angle)
+    if name == "cos":
+        name, angle = "sin", (angle + 90) % 360
+    if name == "sin":
+        value = _EXACT_SIN.get(angle)
+    else:
+        if angle in (90, 270):
+            raise CalcError("tan(90°) は定義されません")
+        value = _EXACT_TAN.get(angle)
+    return None if value is None else Fraction(value)
+
+
+def _check_log(name, x):
+    if x <= 0:
+        raise CalcError(f"{name} の引数は正の数です")
+
+
+def _check_sqrt(x):
+    if x < 0:
+        raise CalcError("√ の引数は 0 以上です")
+
+
+def _div(a, b):
+    if b == 0:
+        raise CalcError("0 で割ることはできません")
+    return a / b
+
+
+class Backend:
+    """数値の種類ごとの、リテラル・定数・関数・演算子の実装
+
+    context が None でなければ、計算はその decimal.Context の中で行う。
+    """
+
+    name = None
+    precision = None
+    context = None
+    # 評価時に渡された変数の値を number() で変換するか
+    convert_variables = True
+
+    def __init__(self):
+        self.binary = {
+            "+": lambda a, b: a + b,
+            "-": lambda a, b: a - b,
+            "*": lambda a, b: a * b,
+            "/": _div,
+            "^": self.pow,
+        }
+        self.functions = {
+            "sin": self.sin,
+            "cos": self.cos,
+            "tan": self.tan,
+            "log": self.log,
+            "ln": self.ln,
+            "√": self.sqrt,
+            "sqrt": self.sqrt,
+        }
+
+    def local_context(self):
+        """計算に使う decimal のコンテキスト（float, Fraction では何もしない）"""
+        return nullcontext() if self.context is None else localcontext(self.context)
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.precision == other.precision
+
+    def __hash__(self):
+        return hash((type(self), self.precision))
+
+    def __repr__(self):
+        if self.precision is None:
+            return f"{type(self).__name__}()"
+        return f"{type(self).__name__}(precision={self.precision})"
+
+
+class FloatBackend(Backend):
+    """float（倍精度の2進浮動小数点数）。速いが 0.1 + 0.2 などに誤差が出る"""
+
+    name = "float"
+    convert_variables = False
+
+    def number(self, value):
+        return float(value)
+
+    def constant(self, name):
+        return math.pi if name == "pi" else math.e
+
+    def sin(self, x):
+        return math.sin(math.radians(x))
+
+    def cos(self, x):
+        return math.cos(math.radians(x))
+
+    def tan(self, x):
+        return math.tan(math.radians(x))
+
+    def log(self, x):
+        _check_log("log", x)
+        return math.log10(x)
+
+    def ln(self, x):
+        _check_log("ln", x)
+        return math.log(x)
+
+    def sqrt(self, x):
+        _check_sqrt(x)
+        return math.sqrt(x)
+
+    def pow(self, a, b):
+        try:
+            return math.pow(a, b)
+        except (ValueError, OverflowError) as e:
+            raise CalcError(f"累乗を計算できません: {e}") from e
+
+
+class DecimalBackend(Backend):
+    """10進の Decimal。有効桁数 precision で丸める（0.1 + 0.2 は 0.3）
+
+    四則演算・累乗・log・ln・√ は decimal の演算で、三角関数は桁を足して
+    級数で計算してから precision 桁に丸める。
+    """
+
+    name = "decimal"
+    # 関数の計算で足す桁数
+    GUARD_DIGITS = 5
+
+    def __init__(self, precision=28):
+        super().__init__()
+        self.precision = precision
+        traps = [decimal.InvalidOperation, decimal.DivisionByZero, decimal.Overflow]
+        self.context = decimal.Context(prec=precision, traps=traps)
+        self._guard = decimal.Context(prec=precision + self.GUARD_DIGITS, traps=traps)
+        with localcontext(self._guard):
+            self._pi = _decimal_pi()
+            # 定数は足した桁のまま持つ（ln(e) が 1 になるように。表示では precision 桁に丸まる）
+            self._constants = {"pi": self._pi, "e": Decimal(1).exp()}
+
+    def number(self, value):
+        if isinstance(value, float):
+            value = repr(value)
+        return Decimal(value)
+
+    def constant(self, name):
+        return self._constants[name]
+
+    def _trig(self, name, x):
+        # 360 で割った余りは、桁の大きな値でも正確になるよう Fraction で求める
+        angle = Fraction(x) % 360
+        exact = _exact_trig(name, angle)
+        if exact is not None:
+            return Decimal(exact.numerator) / exact.denominator
+        if angle > 180:
+            angle -= 360
+        with localcontext(self._guard):
+            radians = Decimal(angle.numerator) / angle.denominator * self._pi / 180
+            if name == "sin":
+                value = _decimal_sin(radians)
+            elif name == "cos":
+                value = _decimal_cos(radians)
+            else:
+                value = _decimal_sin(radians) / _decimal_cos(radians)
+        # 呼び出し側のコンテキスト（precision 桁）に丸める
+        return +value
+
+    def sin(self, x):
+        return self._trig("sin", x)
+
+    def cos(self, x):
+        return self._trig("cos", x)
+
+    def tan(self, x):
+        return self._trig("tan", x)
+
+    def log(self, x):
+        _check_log("log", x)
+        return x.log10()
+
+    def ln(self, x):
+        _check_log("ln", x)
+        return x.ln()
+
+    def sqrt(self, x):
+        _check_sqrt(x)
+        return x.sqrt()
+
+    def pow(self, a, b):
+        if a == 0 and b < 0:
+            raise CalcError("0 の負の累乗は計算できません")
+        if a < 0 and b != b.to_integral_value():
+            raise CalcError("負の数の非整数乗は計算できません")
+        return a ** b
+
+
+def _decimal_pi():
+    """現在のコンテキストの桁数の円周率（decimal モジュールのドキュメントのレシピ）"""
+    three = Decimal(3)
+    lasts, t, s, n, na, d, da = 0, three, 3, 1, 0, 0, 24
+    while s != lasts:
+        lasts = s
+        n, na = n + na, na + 8
+        d, da = d + da, da + 32
+        t = (t * n) / d
+        s += t
+    return +s
+
+
+def _decimal_sin(x):
+    i, lasts, s, fact, num, sign = 1, 0, x, 1, x, 1
+    while s != lasts:
+        lasts = s
+        i += 2
+        fact *= i * (i - 1)
+        num *= x * x
+        sign *= -1
+        s += num / fact * sign
+    return +s
+
+
+def _decimal_cos(x):
+    i, lasts, s, fact, num, sign = 0, 0, 1, 1, 1, 1
+    while s != lasts:
+        lasts = s
+        i += 2
+        fact *= i * (i - 1)
+        num *= x * x
+        sign *= -1
+        s += num / fact * sign
+    return +s
+
+
+class FractionBackend(Backend):
+    """有理数の Fraction。四則演算と整数乗は厳密に計算する
+
+    無理数になる関数（sin(45) や √2 など）と非整数乗は float で計算して
+    Fraction にする。sin(30) = 1/2 のように有理数になる値や、平方数の √ は厳密。
+    """
+
+    name = "fraction"
+    # 整数乗の結果の大きさの上限（ビット数）。これを超える累乗はエラーにする
+    MAX_POWER_BITS = 1_000_000
+
+    def number(self, value):
+        if isinstance(value, float):
+            value = repr(value)
+        return Fraction(value)
+
+    def constant(self, name):
+        return Fraction(math.pi if name == "pi" else math.e)
+
+    def _trig(self, name, x):
+        exact = _exact_trig(name, x % 360)
+        if exact is not None:
+            return exact
+        return Fraction(getattr(math, name)(math.radians(float(x))))
+
+    def sin(self, x):
+        return self._trig("sin", x)
+
+    def cos(self, x):
+        return self._trig("cos", x)
+
+    def tan(self, x):
+        return self._trig("tan", x)
+
+    def log(self, x):
+        _check_log("log", x)
+        return Fraction(math.log10(x))
+
+    def ln(self, x):
+        _check_log("ln", x)
+        return Fraction(math.log(x))
+
+    def sqrt(self, x):
+        _check_sqrt(x)
+        numerator, denominator = math.isqrt(x.numerator), math.isqrt(x.denominator)
+        if numerator * numerator == x.numerator and denominator * denominator == x.denominator:
+            return Fraction(numerator, denominator)
+        return Fraction(math.sqrt(x))
+
+    def pow(self, a, b):
+        if a == 0 and b < 0:
+            raise CalcError("0 の負の累乗は計算できません")
+        if b.denominator == 1:
+            bits = max(a.numerator.bit_length(), a.denominator.bit_length())
+            if bits * abs(b.numerator) > self.MAX_POWER_BITS:
+                raise CalcError("累乗の結果が大きすぎます")
+            return a ** b.numerator
+        if a < 0:
+            raise CalcError("負の数の非整数乗は計算できません")
+        return Fraction(math.pow(a, b))
+
+
+FLOAT = FloatBackend()
+FRACTION = FractionBackend()
+BACKENDS = {"float": FloatBackend, "decimal": DecimalBackend, "fraction": FractionBackend}
+
+
+def get_backend(name, precision=28):
+    """名前（"float", "decimal", "fraction"）から backend を作る"""
+    if name not in BACKENDS:
+        raise CalcError(f"数値の種類 {name} はありません（{', '.join(BACKENDS)}）")
+    if name == "decimal":
+        return DecimalBackend(precision)
+    return FLOAT if name == "float" else FRACTION
+
+
+# ---- トークン ----
+
+_TOKEN = re.compile(r"""
+    \s*(?:
+        (?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+      | (?P<name>[A-Za-z_]\w*|π|√)
+      | (?P<op>[-+*/^()])
+    )""", re.VERBOSE)
+
+
+def tokenize(expr):
+    """式を (種類, 文字列) のリストにする。種類は "number", "name", "op", "end" """
+    tokens = []
+    pos = 0
+    end = len(expr.rstrip())
+    while pos < end:
+        match = _TOKEN.match(expr, pos)
+        if match is None:
+            raise CalcError(f"読めない文字があります: {expr[pos:].strip()[:10]!r}")
+        kind = match.lastgroup
+        tokens.append((kind, match.group(kind)))
+        pos = match.end()
+    tokens.append(("end", None))
+    return tokens
+
+
+# ---- 構文木 ----
+
+class Num:
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __repr__(self):
+        return f"Num({self.value!r})"
+
+
+class Var:
+    __slots__ = ("name",)
+
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return f"Var({self.name!r})"
+
+
+class Neg:
+    __slots__ = ("operand",)
+
+    def __init__(self, operand):
+        self.operand = operand
+
+    def __repr__(self):
+        return f"Neg({self.operand!r})"
+
+
+class BinOp:
+    __slots__ = ("op", "left", "right")
+
+    def __init__(self, op, left, right):
+        self.op = op
+        self.left = left
+        self.right = right
+
+    def __repr__(self):
+        return f"BinOp({self.op!r}, {self.left!r}, {self.right!r})"
+
+
+class Call:
+    __slots__ = ("name", "arg")
+
+    def __init__(self, name, arg):
+        self.name = name
+        self.arg = arg
+
+    def __repr__(self):
+        return f"Call({self.name!r}, {self.arg!r})"
+
+
+# ---- パーサ（Pratt） ----
+
+# 二項演算子の結合力（左, 右）。右のほうが小さい ^ は右結合になる
+_INFIX = {
+    "+": (10, 11),
+    "-": (10, 11),
+    "*": (20, 21),
+    "/": (20, 21),
+    "^": (41, 40),
+}
+# 単項の - と関数の引数の結合力（* / より強く、^ より弱い）
+_PREFIX = 30
+
+
+class _Parser:
+    def __init__(self, expr, backend):
+        self.tokens = tokenize(expr)
+        self.backend = backend
+        self.pos = 0
+
+    def next(self):
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    def peek(self):
+        return self.tokens[self.pos]
+
+    def parse(self):
+        node = self.expression(0)
+        kind, value = self.peek()
+        if kind != "end":
+            raise CalcError(f"式の途中に余分なものがあります: {value}")
+        return node
+
+    def expression(self, min_power):
+        left = self.prefix()
+        while True:
+            kind, value = self.peek()
+            if kind != "op" or value not in _INFIX:
+                return left
+            left_power, right_power = _INFIX[value]
+            if left_power < min_power:
+                return left
+            self.next()
+            left = BinOp(value, left, self.expression(right_power))
+
+    def prefix(self):
+        kind, value = self.next()
+        if kind == "number":
+            return Num(self.backend.number(value))
+        if kind == "name":
+            if value in FUNCTION_NAMES:
+                return Call(value, self.expression(_PREFIX))
+            if value in CONSTANT_NAMES:
+                return Num(self.backend.constant(CONSTANT_NAMES[value]))
+            return Var(value)
+        if value == "-":
+            return Neg(self.expression(_PREFIX))
+        if value == "+":
+            return self.expression(_PREFIX)
+        if value == "(":
+            node = self.expression(0)
+            if self.next() != ("op", ")"):
+                raise CalcError("閉じ括弧がありません")
+            return node
+        raise CalcError("式が途中で終わっています" if kind == "end" else f"ここに {value} は置けません")
+
+
+def parse(expr, backend=FLOAT):
+    """式を構文木にする（数値は backend の種類になる）"""
+    return _Parser(expr, backend).parse()
+
+
+# ---- 定数の畳み込み ----
+
+def fold(node, backend=FLOAT):
+    """変数を含まない部分を計算済みの Num にする
+
+    計算するとエラーになる部分（1/0 など）は、評価時にエラーになるよう残す。
+    Decimal では backend.local_context() の中で呼ぶ。
+    """
+    if isinstance(node, Neg):
+        operand = fold(node.operand, backend)
+        if isinstance(operand, Num):
+            return Num(-operand.value)
+        return Neg(operand)
+    if isinstance(node, BinOp):
+        left, right = fold(node.left, backend), fold(node.right, backend)
+        if isinstance(left, Num) and isinstance(right, Num):
+            try:
+                return Num(backend.binary[node.op](left.value, right.value))
+            except (ValueError, ArithmeticError):
+                pass
+        return BinOp(node.op, left, right)
+    if isinstance(node, Call):
+        arg = fold(node.arg, backend)
+        if isinstance(arg, Num):
+            try:
+                return Num(backend.functions[node.name](arg.value))
+            except (ValueError, ArithmeticError):
+                pass
+        return Call(node.name, arg)
+    return node
+
+
+# ---- コンパイル ----
+
+def _compile_node(node, backend):
+    """構文木を、変数の辞書を受け取って値を返す関数にする"""
+    if isinstance(node, Num):
+        value = node.value
+        return lambda env: value
+    if isinstance(node, Var):
+        name = node.name
+
+        def variable(env):
+            try:
+                return env[name]
+            except KeyError:
+                raise CalcError(f"変数 {name} の値がありません") from None
+        return variable
+    if isinstance(node, Neg):
+        operand = _compile_node(node.operand, backend)
+        return lambda env: -operand(env)
+    if isinstance(node, Call):
+        func = backend.functions[node.name]
+        arg = _compile_node(node.arg, backend)
+        return lambda env: func(arg(env))
+
+    func = backend.binary[node.op]
+    left = _compile_node(node.left, backend)
+    right = _compile_node(node.right, backend)
+    # 片方が定数なら、その呼び出しを省く
+    if isinstance(node.right, Num):
+        value = node.right.value
+        return lambda env: func(left(env), value)
+    if isinstance(node.left, Num):
+        value = node.left.value
+        return lambda env: func(value, right(env))
+    return lambda env: func(left(env), right(env))
+
+
+class Compiled:
+    """コンパイル済みの式。呼び出すと値を返す"""
+
+    __slots__ = ("expr", "backend", "tree", "variables", "_func", "constant", "_format", "_value")
+
+    def __init__(self, expr, backend=None):
+        self.expr = expr
+        self.backend = backend or FLOAT
+        try:
+            with self.backend.local_context():
+                self.tree = fold(parse(expr, self.backend), self.backend)
+            self._func = _compile_node(self.tree, self.backend)
+        except RecursionError:
+            raise CalcError("式が長すぎます") from None
+        self.variables = _variables(self.tree)
+        # 変数がなく畳み込みで値が決まった式
+        self.constant = self.tree.value if isinstance(self.tree, Num) else None
+        self._format = _format_float if self.backend is FLOAT else format_number
+        # 丸めのコンテキストが要らない定数の式は、表示する値まで先に求めておく
+        self._value = None
+        if self.constant is not None and self.backend.context is None:
+            self._value = self._format(self.constant)
+
+    def __call__(self, **variables):
+        if self._value is not None:
+            return self._value
+        if self.backend.context is None:
+            return self._run(variables)
+        with self.backend.local_context():
+            return self._run(variables)
+
+    def _run(self, variables):
+        if self.constant is not None:
+            return self._format(self.constant)
+        if variables and self.backend.convert_variables:
+            variables = {name: self.backend.number(value) for name, value in variables.items()}
+        try:
+            return self._format(self._func(variables))
+        except CalcError:
+            raise
+        except (ValueError, ArithmeticError) as e:
+            # 0 での除算・桁あふれ・math.sin(inf) など
+            raise CalcError(f"計算できません: {e}") from e
+        except RecursionError:
+            raise CalcError("式が長すぎます") from None
+
+
+def _variables(node):
+    if isinstance(node, Var):
+        return {node.name}
+    children = {
+        Neg: ("operand",), BinOp: ("left", "right"), Call: ("arg",),
+    }.get(type(node), ())
+    names = set()
+    for child in children:
+        names |= _variables(getattr(node, child))
+    return names
+
+
+@lru_cache(maxsize=4096)
+def compile_expression(expr, backend=None):
+    """式をコンパイルする（式の文字列と backend ごとにキャッシュ）"""
+    return Compiled(expr, backend)
+
+
+def evaluate(expr, backend=None, **variables):
+    """式を計算する。整数になる値は int で返す
+
+    Args:
+        backend: 数値の種類（省略時は float）
+
+    Raises:
+        CalcError: 構文エラー、0 での除算、定義域の外など
+    """
+    return compile_expression(expr, backend)(**variables)
@@ -0,0 +1,123 @@
+"""
+科学計算の関数（sin, cos, tan, log, ln, √, ^）の結果のキャッシュ
+
+MemoizedBackend は engine の backend を包み、関数の結果を引数ごとに LRU で
+max_entries 件まで保持する。電卓やバッチでは同じ値（30°, 45°, 2, 100 など）が
+繰り返し計算されるので、2回目からは計算せずに返す。
+
+- degree_table=True なら、-table_range〜table_range の整数の角度の sin cos tan を
+  最初に計算しておく（LRU からは追い出されない）
+- 結果は包んだ backend で計算したものと同じ値になる。エラーになる引数はキャッシュしない
+- stats() でヒット・ミス・追い出しの回数がわかる
+- スレッドセーフではない（1つの電卓・1つのバッチで使う）
+"""
+from collections import OrderedDict
+
+from engine import Backend, CalcError
+
+TRIG_FUNCTIONS = ("sin", "cos", "tan")
+
+
+class MemoizedBackend(Backend):
+    """関数の結果をキャッシュする backend"""
+
+    # 同じ設定でも別のキャッシュを持つので、コンパイル済みの式は共有しない
+    __eq__ = object.__eq__
+    __hash__ = object.__hash__
+
+    def __init__(self, backend, max_entries=1024, degree_table=True, table_range=360):
+        self.backend = backend
+        self.name = backend.name
+        self.precision = backend.precision
+        self.context = backend.context
+        self.convert_variables = backend.convert_variables
+        self.number = backend.number
+        self.constant = backend.constant
+        self.max_entries = max_entries
+
+        self._entries = OrderedDict()  # (関数名, 引数...) -> 結果
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.table_hits = 0
+
+        self._tables = {}
+        if degree_table:
+            with backend.local_context():
+                for name in TRIG_FUNCTIONS:
+                    self._tables[name] = self._build_table(backend.functions[name], table_range)
+
+        self.functions = {name: self._memoize(name, func) for name, func in backend.functions.items()}
+        self.binary = dict(backend.binary)
+        self.binary["^"] = self._memoize_pow(backend.binary["^"])
+
+    def _build_table(self, func, table_range):
+        table = {}
+        for degrees in range(-table_range, table_range + 1):
+            try:
+                table[degrees] = func(self.number(degrees))
+            except CalcError:
+                pass  # tan(90) など
+        return table
+
+    def _store(self, key, value):
+        self._entries[key] = value
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _memoize(self, name, func):
+        table = self._tables.get(name)
+        entries = self._entries
+
+        def memoized(x):
+            if table is not None:
+                value = table.get(x)
+                if value is not None:
+                    self.table_hits += 1
+                    return value
+            key = (name, x)
+            value = entries.get(key)
+            if value is not None:
+                entries.move_to_end(key)
+                self.hits += 1
+                return value
+            self.misses += 1
+            value = func(x)
+            self._store(key, value)
+            return value
+        return memoized
+
+    def _memoize_pow(self, func):
+        entries = self._entries
+
+        def memoized(a, b):
+            key = ("^", a, b)
+            value = entries.get(key)
+            if value is not None:
+                entries.move_to_end(key)
+                self.hits += 1
+                return value
+            self.misses += 1
+            value = func(a, b)
+            self._store(key, value)
+            return value
+        return memoized
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        """ヒット率などの統計（表のヒットもヒットに数える）"""
+        lookups = self.hits + self.table_hits + self.misses
+        return {
+            "hits": self.hits,
+            "table_hits": self.table_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.table_hits) / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+        }
+
+    def __repr__(self):
+        return f"MemoizedBackend({self.backend!r}, max_entries={self.max_entries})"
@@ -0,0 +1,148 @@
+"""
+記録したキー入力を UI なしで再生する
+
+CalculatorState にキーを1つずつ渡して、1秒あたりのキー数とキーごとの時間
+（パーセンタイル）を測る。アプリと同じキーごとのデバッグ出力は、
+log_events で入れるかどうかを切り替えられる。
+
+記録は1行に1キー。アプリのデバッグ出力の行
+（Button clicked with data = ('7', <class 'str'>)）もそのまま読める。
+
+使い方:
+    python replay.py keys.log [--backend decimal] [--precision 16] [--memo] [--log-events]
+"""
+import argparse
+import os
+import re
+import time
+from array import array
+
+from engine import get_backend
+from memo import MemoizedBackend
+from state import KEYS, CalculatorState
+
+_LOG_LINE = re.compile(r"Button clicked with data = \('(.+)', <class 'str'>\)")
+
+
+def read_keystrokes(path):
+    """記録を読んでキーのリストにする"""
+    keys = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            match = _LOG_LINE.search(line)
+            keys.append(match.group(1) if match else line)
+    return keys
+
+
+def write_keystrokes(path, keys):
+    with open(path, "w", encoding="utf-8") as f:
+        f.writelines(f"{key}\n" for key in keys)
+
+
+def percentile(sorted_values, p):
+    """ソート済みリストのパーセンタイル値"""
+    if not sorted_values:
+        return float("nan")
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * p / 100))
+    return sorted_values[index]
+
+
+def replay(keys, state=None, log_events=False, latencies=True, log=None):
+    """keys を順に state.press() に渡して、統計を返す
+
+    Args:
+        log_events: アプリと同じデバッグ出力を、キーごとに log（省略時は os.devnull）に書く
+        latencies: キーごとの時間を測る（測らないほうがオーバーヘッドが少ない）
+
+    Returns:
+        dict: events, elapsed, events_per_sec, errors（"Error" になった回数）,
+            display（最後の表示）, p50_us / p95_us / p99_us / max_us（latencies のとき）
+    """
+    state = state or CalculatorState()
+    press = state.press
+    clock = time.perf_counter_ns
+    timings = array("q")
+    errors = 0
+    display = state.display
+
+    close_log = log_events and log is None
+    if close_log:
+        log = open(os.devnull, "w", encoding="utf-8")
+    try:
+        start = time.perf_counter()
+        if latencies:
+            for key in keys:
+                began = clock()
+                if log_events:
+                    print(f"Button clicked with data = {key, type(key)}", file=log)
+                display = press(key)
+                timings.append(clock() - began)
+                if display == "Error":
+                    errors += 1
+        else:
+            for key in keys:
+                if log_events:
+                    print(f"Button clicked with data = {key, type(key)}", file=log)
+                display = press(key)
+                if display == "Error":
+                    errors += 1
+        elapsed = time.perf_counter() - start
+    finally:
+        if close_log:
+            log.close()
+
+    stats = {
+        "events": len(keys),
+        "elapsed": elapsed,
+        "events_per_sec": len(keys) / elapsed if elapsed else 0.0,
+        "errors": errors,
+        "display": display,
+    }
+    if latencies:
+        ordered = sorted(timings)
+        for p in (50, 95, 99):
+            stats[f"p{p}_us"] = percentile(ordered, p) / 1000
+        stats["max_us"] = ordered[-1] / 1000 if ordered else float("nan")
+    return stats
+
+
+def format_stats(stats):
+    line = (f"{stats['events']:,} キー {stats['elapsed']:.2f}秒 "
+            f"{stats['events_per_sec']:,.0f} キー/秒 エラー {stats['errors']:,}")
+    if "p50_us" in stats:
+        line += (f" | p50 {stats['p50_us']:.1f}µs p95 {stats['p95_us']:.1f}µs "
+                 f"p99 {stats['p99_us']:.1f}µs 最大 {stats['max_us']:.0f}µs")
+    return line
+
+
+def main():
+    parser = argparse.ArgumentParser(description="記録したキー入力を UI なしで再生する")
+    parser.add_argument("path", help="キー入力の記録（1行に1キー）")
+    parser.add_argument("--backend", default="float", help="float, decimal, fraction")
+    parser.add_argument("--precision", type=int, default=16, help="Decimal の有効桁数")
+    parser.add_argument("--memo", action="store_true", help="関数の結果をキャッシュする")
+    parser.add_argument("--log-events", action="store_true", help="アプリと同じキーごとの出力をする")
+    parser.add_argument("--no-latencies", action="store_true", help="キーごとの時間を測らない")
+    args = parser.parse_args()
+
+    keys = read_keystrokes(args.path)
+    unknown = sorted(set(keys) - set(KEYS))
+    if unknown:
+        print(f"知らないキーは無視します: {', '.join(unknown[:10])}")
+
+    backend = get_backend(args.backend, args.precision)
+    if args.memo:
+        backend = MemoizedBackend(backend)
+    state = CalculatorState(backend)
+    stats = replay(keys, state, log_events=args.log_events, latencies=not args.no_latencies)
+    print(format_stats(stats))
+    print(f"最後の表示: {stats['display']}")
+    if args.memo:
+        print(f"関数のキャッシュ: {backend.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+電卓のキー入力の状態遷移（Flet に依存しない）
+
+CalculatorState.press(key) はボタン1つ分の入力を処理して、表示する文字列を返す。
+CalculatorApp はこれを呼んで結果を表示するだけなので、同じ入力を UI なしで
+再生できる（replay.py）。
+
+    >>> state = CalculatorState()
+    >>> for key in "1+2*3=":
+    ...     display = state.press(key)
+    >>> display
+    '7'
+"""
+from engine import FLOAT, CalcError, evaluate, format_result
+
+DIGIT_KEYS = ("1", "2", "3", "4", "5", "6", "7", "8", "9", "0", ".")
+OPERATOR_KEYS = ("+", "-", "*", "/", "^")
+FUNCTION_KEYS = ("sin", "cos", "tan", "log", "ln", "√")
+CONSTANT_KEYS = ("π", "e")
+KEYS = DIGIT_KEYS + OPERATOR_KEYS + FUNCTION_KEYS + CONSTANT_KEYS + ("AC", "=", "%", "+/-")
+
+
+class CalculatorState:
+    """表示中の値と、確定した「値 演算子」の並び"""
+
+    def __init__(self, backend=None):
+        # 数値の種類（engine の FloatBackend / DecimalBackend / FractionBackend。省略時は float）
+        self.backend = backend or FLOAT
+        self.display = "0"
+        self.reset()
+
+    def press(self, key):
+        """キーを1つ処理して、表示する文字列を返す（知らないキーは無視する）"""
+        if self.display == "Error" or key == "AC":
+            self.display = "0"
+            self.reset()
+
+        elif key in DIGIT_KEYS:
+            if self.display == "0" or self.new_operand:
+                self.display = key
+                self.new_operand = False
+            else:
+                self.display += key
+
+        elif key in OPERATOR_KEYS:
+            if self.new_operand and self.expression:
+                # 演算子を続けて押したときは、最後の演算子を置き換える
+                self.expression[-1] = key
+            else:
+                self.expression += [self.operand(), key]
+            self.new_operand = True
+
+        elif key == "=":
+            self.display = self.evaluate(" ".join(self.expression + [self.operand()]))
+            self.reset()
+
+        elif key == "%":
+            # 従来どおり、待っている演算子も捨てる（50 + 10 % = は 0.1）
+            self.display = self.apply("x / 100")
+            self.reset()
+
+        elif key == "+/-":
+            # 表示は 1/3 のような分数のこともあるので、文字列のまま符号を付け外しする
+            if self.display.startswith("-"):
+                self.display = self.display[1:]
+            elif self.display.strip("0.") != "":
+                self.display = "-" + self.display
+
+        # 科学計算関数（表示中の値に適用する）
+        elif key in FUNCTION_KEYS:
+            self.display = self.apply(f"{key}(x)")
+            self.new_operand = True
+
+        elif key in CONSTANT_KEYS:
+            self.display = self.evaluate(key)
+            self.new_operand = True
+
+        return self.display
+
+    def operand(self):
+        """表示中の値を式に入れる形にする（負の数や 1/3 のような分数は括弧で囲む）"""
+        value = self.display
+        return f"({value})" if value.startswith("-") or "/" in value else value
+
+    def apply(self, expr):
+        """表示中の値を x として式を計算する
+
+        式は値によらず同じなので、コンパイル済みの式と関数のキャッシュがそのまま使える。
+        """
+        try:
+            x = self.backend.number(self.display)
+        except (ValueError, ArithmeticError):
+            return "Error"
+        return self.evaluate(expr, x=x)
+
+    def evaluate(self, expr, **variables):
+        """式を計算して表示用の文字列を返す（計算できなければ "Error"）"""
+        try:
+            return format_result(evaluate(expr, self.backend, **variables))
+        except CalcError:
+            return "Error"
+
+    def reset(self):
+        # 確定した「値 演算子」の並び。"=" で表示中の値を足して、優先順位どおりに計算する
+        self.expression = []
+        self.new_operand = True
@@ -2,7 +2,11 @@
 気象庁API関連の処理
 """
 import requests
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, List, Optional
+
+# lecture-6 の HTTPキャッシュを共有する（import パスはエントリポイントの main.py で設定）
+from http_cache import shared_cache
+from json_sections import load_sections
 
 
 class JMAWeatherAPI:
@@ -10,18 +14,36 @@ class JMAWeatherAPI:
     
     AREA_LIST_URL = "https://www.jma.go.jp/bosai/common/const/area.json"
     FORECAST_URL = "https://www.jma.go.jp/bosai/forecast/data/forecast/"
+
+    # 地域リストはほとんど変わらないのでキャッシュを長めに使う
+    AREA_LIST_TTL = 24 * 60 * 60
+
+    @staticmethod
+    def _get(url: str, ttl: Optional[int] = None):
+        """共有HTTPキャッシュを通してGET"""
+        return shared_cache().get(
+            url,
+            lambda headers: requests.get(url, headers=headers, timeout=10),
+            ttl=ttl,
+        )
     
     @staticmethod
-    def fetch_area_list() -> Optional[Dict]:
+    def fetch_area_list(sections: Optional[Iterable[str]] = None) -> Optional[Dict]:
         """
         地域リストを取得
         
+        Args:
+            sections: 必要なトップレベルのキー（例: ("centers",)）。
+                指定すると、それ以外のセクションは辞書に展開しない
+        
         Returns:
             Dict 地域データ、失敗時はNone
         """
         try:
-            response = requests.get(JMAWeatherAPI.AREA_LIST_URL, timeout=10)
+            response = JMAWeatherAPI._get(JMAWeatherAPI.AREA_LIST_URL, JMAWeatherAPI.AREA_LIST_TTL)
             response.raise_for_status()
+            if sections:
+                return load_sections(response.content, sections)
             return response.json()
         except requests.exceptions.RequestException as e:
             print(f"地域リスト取得エラー: {e}")
@@ -40,7 +62,7 @@ class JMAWeatherAPI:
         """
         try:
             url = f"{JMAWeatherAPI.FORECAST_URL}{area_code}.json"
-            response = requests.get(url, timeout=10)
+            response = JMAWeatherAPI._get(url)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
@@ -58,15 +80,12 @@ class JMAWeatherAPI:
         Returns
             List[Dict]: セレクトボックス用の地域リスト
         """
-        areas = []
-        
-        if area_data and "centers" in area_data:
-            for code, center in area_data["centers"].items():
-                areas.append({
-                    "code": code,
-                    "name": center.get("name", ""),
-                })
+        if not area_data or "centers" not in area_data:
+            return []
         
-        # 名前でソート
-        areas.sort(key=lambda x: x["name"])
-        return areas
\ No newline at end of file
+        # (名前, コード) のタプルで名前順に並べてから辞書にする
+        pairs = sorted(
+            (center.get("name", ""), code)
+            for code, center in area_data["centers"].items()
+        )
+        return [{"code": code, "name": name} for name, code in pairs]
\ No newline at end of file
@@ -0,0 +1,178 @@
+"""
+地域リスト（area.json）のローカルスナップショット
+
+centers / offices / class10s をSQLiteに保存しておき、起動時はネットワークを待たずに
+そこから読み込む。読み込んだ地域はメモリ上の索引で引く:
+
+- コード -> 地域名・階層（辞書）
+- 地域名の前方一致検索（名前順に並べたリスト + bisect）
+- centers -> offices -> class10s の親子関係（辞書）
+
+refresh() で最新の area.json を取得し、内容のハッシュ（バージョン）が
+変わったときだけ1トランザクションで置き換える。
+"""
+import bisect
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from api import JMAWeatherAPI
+
+DEFAULT_CATALOG_PATH = os.path.join(os.path.expanduser("~"), ".cache", "jma-weather", "area_catalog.db")
+
+# 保存する階層（上から順に）
+LEVELS = ("centers", "offices", "class10s")
+
+
+def content_version(area_data):
+    """保存する階層の内容から作るバージョン（SHA-1）"""
+    sections = {level: area_data.get(level, {}) for level in LEVELS}
+    encoded = json.dumps(sections, ensure_ascii=False, sort_keys=True).encode("utf-8")
+    return hashlib.sha1(encoded).hexdigest()
+
+
+class AreaCatalog:
+    """地域の索引（スナップショットから読み込み、バックグラウンドで更新）"""
+
+    def __init__(self, path=DEFAULT_CATALOG_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.version = None
+        self.fetched_at = None
+        self._lock = threading.Lock()
+        self._set_index([])
+        self._create_tables()
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30.0)
+
+    def _create_tables(self):
+        with self._connect() as conn:
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS catalog_meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            )
+            ''')
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS catalog_areas (
+                level TEXT NOT NULL,
+                code TEXT NOT NULL,
+                name TEXT NOT NULL,
+                parent TEXT,
+                position INTEGER,
+                PRIMARY KEY (level, code)
+            ) WITHOUT ROWID
+            ''')
+        conn.close()
+
+    def _set_index(self, rows):
+        """(code, level, name, parent) の行から索引を作り直す"""
+        names = {}
+        levels = {}
+        parents = {}
+        children = {}
+        for code, level, name, parent in rows:
+            # offices と class10s で同じコードがあるので、上の階層を優先する
+            names.setdefault(code, name)
+            levels.setdefault(code, level)
+            if parent:
+                parents.setdefault(code, parent)
+                children.setdefault(parent, []).append(code)
+
+        # 前方一致検索用に (名前, コード) を名前順に並べる
+        by_name = sorted((name, code) for code, name in names.items())
+
+        # 読み手は参照を1回取るだけなので、まとめて差し替える
+        self._index = (names, levels, parents, children, by_name)
+
+    def load(self):
+        """スナップショットを読み込み、地域数を返す（ネットワークは使わない）"""
+        with self._connect() as conn:
+            meta = dict(conn.execute("SELECT key, value FROM catalog_meta").fetchall())
+            rows = conn.execute('''
+            SELECT code, level, name, parent FROM catalog_areas ORDER BY position
+            ''').fetchall()
+        conn.close()
+
+        with self._lock:
+            self.version = meta.get("version")
+            self.fetched_at = float(meta["fetched_at"]) if "fetched_at" in meta else None
+            self._set_index(rows)
+        return len(rows)
+
+    def save(self, area_data):
+        """area.json の内容を保存する。内容が変わっていなければ取得日時だけ更新して False"""
+        version = content_version(area_data)
+        now = time.time()
+
+        rows = []
+        for level in LEVELS:
+            for code, area in area_data.get(level, {}).items():
+                rows.append((level, code, area.get("name", ""), area.get("parent"), len(rows)))
+
+        with self._lock:
+            changed = version != self.version
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.execute("INSERT OR REPLACE INTO catalog_meta VALUES ('fetched_at', ?)",
+                                 (str(now),))
+                    if changed:
+                        conn.execute("DELETE FROM catalog_areas")
+                        conn.executemany("INSERT INTO catalog_areas VALUES (?, ?, ?, ?, ?)", rows)
+                        conn.execute("INSERT OR REPLACE INTO catalog_meta VALUES ('version', ?)",
+                                     (version,))
+            finally:
+                conn.close()
+
+            self.fetched_at = now
+            if changed:
+                self.version = version
+                self._set_index([(code, level, name, parent) for level, code, name, parent, _ in rows])
+        return changed
+
+    def refresh(self):
+        """最新の area.json を取得して保存する。更新があれば True"""
+        area_data = JMAWeatherAPI.fetch_area_list(sections=LEVELS)
+        if not area_data:
+            return False
+        return self.save(area_data)
+
+    def __len__(self):
+        return len(self._index[0])
+
+    def name(self, code, default=None):
+        """コードから地域名"""
+        return self._index[0].get(code, default)
+
+    def level(self, code):
+        """コードの階層（centers / offices / class10s）"""
+        return self._index[1].get(code)
+
+    def parent(self, code):
+        """親の地域コード"""
+        return self._index[2].get(code)
+
+    def children(self, code):
+        """子の地域コードのリスト"""
+        return list(self._index[3].get(code, ()))
+
+    def areas(self, level="centers"):
+        """その階層の地域を名前順に [{"code", "name"}] で返す"""
+        _, levels, _, _, by_name = self._index
+        return [{"code": code, "name": name} for name, code in by_name if levels[code] == level]
+
+    def search(self, prefix, limit=20):
+        """地域名の前方一致検索"""
+        by_name = self._index[4]
+        results = []
+        i = bisect.bisect_left(by_name, (prefix,))
+        while i < len(by_name) and len(results) < limit and by_name[i][0].startswith(prefix):
+            name, code = by_name[i]
+            results.append({"code": code, "name": name})
+            i += 1
+        return results
@@ -0,0 +1,227 @@
+"""
+地域リスト（area.json）の読み込みのベンチマーク
+
+area.json 全体を json.loads する場合と、centers だけを取り出す場合の
+処理時間とピークメモリ（RSS）を比べる。RSS はモードごとに別プロセスで測る。
+
+使い方:
+    python benchmark.py area [--fixture area.json] [--iterations 20]
+    python benchmark.py catalog [--fixture area.json] [--lookups 10000]
+
+--fixture を省略すると、気象庁の area.json と同じ構造・同程度の件数の
+ドキュメントを生成して使う。
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from json_sections import ijson, load_sections
+
+MODES = ("read-only", "full json.loads", "sections (stdlib)", "sections (ijson)")
+
+
+def build_area_document(centers=11, offices=5, class10s=3, class15s=3, class20s=5):
+    """area.json と同じ階層（centers → offices → class10s → class15s → class20s）のドキュメント"""
+    document = {"centers": {}, "offices": {}, "class10s": {}, "class15s": {}, "class20s": {}}
+
+    for c in range(centers):
+        center_code = f"{c + 1:02d}0100"
+        center = {"name": f"地方{c + 1}", "enName": f"Region {c + 1}",
+                  "officeName": f"管区気象台{c + 1}", "children": []}
+        document["centers"][center_code] = center
+
+        for o in range(offices):
+            office_code = f"{c * offices + o + 1:02d}0000"
+            center["children"].append(office_code)
+            office = {"name": f"府県{office_code}", "enName": f"Prefecture {office_code}",
+                      "officeName": f"地方気象台{office_code}", "parent": center_code,
+                      "children": []}
+            document["offices"][office_code] = office
+
+            for t in range(class10s):
+                class10_code = f"{office_code[:4]}{t + 1}0"
+                office["children"].append(class10_code)
+                class10 = {"name": f"地域{class10_code}", "enName": f"Area {class10_code}",
+                           "parent": office_code, "children": []}
+                document["class10s"][class10_code] = class10
+
+                for f in range(class15s):
+                    class15_code = f"{class10_code[:5]}{f + 1}"
+                    class10["children"].append(class15_code)
+                    class15 = {"name": f"細分{class15_code}", "enName": f"Sub {class15_code}",
+                               "parent": class10_code, "children": []}
+                    document["class15s"][class15_code] = class15
+
+                    for m in range(class20s):
+                        class20_code = f"{class15_code}{m}"
+                        class15["children"].append(class20_code)
+                        document["class20s"][class20_code] = {
+                            "name": f"市町村{class20_code}", "enName": f"City {class20_code}",
+                            "kana": "しちょうそん", "parent": class15_code,
+                        }
+
+    return document
+
+
+def decode(mode, payload):
+    """mode の方法で payload を読み、地域リスト（centers）を返す"""
+    if mode == "read-only":
+        return {}
+    if mode == "full json.loads":
+        return json.loads(payload)["centers"]
+    if mode == "sections (stdlib)":
+        return load_sections(payload, ("centers",), use_ijson=False)["centers"]
+    return load_sections(payload, ("centers",), use_ijson=True)["centers"]
+
+
+def run_worker(args):
+    """子プロセス: 1つのモードを実行し、結果をJSONで出力する"""
+    with open(args.fixture, "rb") as f:
+        payload = f.read()
+
+    timings = []
+    centers = 0
+    for _ in range(args.iterations):
+        start = time.perf_counter()
+        centers = len(decode(args.mode, payload))
+        timings.append((time.perf_counter() - start) * 1000)
+
+    timings.sort()
+    print(json.dumps({
+        "centers": centers,
+        "p50_ms": timings[len(timings) // 2],
+        # Linux では KB 単位
+        "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }))
+
+
+def bench_area(args):
+    """モードごとに別プロセスで処理時間とピークRSSを測る"""
+    fixture = args.fixture
+    generated = None
+    if fixture is None:
+        handle, generated = tempfile.mkstemp(suffix=".json")
+        with os.fdopen(handle, "w", encoding="utf-8") as f:
+            json.dump(build_area_document(), f, ensure_ascii=False)
+        fixture = generated
+
+    try:
+        size = os.path.getsize(fixture)
+        print(f"フィクスチャ {size / 1024:.0f} KB, {args.iterations}回")
+
+        baseline = None
+        for mode in MODES:
+            if mode == "sections (ijson)" and ijson is None:
+                print(f"{mode:>18}: ijson がインストールされていないためスキップ")
+                continue
+
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "area-worker",
+                 "--mode", mode, "--fixture", fixture, "--iterations", str(args.iterations)],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            result = json.loads(output)
+            if baseline is None:
+                # ファイルを読むだけのプロセスのRSSを基準にする
+                baseline = result["max_rss_kb"]
+                continue
+
+            print(f"{mode:>18}: {result['p50_ms']:7.2f} ms  "
+                  f"ピークRSS +{(result['max_rss_kb'] - baseline) / 1024:6.1f} MB  "
+                  f"centers {result['centers']}件")
+    finally:
+        if generated is not None:
+            os.remove(generated)
+
+
+def bench_catalog(args):
+    """地域スナップショットの読み込みと索引による検索を、従来の方法と比較"""
+    # api.py が使う lecture-6 の http_cache を import できるようにする（main.py と同じ）
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lecture-6"))
+    from area_catalog import AreaCatalog, LEVELS
+    from api import JMAWeatherAPI
+
+    if args.fixture:
+        with open(args.fixture, "rb") as f:
+            payload = f.read()
+    else:
+        payload = json.dumps(build_area_document(), ensure_ascii=False).encode("utf-8")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "area_catalog.db")
+
+        # 従来: area.json 全体をデコードして centers を整形（通信時間は含まない）
+        start = time.perf_counter()
+        areas = JMAWeatherAPI.format_area_data(json.loads(payload))
+        legacy_ms = (time.perf_counter() - start) * 1000
+
+        # 初回: 取得した内容をスナップショットに保存
+        catalog = AreaCatalog(path)
+        start = time.perf_counter()
+        catalog.save(load_sections(payload, LEVELS))
+        save_ms = (time.perf_counter() - start) * 1000
+
+        # 2回目以降の起動: スナップショットから読み込むだけ
+        catalog = AreaCatalog(path)
+        start = time.perf_counter()
+        count = catalog.load()
+        centers = catalog.areas("centers")
+        load_ms = (time.perf_counter() - start) * 1000
+
+        # 変更のない内容での更新（バージョンが同じなので書き換えない）
+        start = time.perf_counter()
+        changed = catalog.save(load_sections(payload, LEVELS))
+        unchanged_ms = (time.perf_counter() - start) * 1000
+
+        codes = [area["code"] for area in areas]
+        lookups = [codes[i % len(codes)] for i in range(args.lookups)]
+
+        start = time.perf_counter()
+        for code in lookups:
+            next((area["name"] for area in areas if area["code"] == code), "不明")
+        scan_us = (time.perf_counter() - start) / args.lookups * 1e6
+
+        start = time.perf_counter()
+        for code in lookups:
+            catalog.name(code, "不明")
+        index_us = (time.perf_counter() - start) / args.lookups * 1e6
+
+    print(f"地域 {count}件（centers {len(centers)}件）")
+    print(f"{'area.json 全体':>20}: {legacy_ms:7.2f} ms（+ ネットワーク）")
+    print(f"{'スナップショット保存':>20}: {save_ms:7.2f} ms")
+    print(f"{'スナップショット読込':>20}: {load_ms:7.2f} ms")
+    print(f"{'変更なしの更新':>20}: {unchanged_ms:7.2f} ms（書き換え {changed}）")
+    print(f"{'名前の検索':>20}: 線形 {scan_us:.3f} us  索引 {index_us:.3f} us")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="地域リスト読み込みのベンチマーク")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    area = sub.add_parser("area", help="area.json の全体読み込みとセクション読み込みを比較")
+    area.add_argument("--fixture", default=None, help="記録済みの area.json")
+    area.add_argument("--iterations", type=int, default=20)
+    area.set_defaults(func=bench_area)
+
+    catalog = sub.add_parser("catalog", help="地域スナップショットの読み込みと検索を測定")
+    catalog.add_argument("--fixture", default=None, help="記録済みの area.json")
+    catalog.add_argument("--lookups", type=int, default=10000)
+    catalog.set_defaults(func=bench_catalog)
+
+    worker = sub.add_parser("area-worker")
+    worker.add_argument("--mode", choices=MODES, required=True)
+    worker.add_argument("--fixture", required=True)
+    worker.add_argument("--iterations", type=int, default=20)
+    worker.set_defaults(func=run_worker)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+JSONドキュメントから、必要なトップレベルのセクションだけを取り出す
+
+area.json（全国の地域定義）のうち centers しか使わない場合などに、
+offices / class10s / class15s / class20s を辞書に展開せずに済ませる。
+
+- ijson がインストールされていれば、イベント単位のインクリメンタルパーサーで読み、
+  必要なセクションがそろった時点で読むのをやめる。
+- なければ標準ライブラリだけで、トップレベルのキーを走査して
+  必要な値だけを json.JSONDecoder.raw_decode で取り出す。
+"""
+import io
+import json
+import re
+
+try:
+    import ijson
+    from ijson.common import ObjectBuilder
+except ImportError:  # 任意の依存
+    ijson = None
+
+# 文字列（エスケープを含む）と括弧だけを拾うトークン
+_TOKEN = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"|[{}\[\]]')
+_WHITESPACE = re.compile(r'\s*')
+# ijson でスカラー値やコンテナの終わりを表すイベント
+_VALUE_END_EVENTS = {"end_map", "end_array", "string", "number", "boolean", "null"}
+
+
+def load_sections(source, keys, use_ijson=None):
+    """トップレベルのオブジェクトから keys のセクションだけを辞書で返す
+
+    Args:
+        source: JSONのバイト列、文字列、またはバイナリファイルオブジェクト
+        keys: 取り出すトップレベルのキー
+        use_ijson: None なら ijson があれば使う
+    """
+    keys = set(keys)
+    if use_ijson is None:
+        use_ijson = ijson is not None
+
+    if use_ijson:
+        if ijson is None:
+            raise RuntimeError("ijson がインストールされていません")
+        if isinstance(source, str):
+            source = source.encode("utf-8")
+        if isinstance(source, bytes):
+            source = io.BytesIO(source)
+        return _load_with_ijson(source, keys)
+
+    if hasattr(source, "read"):
+        source = source.read()
+    if isinstance(source, bytes):
+        source = source.decode("utf-8")
+    return _load_with_scanner(source, keys)
+
+
+def _load_with_ijson(fileobj, keys):
+    """ijson のイベントから必要なセクションだけを組み立てる"""
+    result = {}
+    builder = None
+    current = None
+
+    for prefix, event, value in ijson.parse(fileobj):
+        if builder is not None:
+            builder.event(event, value)
+            if prefix == current and event in _VALUE_END_EVENTS:
+                result[current] = builder.value
+                builder = None
+                if len(result) == len(keys):
+                    # 残りのドキュメントは読まない
+                    break
+            continue
+
+        if prefix == "" and event == "map_key" and value in keys:
+            current = value
+            builder = ObjectBuilder()
+
+    return result
+
+
+def _load_with_scanner(text, keys):
+    """トップレベルのキーを走査し、必要な値だけを raw_decode する"""
+    decoder = json.JSONDecoder()
+    result = {}
+    depth = 0
+    pos = 0
+
+    while len(result) < len(keys):
+        match = _TOKEN.search(text, pos)
+        if match is None:
+            break
+        token = match.group()
+        pos = match.end()
+
+        if token in ("{", "["):
+            depth += 1
+        elif token in ("}", "]"):
+            depth -= 1
+        elif depth == 1:
+            # トップレベルの文字列のうち、直後が ":" のものがキー
+            colon = _WHITESPACE.match(text, pos).end()
+            if colon < len(text) and text[colon] == ":":
+                key = json.loads(token)
+                if key in keys:
+                    start = _WHITESPACE.match(text, colon + 1).end()
+                    result[key], pos = decoder.raw_decode(text, start)
+
+    return result
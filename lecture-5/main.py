@@ -1,11 +1,25 @@
 """
 気象庁API天気予報アプリケーション (Flet版)
 """
+import os
+import sys
+
+# lecture-6 と共有するモジュール（http_cache, ui_tasks, ui_render, ui_cache）を import できるようにする。
+# lecture-6 には main.py や benchmark.py など同じ名前のモジュールがあるので、
+# lecture-5 のモジュールが優先されるようパスの末尾に追加する
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lecture-6"))
+
 import flet as ft
 from api import JMAWeatherAPI
+from area_catalog import AreaCatalog
 from datetime import datetime
 from typing import Optional, List, Dict
 
+# lecture-6 のモジュール（api の import に頼らず、上で追加したパスから読み込む）
+from ui_tasks import BackgroundTasks, UIMetrics
+from ui_render import KeyedList, RenderItem
+from ui_cache import ForecastCache
+
 
 class WeatherForecastApp:
     """天気予報アプリケーションクラス"""
@@ -17,8 +31,8 @@ class WeatherForecastApp:
         self.page.padding = 20
         
         # データ
-        self.area_data = None
         self.areas = []
+        self.catalog = AreaCatalog()
         self.selected_area_code = None
         
         # UI コンポーネント
@@ -27,6 +41,13 @@ class WeatherForecastApp:
         self.loading_indicator = None
         self.error_text = None
         self.weather_container = None
+
+        # 通信はワーカースレッドで行い、古くなった結果は捨てる
+        self.tasks = BackgroundTasks(self.page)
+        self.metrics = UIMetrics()
+
+        # 最近表示した地域の予報（HTTPキャッシュと同じく10分で期限切れ）
+        self.forecast_cache = ForecastCache(ttl=600)
         
         # 初期化
         self.setup_ui()
@@ -62,6 +83,7 @@ class WeatherForecastApp:
             hint_text="地域を選択してください",
             width=400,
             disabled=True,
+            on_change=self.on_area_changed,
         )
         
         self.get_weather_btn = ft.ElevatedButton(
@@ -106,9 +128,11 @@ class WeatherForecastApp:
             margin=ft.margin.only(bottom=20),
         )
         
-        # 天気予報表示エリア
+        # 天気予報表示エリア（表示中の範囲だけ作り、変わったカードだけ送る）
+        self.weather_list = ft.ListView(spacing=15, height=700, on_scroll_interval=100)
+        self.weather_items = KeyedList(self.weather_list, batch_size=10)
         self.weather_container = ft.Container(
-            content=ft.Column([], spacing=15),
+            content=self.weather_list,
             visible=False,
         )
         
@@ -143,20 +167,37 @@ class WeatherForecastApp:
         )
     
     def load_area_list(self):
-        """地域リストを読み込む"""
-        self.show_loading(True)
+        """地域リストを読み込む（保存済みのスナップショットを先に表示し、裏で更新）"""
         self.hide_error()
         
-        # APIから地域リストを取得
-        self.area_data = JMAWeatherAPI.fetch_area_list()
-        
-        if self.area_data:
-            self.areas = JMAWeatherAPI.format_area_data(self.area_data)
+        # ネットワークを待たずにスナップショットから表示
+        if self.catalog.load():
+            self.areas = self.catalog.areas("centers")
             self.populate_area_dropdown()
-            self.show_loading(False)
         else:
+            # 初回起動時だけは取得を待つ
+            self.show_loading(True)
+        
+        # 最新の地域リストをバックグラウンドで取得（通常の処理とは別にキャンセルされないよう直接実行）
+        self.page.run_thread(self.refresh_area_list)
+    
+    def refresh_area_list(self):
+        """地域リストを取得し、内容が変わっていたらドロップダウンを作り直す（ワーカースレッド）"""
+        waiting = not self.areas
+        try:
+            changed = self.catalog.refresh()
+        except Exception as e:
+            print(f"地域リスト更新エラー: {e}")
+            changed = False
+        
+        if changed:
+            self.areas = self.catalog.areas("centers")
+            self.populate_area_dropdown()
+        
+        if waiting:
             self.show_loading(False)
-            self.show_error("地域リストの取得に失敗しました。")
+            if not self.areas:
+                self.show_error("地域リストの取得に失敗しました。")
     
     def populate_area_dropdown(self):
         """ドロップダウンに地域を追加"""
@@ -170,6 +211,11 @@ class WeatherForecastApp:
     def on_area_changed(self, e):
         """地域選択時の処理"""
         self.selected_area_code = self.area_dropdown.value
+
+        # 取得中に地域が変わったら、その結果は表示しない
+        self.tasks.cancel()
+        self.show_loading(False)
+
         self.get_weather_btn.disabled = not bool(self.selected_area_code)
         self.get_weather_btn.update()
     
@@ -182,20 +228,41 @@ class WeatherForecastApp:
         self.load_weather_forecast()
     
     def load_weather_forecast(self):
-        """天気予報を読み込む"""
+        """天気予報を読み込む（通信はワーカースレッドで実行）"""
+        started = self.metrics.start()
         self.show_loading(True)
         self.hide_error()
         self.hide_weather_display()
-        
-        # APIから天気予報を取得
-        forecast_data = JMAWeatherAPI.fetch_weather_forecast(self.selected_area_code)
-        
-        if forecast_data:
-            self.display_weather_forecast(forecast_data)
-            self.show_loading(False)
-        else:
+
+        area_code = self.selected_area_code
+
+        # 最近表示した地域なら、通信せずにすぐ表示
+        cached = self.forecast_cache.get(area_code)
+        self.metrics.cache_stats("forecast_cache", self.forecast_cache.stats())
+        if cached is not None:
+            self.tasks.cancel()
+            self.display_weather_forecast(cached)
             self.show_loading(False)
-            self.show_error("天気予報の取得に失敗しました。")
+            self.metrics.painted("load_weather_forecast", started)
+            self.metrics.handler_done("load_weather_forecast", started)
+            return
+
+        def work(token):
+            # APIから天気予報を取得
+            return JMAWeatherAPI.fetch_weather_forecast(area_code)
+
+        def done(forecast_data):
+            if forecast_data:
+                self.forecast_cache.put(area_code, None, forecast_data)
+                self.display_weather_forecast(forecast_data)
+                self.show_loading(False)
+                self.metrics.painted("load_weather_forecast", started)
+            else:
+                self.show_loading(False)
+                self.show_error("天気予報の取得に失敗しました。")
+
+        self.tasks.submit(work, done)
+        self.metrics.handler_done("load_weather_forecast", started)
     
     def display_weather_forecast(self, data: List[Dict]):
         """天気予報を表示"""
@@ -203,34 +270,42 @@ class WeatherForecastApp:
             self.show_error("天気予報データが見つかりませんでした。")
             return
         
+        started = self.metrics.start()
         forecast = data[0]
-        selected_area_name = next(
-            (area["name"] for area in self.areas if area["code"] == self.selected_area_code),
-            "不明"
-        )
-        
-        # コンテンツをクリア
-        self.weather_container.content.controls.clear()
-        
-        # タイトル
-        title = ft.Text(
-            f"{selected_area_name}の天気予報",
-            size=24,
-            weight=ft.FontWeight.BOLD,
-        )
+        selected_area_name = self.catalog.name(self.selected_area_code, "不明")
+        publishing_office = forecast.get('publishingOffice', '不明')
+        report_datetime = forecast.get('reportDatetime')
+        
+        # タイトル・発表情報・時系列ごとの見出しと地域ごとのカード
+        items = [
+            RenderItem("title", selected_area_name, lambda: ft.Text(
+                f"{selected_area_name}の天気予報",
+                size=24,
+                weight=ft.FontWeight.BOLD,
+            )),
+            RenderItem("info", (publishing_office, report_datetime),
+                       lambda: self.create_info_card(publishing_office, report_datetime)),
+        ]
+        for index, series in enumerate(forecast.get("timeSeries", [])):
+            items.extend(self.time_series_items(series, index))
         
-        # 発表情報
-        info_card = ft.Card(
+        stats = self.weather_items.render(items)
+        self.show_weather_display()
+        self.metrics.rendered("display_weather_forecast", stats, started)
+    
+    def create_info_card(self, publishing_office: str, report_datetime: Optional[str]) -> ft.Card:
+        """発表情報カードを作成"""
+        return ft.Card(
             content=ft.Container(
                 content=ft.Column([
                     ft.Row([
                         ft.Icon(ft.icons.BUSINESS, color=ft.Colors.BLUE_700),
-                        ft.Text(f"発表元 {forecast.get('publishingOffice', '不明')}", size=14),
+                        ft.Text(f"発表元 {publishing_office}", size=14),
                     ]),
                     ft.Row([
                         ft.Icon(ft.icons.ACCESS_TIME, color=ft.Colors.BLUE_700),
                         ft.Text(
-                            f"発表日時 {self.format_datetime(forecast.get('reportDatetime'))}",
+                            f"発表日時 {self.format_datetime(report_datetime)}",
                             size=14
                         ),
                     ]),
@@ -238,40 +313,43 @@ class WeatherForecastApp:
                 padding=15,
             ),
         )
-        
-        self.weather_container.content.controls.extend([title, info_card])
-        
-        # 時系列データを表示
-        if "timeSeries" in forecast:
-            for index, series in enumerate(forecast["timeSeries"]):
-                card = self.create_time_series_card(series, index)
-                self.weather_container.content.controls.append(card)
-        
-        self.show_weather_display()
     
-    def create_time_series_card(self, series: Dict, index: int) -> ft.Card:
-        """時系列カードを作成"""
+    def time_series_items(self, series: Dict, index: int) -> List[RenderItem]:
+        """時系列の見出しと、府県内の地域ごとのカード"""
         titles = ["天気予報", "降水確率・気温", "週間予報"]
         title = titles[index] if index < len(titles) else f"予報 {index + 1}"
+        time_defines = series.get("timeDefines", [])
         
+        items = [RenderItem(("series", index), title, lambda: ft.Container(
+            content=ft.Text(title, size=18, weight=ft.FontWeight.BOLD),
+            bgcolor=ft.Colors.BLUE_50,
+            padding=10,
+            border_radius=10,
+        ))]
+        
+        # 府県内のすべての地域（一次細分区域・気温の観測地点）を表示
+        for area in series.get("areas", []):
+            code = area.get("area", {}).get("code")
+            items.append(RenderItem(
+                ("area", index, code),
+                repr((time_defines, area)),
+                lambda area=area: self.create_area_card(area, time_defines),
+            ))
+        return items
+    
+    def create_area_card(self, area: Dict, time_defines: List[str]) -> ft.Card:
+        """1地域分の時系列カードを作成"""
+        area_name = area.get("area", {}).get("name", "不明")
         card_content = ft.Column([
             ft.Container(
-                content=ft.Text(title, size=18, weight=ft.FontWeight.BOLD),
-                bgcolor=ft.Colors.BLUE_50,
-                padding=10,
-                border_radius=ft.border_radius.only(top_left=10, top_right=10),
+                content=ft.Text(area_name, size=16, weight=ft.FontWeight.BOLD),
+                padding=ft.padding.only(left=15, top=10, bottom=5),
             ),
         ], spacing=0)
         
-        time_defines = series.get("timeDefines", [])
-        areas = series.get("areas", [])
-        
-        if areas:
-            area = areas[0]
-            
-            for time_index, time in enumerate(time_defines):
-                forecast_item = self.create_forecast_item(area, time_index, time)
-                card_content.controls.append(forecast_item)
+        for time_index, time in enumerate(time_defines):
+            forecast_item = self.create_forecast_item(area, time_index, time)
+            card_content.controls.append(forecast_item)
         
         return ft.Card(
             content=ft.Container(
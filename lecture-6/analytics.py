@@ -0,0 +1,248 @@
+"""
+予報履歴（weather_forecasts）の集計
+
+- temperature_trends: 地方ごと・予報日ごとの最低/最高気温（最新予報から）
+- rainfall_distribution: 地方ごとの降水確率の分布（履歴全体を id の範囲ごとに分けて集計）
+- forecast_drift: 予報日 D の予報が、取得のたびにどれだけ変わったか（エリアごと）
+- load_columns: 履歴の列を配列で読み込む（NumPy があれば numpy.ndarray）
+
+履歴全体を読む集計は chunk_rows 行ずつのクエリに分けるので、アプリの書き込みを
+長く止めない。予報日で絞る集計（全エリアの drift）用のカバリングインデックスは、
+書き込みのたびに維持するコストがかかるので、create_indexes() で明示的に作る。
+
+使い方:
+    python analytics.py index
+    python analytics.py trends
+    python analytics.py rainfall
+    python analytics.py drift 2025-01-01 [--area 130010]
+"""
+import argparse
+from array import array
+
+from db import WeatherDatabase
+
+try:
+    import numpy as np
+except ImportError:  # 任意の依存
+    np = None
+
+# load_columns で読める列と、NumPy / array の型
+COLUMN_TYPES = {
+    "id": ("int64", "q"),
+    "temperature_min": ("float64", "d"),
+    "temperature_max": ("float64", "d"),
+    "rainfall_probability": ("float64", "d"),
+}
+
+
+class ForecastAnalytics:
+    """予報履歴の集計クエリ"""
+
+    def __init__(self, db, chunk_rows=200_000):
+        self.db = db
+        self.chunk_rows = chunk_rows
+
+    def create_indexes(self):
+        """予報日で絞る集計用のインデックス（必要な列をすべて含め、表を読まずに済ませる）
+
+        予報の保存のたびにこのインデックスも更新されるので、集計をよく使うときだけ作る。
+        """
+        with self.db.get_connection() as conn:
+            conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_weather_forecasts_date_area_fetch
+            ON weather_forecasts (forecast_date, area_id, fetch_timestamp,
+                                  temperature_min, temperature_max, rainfall_probability)
+            ''')
+
+    def _id_chunks(self):
+        """履歴の id を chunk_rows ごとの範囲 (開始, 終了) に分ける"""
+        with self.db.get_connection() as conn:
+            low, high = conn.execute("SELECT MIN(id), MAX(id) FROM weather_forecasts").fetchone()
+        if low is None:
+            return
+        for start in range(low, high + 1, self.chunk_rows):
+            yield start, start + self.chunk_rows - 1
+
+    def temperature_trends(self, start_date=None, end_date=None):
+        """地方ごと・予報日ごとの気温（最新予報のエリア間の最小・平均・最大）"""
+        with self.db.get_connection() as conn:
+            rows = conn.execute('''
+            SELECT a.region, l.forecast_date,
+                   MIN(l.temperature_min) AS low_min,
+                   AVG(l.temperature_min) AS low_avg,
+                   MAX(l.temperature_max) AS high_max,
+                   AVG(l.temperature_max) AS high_avg,
+                   COUNT(*) AS areas
+            FROM latest_forecasts l
+            JOIN areas a ON a.area_id = l.area_id
+            WHERE l.forecast_date >= COALESCE(?, l.forecast_date)
+              AND l.forecast_date <= COALESCE(?, l.forecast_date)
+            GROUP BY a.region, l.forecast_date
+            ORDER BY a.region, l.forecast_date
+            ''', (start_date, end_date)).fetchall()
+        return [dict(row) for row in rows]
+
+    def rainfall_distribution(self, bucket=10):
+        """地方ごとの降水確率の分布（region -> 区間ごとの件数のリスト）
+
+        区間は [0, bucket), [bucket, 2*bucket), ... , [100, 100]。
+        """
+        buckets = 100 // bucket + 1
+        distribution = {}
+        with self.db.get_connection() as conn:
+            regions = dict(conn.execute("SELECT area_id, region FROM areas").fetchall())
+
+        for start, end in self._id_chunks():
+            with self.db.get_connection() as conn:
+                rows = conn.execute('''
+                SELECT area_id, CAST(rainfall_probability / ? AS INTEGER) AS b, COUNT(*)
+                FROM weather_forecasts
+                WHERE id BETWEEN ? AND ? AND rainfall_probability IS NOT NULL
+                GROUP BY area_id, b
+                ''', (bucket, start, end)).fetchall()
+            for area_id, b, count in rows:
+                counts = distribution.setdefault(regions.get(area_id, "不明"), [0] * buckets)
+                counts[min(b, buckets - 1)] += count
+
+        return distribution
+
+    def forecast_drift(self, forecast_date, area_id=None):
+        """予報日 forecast_date の予報が、取得のたびにどれだけ変わったか（エリアごと）
+
+        Returns:
+            list: エリアごとの辞書
+                area_id, fetches（取得回数）, changes（前回から値が変わった回数）,
+                first_fetch / last_fetch（最初と最後の取得日時）,
+                first_* / last_*（最初と最後の最低気温 min・最高気温 max・降水確率 pop）,
+                *_delta（最後 - 最初。どちらかが NULL なら NULL）,
+                low_min / low_max, high_min / high_max（最低気温・最高気温の取得ごとの最小・最大）
+        """
+        # 1エリアなら UNIQUE (area_id, forecast_date, ...) のインデックスで絞れる
+        where = "forecast_date = ?" + (" AND area_id = ?" if area_id is not None else "")
+        params = (forecast_date,) if area_id is None else (forecast_date, area_id)
+        with self.db.get_connection() as conn:
+            rows = conn.execute(f'''
+            WITH series AS (
+                SELECT area_id, fetch_timestamp, temperature_min, temperature_max,
+                       rainfall_probability,
+                       LAG(temperature_min) OVER w AS prev_min,
+                       LAG(temperature_max) OVER w AS prev_max,
+                       LAG(rainfall_probability) OVER w AS prev_pop,
+                       ROW_NUMBER() OVER w AS rn,
+                       COUNT(*) OVER (PARTITION BY area_id) AS fetches
+                FROM weather_forecasts
+                WHERE {where}
+                WINDOW w AS (PARTITION BY area_id ORDER BY fetch_timestamp)
+            ),
+            summary AS (
+                SELECT area_id,
+                       MAX(fetches) AS fetches,
+                       SUM(rn > 1 AND (temperature_min IS NOT prev_min
+                                       OR temperature_max IS NOT prev_max
+                                       OR rainfall_probability IS NOT prev_pop)) AS changes,
+                       MIN(fetch_timestamp) AS first_fetch,
+                       MAX(fetch_timestamp) AS last_fetch,
+                       MAX(CASE WHEN rn = 1 THEN temperature_min END) AS first_min,
+                       MAX(CASE WHEN rn = fetches THEN temperature_min END) AS last_min,
+                       MAX(CASE WHEN rn = 1 THEN temperature_max END) AS first_max,
+                       MAX(CASE WHEN rn = fetches THEN temperature_max END) AS last_max,
+                       MAX(CASE WHEN rn = 1 THEN rainfall_probability END) AS first_pop,
+                       MAX(CASE WHEN rn = fetches THEN rainfall_probability END) AS last_pop,
+                       MIN(temperature_min) AS low_min,
+                       MAX(temperature_min) AS low_max,
+                       MIN(temperature_max) AS high_min,
+                       MAX(temperature_max) AS high_max
+                FROM series
+                GROUP BY area_id
+            )
+            SELECT *,
+                   last_min - first_min AS min_delta,
+                   last_max - first_max AS max_delta,
+                   last_pop - first_pop AS pop_delta
+            FROM summary
+            ORDER BY area_id
+            ''', params).fetchall()
+        return [dict(row) for row in rows]
+
+    def load_columns(self, columns, forecast_date=None):
+        """履歴の列を配列で返す（NumPy があれば numpy.ndarray、なければ array.array）
+
+        NULL は NaN になる（id は NULL にならない）。
+        """
+        for column in columns:
+            if column not in COLUMN_TYPES:
+                raise ValueError(f"読み込めない列です: {column}")
+
+        select = ", ".join(columns)
+        values = {column: array(COLUMN_TYPES[column][1]) for column in columns}
+        nan = float("nan")
+
+        if forecast_date is not None:
+            chunks = [None]
+        else:
+            chunks = self._id_chunks()
+
+        for chunk in chunks:
+            with self.db.get_connection() as conn:
+                if chunk is None:
+                    cursor = conn.execute(
+                        f"SELECT {select} FROM weather_forecasts WHERE forecast_date = ?",
+                        (forecast_date,),
+                    )
+                else:
+                    cursor = conn.execute(
+                        f"SELECT {select} FROM weather_forecasts WHERE id BETWEEN ? AND ?",
+                        chunk,
+                    )
+                rows = cursor.fetchall()
+            for i, column in enumerate(columns):
+                column_values = [row[i] for row in rows]
+                if None in column_values:
+                    column_values = [nan if value is None else value for value in column_values]
+                values[column].fromlist(column_values)
+
+        if np is None:
+            return values
+        return {column: np.frombuffer(values[column], dtype=COLUMN_TYPES[column][0])
+                for column in columns}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="予報履歴の集計")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("index", help="予報日で絞る集計用のインデックスを作る")
+    sub.add_parser("trends", help="地方ごと・予報日ごとの気温")
+    sub.add_parser("rainfall", help="地方ごとの降水確率の分布")
+    drift = sub.add_parser("drift", help="予報日ごとの予報の変化")
+    drift.add_argument("date", help="予報日（YYYY-MM-DD）")
+    drift.add_argument("--area", default=None, help="エリアID")
+    args = parser.parse_args()
+
+    db = WeatherDatabase(verbose=False)
+    analytics = ForecastAnalytics(db)
+
+    if args.command == "index":
+        analytics.create_indexes()
+        print("インデックスを作成しました")
+    elif args.command == "trends":
+        for row in analytics.temperature_trends():
+            print(f"{row['region']} {row['forecast_date']}: 最低 {row['low_min']}℃"
+                  f"（平均 {row['low_avg'] or 0:.1f}） 最高 {row['high_max']}℃"
+                  f"（平均 {row['high_avg'] or 0:.1f}） {row['areas']}エリア")
+    elif args.command == "rainfall":
+        for region, counts in analytics.rainfall_distribution().items():
+            total = sum(counts) or 1
+            print(f"{region}: " + " ".join(f"{count / total:.0%}" for count in counts))
+    else:
+        for row in analytics.forecast_drift(args.date, args.area):
+            print(f"{row['area_id']}: 取得 {row['fetches']}回 変化 {row['changes']}回 "
+                  f"最低 {row['first_min']} -> {row['last_min']} "
+                  f"最高 {row['first_max']} -> {row['last_max']} "
+                  f"降水確率 {row['first_pop']} -> {row['last_pop']} "
+                  f"(差 {row['min_delta']} / {row['max_delta']} / {row['pop_delta']})")
+
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
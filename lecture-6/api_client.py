@@ -1,22 +1,137 @@
 import requests
-import json
-from datetime import datetime
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from requests.adapters import HTTPAdapter
+
+from forecast_parser import ForecastParser
+from http_cache import shared_cache
+
+# 一時的な障害とみなして再試行するステータスコード
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+# area.json の地域コード -> 予報JSONの府県予報区コード（気象庁 area.json の class10s の parent）
+# コードの先頭3桁から機械的には求められない（014010 釧路 -> 014100 釧路・根室地方 など）
+OFFICE_CODES = {
+    # 北海道
+    "011000": "011000", "012010": "012000", "013010": "013000", "014010": "014100",
+    "015010": "015000",
+    # 東北
+    "020010": "020000", "030010": "030000", "040010": "040000", "050010": "050000",
+    "060010": "060000", "070010": "070000",
+    # 関東
+    "080010": "080000", "090010": "090000", "100010": "100000", "110010": "110000",
+    "120010": "120000", "130010": "130000", "140010": "140000",
+    # 中部
+    "150010": "150000", "160010": "160000", "170010": "170000", "180010": "180000",
+    "190010": "190000", "200010": "200000", "210010": "210000", "220010": "220000",
+    "230010": "230000",
+    # 近畿
+    "240010": "240000", "250010": "250000", "260010": "260000", "270000": "270000",
+    "280010": "280000", "290010": "290000", "300010": "300000",
+    # 中国
+    "310010": "310000", "320010": "320000", "330010": "330000", "340010": "340000",
+    "350010": "350000",
+    # 四国
+    "360010": "360000", "370000": "370000", "380010": "380000", "390010": "390000",
+    # 九州
+    "400010": "400000", "410010": "410000", "420010": "420000", "430010": "430000",
+    "440010": "440000", "450010": "450000", "460010": "460100", "471010": "471000",
+}
+
+
+def office_code(area_id):
+    """地域コードから、予報JSONの府県予報区コードを求める
+
+    例: 130010（東京地方）-> 130000（東京都）、460010（鹿児島）-> 460100（鹿児島県（奄美地方除く））
+    表にないコードは、府県予報区コードとしてそのまま使う。
+    """
+    return OFFICE_CODES.get(area_id, area_id)
+
+
+def group_by_office(area_ids):
+    """地域コードを府県予報区ごとにまとめる（office -> [area_id, ...]）"""
+    offices = {}
+    for area_id in area_ids:
+        offices.setdefault(office_code(area_id), []).append(area_id)
+    return offices
+
 
 class WeatherAPIClient:
-    def __init__(self):
+    def __init__(self, forecast_url="https://www.jma.go.jp/bosai/forecast/data/forecast/",
+                 overview_url="https://www.jma.go.jp/bosai/forecast/data/overview_forecast/",
+                 max_workers=8, per_host_limit=4, max_retries=2, backoff=0.5, timeout=10,
+                 use_cache=True, cache=None):
         # 複数のエンドポイントを保持
-        self.forecast_url = "https://www.jma.go.jp/bosai/forecast/data/forecast/"
-        self.overview_url = "https://www.jma.go.jp/bosai/forecast/data/overview_forecast/"
-        
+        self.forecast_url = forecast_url
+        self.overview_url = overview_url
+
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+
+        # Keep-Aliveで接続を使い回す共有セッション
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        # 条件付きGETつきのHTTPキャッシュ（lecture-5と共有）
+        if cache is None and use_cache:
+            cache = shared_cache()
+        self.cache = cache
+
+        self.parser = ForecastParser()
+
+        # ホストごとの同時接続数の上限
+        self.per_host_limit = per_host_limit
+        self._host_semaphores = {}
+        self._host_lock = threading.Lock()
+
+    def _host_semaphore(self, url):
+        """URLのホストに対応するセマフォを返す"""
+        host = urlsplit(url).netloc
+        with self._host_lock:
+            if host not in self._host_semaphores:
+                self._host_semaphores[host] = threading.BoundedSemaphore(self.per_host_limit)
+            return self._host_semaphores[host]
+
+    def _request(self, url):
+        """ホストごとの同時接続数を守りつつ、一時的な障害は指数バックオフで再試行"""
+        semaphore = self._host_semaphore(url)
+
+        def send(headers):
+            with semaphore:
+                return self.session.get(url, headers=headers, timeout=self.timeout)
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.cache.get(url, send) if self.cache is not None else send({})
+                if response.status_code not in RETRY_STATUS_CODES or attempt == self.max_retries:
+                    return response
+                print(f"一時的なエラー({response.status_code})のため再試行します: {url}")
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if attempt == self.max_retries:
+                    raise
+                print(f"接続エラーのため再試行します: {url}")
+
+            # 0.5s, 1s, 2s ... にジッターを加えて待つ
+            time.sleep(self.backoff * (2 ** attempt) * (0.5 + random.random()))
+
     def get_weather(self, area_id):
         """気象庁APIから天気予報データを取得"""
         try:
-            # まず従来のエンドポイントを試す
-            url = f"http://www.jma.go.jp/bosai/forecast/data/forecast/{area_id}.json"
+            # まず府県予報区の予報を試す（1回で府県内のすべての地域が含まれる）
+            url = f"{self.forecast_url}{office_code(area_id)}.json"
             print(f"APIリクエスト1: {url}")
-            
-            response = requests.get(url, timeout=10)
-            
+
+            response = self._request(url)
+
             # 失敗した場合は別のエンドポイントを試す
             if response.status_code != 200:
                 print(f"最初のエンドポイントが失敗しました。別のエンドポイントを試します。")
@@ -24,114 +139,81 @@ class WeatherAPIClient:
                 area_prefix = area_id[:2]
                 url2 = f"{self.overview_url}{area_prefix}.json"
                 print(f"APIリクエスト2: {url2}")
-                
-                response = requests.get(url2, timeout=10)
-                
+
+                response = self._request(url2)
+
                 # さらに失敗した場合、別の形式も試す
                 if response.status_code != 200:
                     url3 = f"{self.overview_url}{area_id}.json"
                     print(f"APIリクエスト3: {url3}")
-                    response = requests.get(url3, timeout=10)
-            
+                    response = self._request(url3)
+
             print(f"ステータスコード: {response.status_code}")
             if response.status_code != 200:
                 print(f"エラーレスポンス: {response.text[:200]}")
                 return None
-                
+
             # 成功した場合はJSONを返す
             return response.json()
-            
+
         except requests.exceptions.RequestException as e:
             print(f"API接続エラー: {e}")
             if hasattr(e, 'response') and e.response is not None:
                 print(f"レスポンスステータス: {e.response.status_code}")
                 print(f"レスポンス内容: {e.response.text[:200]}")
             return None
-    
+
+    def get_weather_many(self, area_ids):
+        """複数エリアの天気予報をスレッドプールで並行取得
+
+        Returns:
+            dict: area_id -> JSONデータ（失敗時はNone）
+        """
+        area_ids = list(dict.fromkeys(area_ids))  # 重複を除く（順序は維持）
+        if not area_ids:
+            return {}
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(area_ids))) as executor:
+            results = executor.map(self.get_weather, area_ids)
+            return dict(zip(area_ids, results))
+
+    def get_forecasts_by_office(self, area_ids):
+        """エリアを府県予報区ごとにまとめて取得し、レスポンス内の全地域の予報を返す
+
+        Returns:
+            dict: office -> (JSONデータ, 予報のリスト)。取得に失敗した府県予報区はJSONがNone
+        """
+        offices = group_by_office(area_ids)
+        responses = self.get_weather_many(offices)
+        return {
+            office: (json_data, self.parse_all_areas(json_data, offices[office]))
+            for office, json_data in responses.items()
+        }
+
+    def parse_all_areas(self, json_data, area_ids=()):
+        """レスポンス内のすべての地域の予報を返す
+
+        area_ids のうちレスポンスに含まれないもの（概況形式など）には、
+        parse_weather_data と同じく先頭の地域の予報を割り当てる。
+        """
+        records = [record for record in self.parser.parse(json_data) if record.area_id]
+        codes = {record.area_id for record in records}
+        for area_id in area_ids:
+            if area_id not in codes:
+                records.extend(self.parse_weather_data(json_data, area_id))
+        return records
+
     def parse_weather_data(self, json_data, area_id):
-        """APIレスポンスを解析して必要なデータを抽出"""
-        if not json_data:
+        """APIレスポンスを解析して、指定エリアの予報を抽出"""
+        records = self.parser.parse(json_data)
+        if not records:
+            if json_data:
+                print(f"天気データの解析エラー: 予報が見つかりません（{area_id}）")
             return []
-            
-        # APIのレスポンス形式によって処理を分岐
-        forecasts = []
-        
-        try:
-            # 従来のフォーマットを試す
-            if isinstance(json_data, list) and len(json_data) > 0:
-                # 従来のフォーマット
-                forecast_data = json_data[0]
-                
-                # エリア名を取得
-                area_name = forecast_data["timeSeries"][0]["areas"][0]["area"]["name"]
-                
-                # 天気コードと天気テキスト
-                weathers = forecast_data["timeSeries"][0]["areas"][0]["weatherCodes"]
-                weather_texts = forecast_data["timeSeries"][0]["areas"][0]["weathers"]
-                
-                # 最高・最低気温
-                try:
-                    temps = forecast_data["timeSeries"][2]["areas"][0]["temps"]
-                    min_temps = [temps[i] if i % 2 == 0 else None for i in range(len(temps))]
-                    max_temps = [temps[i] if i % 2 == 1 else None for i in range(len(temps))]
-                except (IndexError, KeyError):
-                    min_temps = [None] * len(weathers)
-                    max_temps = [None] * len(weathers)
-                
-                # 降水確率
-                try:
-                    rain_probs = forecast_data["timeSeries"][1]["areas"][0]["pops"]
-                except (IndexError, KeyError):
-                    rain_probs = [None] * len(weathers)
-                    
-                # 日付
-                dates = forecast_data["timeSeries"][0]["timeDefines"]
-                
-                # データを結合
-                for i in range(len(weathers)):
-                    date_str = datetime.fromisoformat(dates[i].replace('Z', '+00:00')).strftime('%Y-%m-%d')
-                    
-                    forecast = {
-                        "area_id": area_id,
-                        "area_name": area_name,
-                        "forecast_date": date_str,
-                        "weather_code": weathers[i],
-                        "weather_text": weather_texts[i],
-                        "temperature_min": min_temps[i] if i < len(min_temps) and min_temps[i] != "" else None,
-                        "temperature_max": max_temps[i] if i < len(max_temps) and max_temps[i] != "" else None,
-                        "rainfall_probability": rain_probs[i] if i < len(rain_probs) and rain_probs[i] != "" else None
-                    }
-                    
-                    forecasts.append(forecast)
-            
-            # 新しいフォーマットの場合
-            elif "targetArea" in json_data and "text" in json_data:
-                # 新しいフォーマット（overview_forecast形式）
-                area_name = json_data.get("targetArea", "不明")
-                forecast_text = json_data.get("text", "情報がありません")
-                report_date = json_data.get("reportDatetime", "")
-                
-                if report_date:
-                    date_obj = datetime.fromisoformat(report_date.replace('Z', '+00:00'))
-                    date_str = date_obj.strftime('%Y-%m-%d')
-                else:
-                    date_str = datetime.now().strftime('%Y-%m-%d')
-                
-                forecast = {
-                    "area_id": area_id,
-                    "area_name": area_name,
-                    "forecast_date": date_str,
-                    "weather_code": "000",  # 代替コード
-                    "weather_text": forecast_text,
-                    "temperature_min": None,
-                    "temperature_max": None,
-                    "rainfall_probability": None
-                }
-                
-                forecasts.append(forecast)
-        
-        except Exception as e:
-            print(f"天気データの解析エラー: {e}")
-            print(f"JSON形式: {json_data}")
-        
-        return forecasts
\ No newline at end of file
+
+        # 要求したエリアのコードがなければ、従来通り先頭の地域を使う
+        target = area_id if any(record.area_id == area_id for record in records) else records[0].area_id
+        forecasts = [record for record in records if record.area_id == target]
+        for record in forecasts:
+            record.area_id = area_id
+        return forecasts
@@ -0,0 +1,882 @@
+"""
+天気予報DBまわりのベンチマーク
+
+使い方:
+    python benchmark.py pool [--ops 2000]
+    python benchmark.py ingest [--rows 2000]
+    python benchmark.py concurrency [--readers 4] [--seconds 3]
+    python benchmark.py latest [--rows 10000000] [--queries 200]
+    python benchmark.py fetch [--latency 0.2] [--error-rate 0.1]
+    python benchmark.py cache [--latency 0.2]
+    python benchmark.py dedup [--days 7] [--poll-minutes 10]
+    python benchmark.py parse [--iterations 2000]
+    python benchmark.py sweep [--latency 0.05]
+    python benchmark.py startup [--launches 20]
+    python benchmark.py render [--cards 200] [--refreshes 50]
+    python benchmark.py switch [--rows 1000000] [--switches 2000]
+    python benchmark.py prefetch [--latency 0.2] [--think 0.5] [--views 20] [--budget 2]
+    python benchmark.py analytics [--rows 2000000]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+from db import WeatherDatabase, area_rows
+
+
+def run_ops(db, ops):
+    """insert/get を混ぜた操作を ops 回実行して ops/sec を返す"""
+    db.insert_area("130010", "東京", "関東", 0)
+    # fetch_timestamp は秒単位なので、UNIQUE制約に当たらないよう日付を毎回ずらす
+    base = date(2025, 1, 1)
+
+    start = time.perf_counter()
+    for i in range(ops):
+        forecast_date = (base + timedelta(days=i // 2)).isoformat()
+        if i % 2 == 0:
+            db.insert_forecast("130010", forecast_date, "100", "晴れ", 5.0, 12.0, 10)
+        else:
+            db.get_forecast("130010", forecast_date)
+    elapsed = time.perf_counter() - start
+    return ops / elapsed
+
+
+def bench_pool(args):
+    """接続の都度開閉（従来）とコネクションプールの比較"""
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {}
+        for label, pool_size in (("connect-per-call", 0), ("pool", 4)):
+            db = WeatherDatabase(os.path.join(tmp, f"{label}.db"), pool_size=pool_size)
+            results[label] = run_ops(db, args.ops)
+            db.close()
+
+    for label, ops_per_sec in results.items():
+        print(f"{label:>18}: {ops_per_sec:10.1f} ops/sec")
+    print(f"{'speedup':>18}: {results['pool'] / results['connect-per-call']:10.2f}x")
+
+
+def make_forecast_rows(count, area_id="130010"):
+    """parse_weather_data と同じ形式のダミー予報行を作る"""
+    base = date(2025, 1, 1)
+    return [
+        {
+            "area_id": area_id,
+            "forecast_date": (base + timedelta(days=i)).isoformat(),
+            "weather_code": "100",
+            "weather_text": "晴れ",
+            "temperature_min": 5.0,
+            "temperature_max": 12.0,
+            "rainfall_probability": 10,
+        }
+        for i in range(count)
+    ]
+
+
+def bench_ingest(args):
+    """1行ずつの insert_forecast と insert_forecasts の比較"""
+    rows = make_forecast_rows(args.rows)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = WeatherDatabase(os.path.join(tmp, "row.db"))
+        start = time.perf_counter()
+        for row in rows:
+            db.insert_forecast(row["area_id"], row["forecast_date"], row["weather_code"],
+                               row["weather_text"], row["temperature_min"],
+                               row["temperature_max"], row["rainfall_probability"])
+        per_row = len(rows) / (time.perf_counter() - start)
+        db.close()
+
+        db = WeatherDatabase(os.path.join(tmp, "batch.db"))
+        start = time.perf_counter()
+        db.insert_forecasts(rows)
+        batch = len(rows) / (time.perf_counter() - start)
+        db.close()
+
+    print(f"{'insert_forecast':>18}: {per_row:10.1f} rows/sec")
+    print(f"{'insert_forecasts':>18}: {batch:10.1f} rows/sec")
+    print(f"{'speedup':>18}: {batch / per_row:10.2f}x")
+
+
+def percentile(sorted_values, p):
+    """ソート済みリストのパーセンタイル値"""
+    if not sorted_values:
+        return float("nan")
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * p / 100))
+    return sorted_values[index]
+
+
+def run_readers_with_writer(db, readers, seconds):
+    """N本の読み込みスレッドと1本の書き込みスレッドを走らせ、読み込みレイテンシを返す"""
+    stop = threading.Event()
+    latencies = [[] for _ in range(readers)]
+    written = [0]
+
+    def reader(bucket):
+        while not stop.is_set():
+            start = time.perf_counter()
+            db.get_forecast("130010")
+            bucket.append(time.perf_counter() - start)
+
+    def writer():
+        batch = 0
+        while not stop.is_set():
+            # 予報の一括取り込みを模擬（エリアを変えてUNIQUE制約を避ける）
+            written[0] += db.insert_forecasts(make_forecast_rows(200, area_id=f"W{batch}"))
+            batch += 1
+
+    threads = [threading.Thread(target=reader, args=(bucket,)) for bucket in latencies]
+    threads.append(threading.Thread(target=writer))
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    return sorted(value for bucket in latencies for value in bucket), written[0]
+
+
+def bench_concurrency(args):
+    """ストレージプロファイルごとの、書き込み中の読み込みレイテンシ分布"""
+    print(f"readers={args.readers}, writer=1, {args.seconds}s")
+    print(f"{'profile':>8} {'reads':>8} {'p50(ms)':>9} {'p95(ms)':>9} {'p99(ms)':>9} "
+          f"{'max(ms)':>9} {'written':>9}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for profile in ("default", "wal"):
+            db = WeatherDatabase(os.path.join(tmp, f"{profile}.db"),
+                                 pool_size=args.readers + 1,
+                                 storage_profile=profile, verbose=False)
+            db.insert_forecasts(make_forecast_rows(7))
+
+            latencies, written = run_readers_with_writer(db, args.readers, args.seconds)
+            db.close()
+
+            ms = [value * 1000 for value in latencies]
+            print(f"{profile:>8} {len(ms):>8} {percentile(ms, 50):>9.3f} "
+                  f"{percentile(ms, 95):>9.3f} {percentile(ms, 99):>9.3f} "
+                  f"{ms[-1] if ms else float('nan'):>9.3f} {written:>9}")
+
+
+# 最新予報テーブル導入前の get_forecast（日付指定なし）のクエリ
+LEGACY_LATEST_QUERY = '''
+SELECT f1.* FROM weather_forecasts f1
+JOIN (
+    SELECT area_id, forecast_date, MAX(fetch_timestamp) as max_timestamp
+    FROM weather_forecasts
+    WHERE area_id = ?
+    GROUP BY forecast_date
+) f2
+ON f1.area_id = f2.area_id AND f1.forecast_date = f2.forecast_date
+AND f1.fetch_timestamp = f2.max_timestamp
+ORDER BY f1.forecast_date
+'''
+
+
+AREA_JSON_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "area.json")
+
+
+def load_area_rows():
+    """area.json から insert_areas 用の行を作る"""
+    with open(AREA_JSON_PATH, "r", encoding="utf-8") as f:
+        return area_rows(json.load(f))
+
+
+def generate_history(db, rows, days=7):
+    """全エリア×1時間ごとの取得×7日分の予報履歴をSQLで生成（約 rows 行）"""
+    area_count = len(db.get_all_areas())
+    fetches = max(1, rows // (area_count * days))
+
+    with db.get_connection() as conn:
+        conn.execute('''
+        WITH RECURSIVE
+            fetch(k) AS (SELECT 0 UNION ALL SELECT k + 1 FROM fetch WHERE k + 1 < ?),
+            day(d) AS (SELECT 0 UNION ALL SELECT d + 1 FROM day WHERE d + 1 < ?)
+        INSERT INTO weather_forecasts
+        (area_id, forecast_date, weather_code, weather_text, temperature_min,
+         temperature_max, rainfall_probability, fetch_timestamp)
+        SELECT a.area_id,
+               date('2020-01-01', '+' || (k / 24 + d) || ' days'),
+               '100', '晴れ', 5.0 + (k % 7), 12.0 + (k % 5), (k * 10) % 100,
+               datetime('2020-01-01', '+' || k || ' hours')
+        FROM fetch, day, areas a
+        ''', (fetches, days))
+
+    return fetches * area_count * days
+
+
+def time_queries(func, area_ids, queries):
+    """エリアを巡回しながら func を queries 回呼び、1回あたりの平均秒を返す"""
+    start = time.perf_counter()
+    for i in range(queries):
+        func(area_ids[i % len(area_ids)])
+    return (time.perf_counter() - start) / queries
+
+
+def bench_latest(args):
+    """大量の履歴に対する最新予報取得（旧クエリと最新予報テーブル）の比較"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db = WeatherDatabase(os.path.join(tmp, "history.db"), verbose=False)
+        db.insert_areas(load_area_rows())
+        area_ids = [area["area_id"] for area in db.get_all_areas()]
+
+        start = time.perf_counter()
+        total = generate_history(db, args.rows)
+        print(f"履歴 {total:,} 行を生成（{time.perf_counter() - start:.1f}s）")
+
+        def legacy(area_id):
+            with db.get_connection() as conn:
+                return conn.execute(LEGACY_LATEST_QUERY, (area_id,)).fetchall()
+
+        legacy_sec = time_queries(legacy, area_ids, args.queries)
+        latest_sec = time_queries(db.get_forecast, area_ids, args.queries)
+        db.close()
+
+    print(f"{'self-join':>18}: {legacy_sec * 1000:10.3f} ms/query")
+    print(f"{'latest_forecasts':>18}: {latest_sec * 1000:10.3f} ms/query")
+    print(f"{'speedup':>18}: {legacy_sec / latest_sec:10.1f}x")
+
+
+def bench_fetch(args):
+    """スタブサーバーに対する逐次取得と get_weather_many の比較"""
+    from api_client import WeatherAPIClient
+    from stub_server import StubServer
+
+    area_ids = [row["area_id"] for row in load_area_rows()]
+    server = StubServer(latency=args.latency, error_rate=args.error_rate).start()
+    overview_url = server.base_url.replace("/forecast/", "/overview_forecast/")
+
+    try:
+        results = {}
+        for label in ("sequential", "get_weather_many"):
+            client = WeatherAPIClient(forecast_url=server.base_url, overview_url=overview_url,
+                                      max_workers=args.workers, per_host_limit=args.per_host,
+                                      backoff=0.05, use_cache=False)
+            server.request_count = 0
+            start = time.perf_counter()
+            # 1リクエストごとのログは捨てる
+            with contextlib.redirect_stdout(io.StringIO()):
+                if label == "sequential":
+                    fetched = {area_id: client.get_weather(area_id) for area_id in area_ids}
+                else:
+                    fetched = client.get_weather_many(area_ids)
+            elapsed = time.perf_counter() - start
+            ok = sum(1 for data in fetched.values() if data)
+            results[label] = elapsed
+            print(f"{label:>18}: {elapsed:7.2f}s  成功 {ok}/{len(area_ids)}  "
+                  f"リクエスト {server.request_count}")
+    finally:
+        server.stop()
+
+    print(f"{'speedup':>18}: {results['sequential'] / results['get_weather_many']:7.2f}x")
+
+
+def bench_cache(args):
+    """HTTPキャッシュの効果（初回・TTL切れの再検証・TTL内）を測定"""
+    from api_client import WeatherAPIClient
+    from http_cache import HTTPCache
+    from stub_server import StubServer
+
+    area_ids = [row["area_id"] for row in load_area_rows()]
+    server = StubServer(latency=args.latency).start()
+    overview_url = server.base_url.replace("/forecast/", "/overview_forecast/")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = HTTPCache(os.path.join(tmp, "http_cache.db"), ttl=600)
+        client = WeatherAPIClient(forecast_url=server.base_url, overview_url=overview_url,
+                                  cache=cache)
+        try:
+            for label, ttl in (("cold", 600), ("revalidate", 0), ("fresh", 600)):
+                cache.ttl = ttl
+                server.request_count = server.not_modified_count = 0
+                start = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    client.get_weather_many(area_ids)
+                elapsed = time.perf_counter() - start
+                print(f"{label:>12}: {elapsed:7.3f}s  リクエスト {server.request_count:3d}  "
+                      f"304 {server.not_modified_count:3d}")
+        finally:
+            server.stop()
+            print(cache.stats())
+            cache.close()
+
+
+def simulated_report(area_id, report_time, days=7):
+    """発表時刻ごとに内容が変わる、1エリア分の予報行"""
+    seed = sum(map(ord, area_id)) + report_time.day * 3 + report_time.hour
+    first_day = report_time.date()
+    return [
+        {
+            "area_id": area_id,
+            "forecast_date": (first_day + timedelta(days=d)).isoformat(),
+            "weather_code": str(100 + (seed + d) % 3 * 100),
+            "weather_text": ("晴れ", "くもり", "雨")[(seed + d) % 3],
+            "temperature_min": float((seed + d) % 10),
+            "temperature_max": float((seed + d) % 10 + 8),
+            "rainfall_probability": (seed * 7 + d * 10) % 100,
+        }
+        for d in range(days)
+    ]
+
+
+def latest_publish_time(now):
+    """気象庁の定時発表（5時・11時・17時）のうち直近のもの"""
+    for hour in (17, 11, 5):
+        if now.hour >= hour:
+            return now.replace(hour=hour, minute=0, second=0, microsecond=0)
+    previous = now - timedelta(days=1)
+    return previous.replace(hour=17, minute=0, second=0, microsecond=0)
+
+
+def bench_dedup(args):
+    """一定間隔のポーリングを模擬し、重複排除の有無でDBサイズと書き込み量を比較"""
+    area_ids = [row["area_id"] for row in load_area_rows()]
+    polls = args.days * 24 * 60 // args.poll_minutes
+    start_time = datetime(2025, 1, 1, 0, 0, 0)
+    print(f"{len(area_ids)}エリア × {polls}回ポーリング（{args.poll_minutes}分間隔, {args.days}日間）")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for dedup in (False, True):
+            path = os.path.join(tmp, f"dedup_{dedup}.db")
+            db = WeatherDatabase(path, verbose=False)
+            written = 0
+            offered = 0
+
+            start = time.perf_counter()
+            for poll in range(polls):
+                now = start_time + timedelta(minutes=poll * args.poll_minutes)
+                report_time = latest_publish_time(now)
+                rows = [row for area_id in area_ids
+                        for row in simulated_report(area_id, report_time)]
+                offered += len(rows)
+                written += db.insert_forecasts(rows, now.strftime('%Y-%m-%d %H:%M:%S'),
+                                               dedup=dedup)
+            elapsed = time.perf_counter() - start
+
+            with db.get_connection() as conn:
+                conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            db.close()
+            size = os.path.getsize(path)
+
+            label = "dedup" if dedup else "no-dedup"
+            print(f"{label:>10}: 書き込み {written:>8,}/{offered:,} 行  "
+                  f"DBサイズ {size / 1024 / 1024:8.2f} MB  {elapsed:6.2f}s")
+
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def legacy_parse(json_data, area_id):
+    """ForecastParser 導入前の parse_weather_data（比較用）"""
+    forecasts = []
+    try:
+        if isinstance(json_data, list) and len(json_data) > 0:
+            forecast_data = json_data[0]
+            area_name = forecast_data["timeSeries"][0]["areas"][0]["area"]["name"]
+            weathers = forecast_data["timeSeries"][0]["areas"][0]["weatherCodes"]
+            weather_texts = forecast_data["timeSeries"][0]["areas"][0]["weathers"]
+            try:
+                temps = forecast_data["timeSeries"][2]["areas"][0]["temps"]
+                min_temps = [temps[i] if i % 2 == 0 else None for i in range(len(temps))]
+                max_temps = [temps[i] if i % 2 == 1 else None for i in range(len(temps))]
+            except (IndexError, KeyError):
+                min_temps = [None] * len(weathers)
+                max_temps = [None] * len(weathers)
+            try:
+                rain_probs = forecast_data["timeSeries"][1]["areas"][0]["pops"]
+            except (IndexError, KeyError):
+                rain_probs = [None] * len(weathers)
+            dates = forecast_data["timeSeries"][0]["timeDefines"]
+            for i in range(len(weathers)):
+                date_str = datetime.fromisoformat(dates[i].replace('Z', '+00:00')).strftime('%Y-%m-%d')
+                forecasts.append({
+                    "area_id": area_id,
+                    "area_name": area_name,
+                    "forecast_date": date_str,
+                    "weather_code": weathers[i],
+                    "weather_text": weather_texts[i],
+                    "temperature_min": min_temps[i] if i < len(min_temps) and min_temps[i] != "" else None,
+                    "temperature_max": max_temps[i] if i < len(max_temps) and max_temps[i] != "" else None,
+                    "rainfall_probability": rain_probs[i] if i < len(rain_probs) and rain_probs[i] != "" else None,
+                })
+    except Exception as e:
+        print(f"天気データの解析エラー: {e}")
+    return forecasts
+
+
+def measure_parser(parse, payloads, iterations):
+    """(records/sec, 1レスポンスあたりのピークメモリ, 1レスポンスあたりの結果サイズ)"""
+    records = 0
+    start = time.perf_counter()
+    for i in range(iterations):
+        records += len(parse(payloads[i % len(payloads)]))
+    rate = records / (time.perf_counter() - start)
+
+    peaks = []
+    retained = []
+    for payload in payloads:
+        tracemalloc.start()
+        result = parse(payload)
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        peaks.append(peak)
+        retained.append(current)
+        del result
+    return rate, sum(peaks) / len(peaks), sum(retained) / len(retained)
+
+
+def bench_parse(args):
+    """記録済みフィクスチャで旧パーサーと ForecastParser を比較"""
+    from forecast_parser import ForecastParser
+
+    payloads = []
+    for name in sorted(os.listdir(FIXTURE_DIR)):
+        if name.startswith("forecast_") and name.endswith(".json"):
+            with open(os.path.join(FIXTURE_DIR, name), "r", encoding="utf-8") as f:
+                payloads.append(json.load(f))
+
+    parser = ForecastParser()
+    candidates = (
+        ("legacy (areas[0])", lambda payload: legacy_parse(payload, "130010")),
+        ("ForecastParser", parser.parse),
+    )
+    print(f"フィクスチャ {len(payloads)}件, {args.iterations}回")
+    for label, parse in candidates:
+        rate, peak, retained = measure_parser(parse, payloads, args.iterations)
+        print(f"{label:>18}: {rate:10.0f} records/sec  "
+              f"ピーク {peak / 1024:6.1f} KB/response  結果 {retained / 1024:6.1f} KB/response")
+
+
+def bench_sweep(args):
+    """全エリアの一巡で、エリアごとの取得と府県予報区ごとの取得のリクエスト数を比較"""
+    from api_client import WeatherAPIClient, group_by_office
+    from stub_server import StubServer
+
+    area_ids = [row["area_id"] for row in load_area_rows()]
+    server = StubServer(latency=args.latency).start()
+    overview_url = server.base_url.replace("/forecast/", "/overview_forecast/")
+    client = WeatherAPIClient(forecast_url=server.base_url, overview_url=overview_url,
+                              use_cache=False)
+
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            # 従来: エリアごとに取得し、先頭（または一致する）地域だけを使う
+            server.request_count = 0
+            rows = []
+            for area_id, json_data in client.get_weather_many(area_ids).items():
+                rows.extend(client.parse_weather_data(json_data, area_id))
+            per_area = (server.request_count, len({row["area_id"] for row in rows}), len(rows))
+
+            # 府県予報区ごとに1回取得し、含まれるすべての地域を使う
+            server.request_count = 0
+            rows = []
+            for _, forecasts in client.get_forecasts_by_office(area_ids).values():
+                rows.extend(forecasts)
+            per_office = (server.request_count, len({row["area_id"] for row in rows}), len(rows))
+    finally:
+        server.stop()
+
+    # スタブは東京のフィクスチャを返すので、地域数・行数はどの府県予報区も東京と同じ数になる
+    for label, (requests_made, areas, row_count) in (("per-area", per_area),
+                                                     ("per-office", per_office)):
+        print(f"{label:>12}: リクエスト {requests_made:3d}  地域 {areas:4d}  行 {row_count:5d}")
+
+    print(f"一巡あたりのリクエスト数: エリアごと {per_area[0]}  府県予報区ごと {per_office[0]}"
+          f"（エリア {len(area_ids)}件、府県予報区 {len(group_by_office(area_ids))}件）")
+
+
+def legacy_seed(db_path):
+    """従来の起動処理: 毎回 area.json を読み、エリアごとに接続・コミット"""
+    db = WeatherDatabase(db_path, pool_size=0, verbose=False)
+    for row in load_area_rows():
+        db.insert_area(row["area_id"], row["area_name"], row["region"], row["display_order"])
+    return db
+
+
+def seed(db_path, area_json=AREA_JSON_PATH):
+    """新しい起動処理: 内容が変わっていなければスキップ"""
+    db = WeatherDatabase(db_path, verbose=False)
+    db.seed_areas(area_json)
+    return db
+
+
+def bench_startup(args):
+    """エリアデータの登録を含む起動時間（DB作成・テーブル作成・シード）を比較"""
+    with tempfile.TemporaryDirectory() as tmp:
+        # 内容を1件だけ変えた area.json
+        with open(AREA_JSON_PATH, "r", encoding="utf-8") as f:
+            area_data = json.load(f)
+        region = next(iter(area_data))
+        area_id = next(iter(area_data[region]))
+        area_data[region][area_id] += "（変更）"
+        changed_json = os.path.join(tmp, "area_changed.json")
+        with open(changed_json, "w", encoding="utf-8") as f:
+            json.dump(area_data, f, ensure_ascii=False)
+
+        results = []
+        for label, launch, cold in (
+            ("legacy cold", legacy_seed, True),
+            ("legacy warm", legacy_seed, False),
+            ("seed cold", seed, True),
+            ("seed warm", seed, False),
+        ):
+            timings = []
+            for i in range(args.launches):
+                db_path = os.path.join(tmp, f"{label.replace(' ', '_')}_{i}.db")
+                if not cold:
+                    # 一度起動済みのDBで測る
+                    launch(db_path).close()
+                start = time.perf_counter()
+                launch(db_path).close()
+                timings.append((time.perf_counter() - start) * 1000)
+            results.append((label, percentile(sorted(timings), 50)))
+
+        # 前回から1件だけ変わった area.json での起動（差分の upsert）
+        timings = []
+        for i in range(args.launches):
+            db_path = os.path.join(tmp, f"seed_changed_{i}.db")
+            seed(db_path).close()
+            start = time.perf_counter()
+            db = WeatherDatabase(db_path, verbose=False)
+            db.seed_areas(changed_json)
+            db.close()
+            timings.append((time.perf_counter() - start) * 1000)
+        results.append(("seed 1 changed", percentile(sorted(timings), 50)))
+
+    print(f"エリア {len(load_area_rows())}件, 各 {args.launches}回の中央値")
+    for label, elapsed in results:
+        print(f"{label:>16}: {elapsed:8.2f} ms")
+
+
+def bench_render(args):
+    """予報カードの描画方法ごとに、1回の更新で送るコントロール数・確保メモリ・時間を比較"""
+    import flet as ft
+    from main import build_forecast_card, forecast_signature
+    from ui_render import KeyedList, RenderItem, count_controls
+
+    base = date(2025, 1, 1)
+
+    def value_change(k):
+        # 更新ごとに1日分だけ内容が変わる
+        rows = [
+            {"forecast_date": (base + timedelta(days=i)).isoformat(), "weather_text": "晴れ時々曇り",
+             "temperature_min": 5.0, "temperature_max": 12.0, "rainfall_probability": 10}
+            for i in range(args.cards)
+        ]
+        rows[k % len(rows)]["rainfall_probability"] = k
+        return rows
+
+    def rollover(k):
+        # 更新ごとに表示する期間が1日ずれる（日付が変わったあとの更新）
+        return [
+            {"forecast_date": (base + timedelta(days=k + i)).isoformat(),
+             "weather_text": ("晴れ", "曇り", "雨")[(k + i) % 3],
+             "temperature_min": 5.0, "temperature_max": 12.0, "rainfall_probability": (k + i) % 10}
+            for i in range(args.cards)
+        ]
+
+    def rebuild(view):
+        def render(forecasts):
+            view.controls = [build_forecast_card(forecast) for forecast in forecasts]
+            return sum(count_controls(card) for card in view.controls)
+        return render
+
+    def keyed(view, pooled):
+        cards = KeyedList(view, batch_size=args.cards)
+
+        def render(forecasts):
+            if pooled:
+                # 表示位置ごとのカードを使い回し、値だけ書き換える
+                items = [RenderItem(i, forecast_signature(f), lambda f=f: build_forecast_card(f),
+                                    lambda card, f=f: card.data.show(f))
+                         for i, f in enumerate(forecasts)]
+            else:
+                items = [RenderItem(f["forecast_date"], forecast_signature(f),
+                                    lambda f=f: build_forecast_card(f))
+                         for f in forecasts]
+            return cards.render(items)["controls_sent"]
+        return render
+
+    print(f"カード {args.cards}枚, 更新 {args.refreshes}回")
+    for scenario, make_rows in (("1枚だけ変化", value_change), ("期間が1日ずれる", rollover)):
+        print(scenario)
+        for label, make_render in (("rebuild", rebuild),
+                                   ("keyed by date", lambda view: keyed(view, False)),
+                                   ("pooled by slot", lambda view: keyed(view, True))):
+            render = make_render(ft.ListView())
+            render(make_rows(0))
+
+            rows = [make_rows(k) for k in range(1, args.refreshes + 1)]
+            sent = 0
+            tracemalloc.start()
+            start = time.perf_counter()
+            for forecasts in rows:
+                sent += render(forecasts)
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            print(f"{label:>18}: {elapsed * 1000 / args.refreshes:7.2f} ms/更新  "
+                  f"送信コントロール {sent / args.refreshes:7.1f}個/更新  "
+                  f"ピークメモリ {peak / 1024:8.1f} KB")
+
+
+def bench_switch(args):
+    """エリア切り替えの操作列で、表示用キャッシュの有無による取得時間とヒット率を比較"""
+    import random
+    from ui_cache import ForecastCache
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = WeatherDatabase(os.path.join(tmp, "switch.db"), verbose=False)
+        rows = load_area_rows()
+        db.insert_areas(rows)
+        generate_history(db, args.rows)
+        area_ids = [row["area_id"] for row in rows]
+
+        # 最近見たエリアに戻ることが多い操作列（8割は直近5エリアのどれか）
+        rng = random.Random(0)
+        recent = area_ids[:5]
+        trace = []
+        for _ in range(args.switches):
+            area_id = rng.choice(recent) if rng.random() < 0.8 else rng.choice(area_ids)
+            if area_id not in recent:
+                recent = recent[1:] + [area_id]
+            trace.append(area_id)
+
+        cache = ForecastCache()
+        db.add_ingest_listener(cache.invalidate_areas)
+        results = []
+        for run, (label, load) in enumerate((
+            ("DB", lambda area_id: db.get_forecast(area_id)),
+            ("cache", lambda area_id: cache.get_or_load(area_id, None,
+                                                        lambda: db.get_forecast(area_id))),
+        )):
+            timings = []
+            for i, area_id in enumerate(trace):
+                if i % 200 == 199:
+                    # ときどきスケジューラが予報を保存する
+                    db.insert_forecasts([{
+                        "area_id": area_id,
+                        "forecast_date": (date(2030, 1, 1) + timedelta(days=run * len(trace) + i)).isoformat(),
+                        "weather_code": "100",
+                        "weather_text": "晴れ", "temperature_min": None, "temperature_max": None,
+                        "rainfall_probability": i,
+                    }])
+                start = time.perf_counter()
+                load(area_id)
+                timings.append((time.perf_counter() - start) * 1000)
+            timings.sort()
+            results.append((label, percentile(timings, 50), percentile(timings, 95)))
+        db.close()
+
+    print(f"切り替え {args.switches}回, 履歴 {args.rows:,}行")
+    for label, p50, p95 in results:
+        print(f"{label:>8}: p50 {p50:.3f} ms  p95 {p95:.3f} ms")
+    stats = cache.stats()
+    print(f"ヒット率 {stats['hit_rate']:.0%}（ヒット {stats['hits']}, ミス {stats['misses']}, "
+          f"追い出し {stats['evictions']}, 破棄 {stats['invalidations']}）")
+
+
+def bench_prefetch(args):
+    """ドロップダウン順にエリアを見ていく操作で、先読みの有無による初回表示の待ち時間を比較"""
+    from api_client import WeatherAPIClient
+    from prefetcher import Prefetcher
+    from stub_server import StubServer
+
+    server = StubServer(latency=args.latency).start()
+    overview_url = server.base_url.replace("/forecast/", "/overview_forecast/")
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+            results = []
+            for prefetch in (False, True):
+                db = WeatherDatabase(os.path.join(tmp, f"prefetch_{prefetch}.db"), verbose=False)
+                db.insert_areas(load_area_rows())
+                areas = db.get_all_areas()
+                client = WeatherAPIClient(forecast_url=server.base_url, overview_url=overview_url,
+                                          use_cache=False)
+
+                prefetcher = Prefetcher(db, client, areas, max_concurrent=args.budget,
+                                        min_interval=0.05, delay=args.delay, verbose=False)
+                server.request_count = 0
+
+                waits = []
+                for area in areas[:args.views]:
+                    area_id = area["area_id"]
+                    start = time.perf_counter()
+                    # on_area_changed と同じ: DBになければAPIから取得して保存
+                    if not db.get_forecast(area_id):
+                        json_data = client.get_weather(area_id)
+                        db.insert_forecasts(client.parse_all_areas(json_data, [area_id]))
+                    waits.append((time.perf_counter() - start) * 1000)
+                    if prefetch:
+                        prefetcher.on_viewed(area_id)
+                    time.sleep(args.think)
+
+                prefetcher.close()
+                waits.sort()
+                results.append((prefetch, percentile(waits, 50), percentile(waits, 95),
+                                sum(1 for wait in waits if wait < 10), server.request_count,
+                                prefetcher.stats()["max_in_flight"]))
+                db.close()
+    finally:
+        server.stop()
+
+    print(f"{args.views}エリアを順に表示（通信 {args.latency}s, 閲覧 {args.think}s, "
+          f"先読みの同時取得上限 {args.budget}）")
+    for prefetch, p50, p95, instant, requests_made, max_in_flight in results:
+        label = "prefetch" if prefetch else "no prefetch"
+        print(f"{label:>12}: p50 {p50:7.1f} ms  p95 {p95:7.1f} ms  即時表示 {instant}/{args.views}  "
+              f"リクエスト {requests_made}  先読みの最大同時取得 {max_in_flight}")
+
+
+def bench_analytics(args):
+    """大量の履歴に対する集計クエリ（予報の変化・降水確率の分布など）の時間"""
+    from analytics import ForecastAnalytics, np
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = WeatherDatabase(os.path.join(tmp, "analytics.db"), verbose=False)
+        db.insert_areas(load_area_rows())
+        start = time.perf_counter()
+        total = generate_history(db, args.rows)
+        print(f"履歴 {total:,} 行を生成（{time.perf_counter() - start:.1f}s）")
+        target_date = "2020-01-10"
+
+        def timed(label, func, repeat=1):
+            # repeat 回のうち最短の時間（1回目はページキャッシュを温めるのも含む）
+            best = None
+            for _ in range(repeat):
+                start = time.perf_counter()
+                result = func()
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            print(f"{label:>28}: {best * 1000:9.1f} ms")
+            return result
+
+        # 予報の保存（全エリア×336日分）。呼ぶたびに別の年にして、UNIQUE 制約にかからないようにする
+        area_ids = [row["area_id"] for row in load_area_rows()]
+        years = iter(range(2030, 2100))
+
+        def ingest():
+            year = next(years)
+            db.insert_forecasts([
+                {"area_id": area_id, "forecast_date": f"{year}-{month:02d}-{day:02d}",
+                 "weather_code": "100", "weather_text": "晴れ", "temperature_min": day,
+                 "temperature_max": month, "rainfall_probability": day}
+                for area_id in area_ids for month in range(1, 13) for day in range(1, 29)
+            ])
+
+        # 集計用インデックスなし（既存の (area_id, forecast_date, ...) の UNIQUE インデックスのみ）
+        analytics = ForecastAnalytics(db)
+        timed("drift (インデックスなし)", lambda: analytics.forecast_drift(target_date), repeat=5)
+        timed("drift (1エリア, インデックスなし)",
+              lambda: analytics.forecast_drift(target_date, "130010"), repeat=5)
+
+        timed("インデックス作成", analytics.create_indexes)
+        drift = timed("drift", lambda: analytics.forecast_drift(target_date), repeat=5)
+        timed("drift (1エリア)", lambda: analytics.forecast_drift(target_date, "130010"), repeat=5)
+        timed("temperature_trends", analytics.temperature_trends)
+        timed("rainfall_distribution", analytics.rainfall_distribution)
+        columns = timed("load_columns (全体)",
+                        lambda: analytics.load_columns(["temperature_min", "temperature_max"]))
+        timed("load_columns (予報日)",
+              lambda: analytics.load_columns(["temperature_max"], target_date))
+
+        # 保存のたびにインデックスを更新するコスト（保存した行が集計に入らないよう最後に測る）
+        timed("保存", ingest, repeat=3)
+        with db.get_connection() as conn:
+            conn.execute("DROP INDEX idx_weather_forecasts_date_area_fetch")
+        timed("保存 (インデックスなし)", ingest, repeat=3)
+        db.close()
+
+    print(f"drift: {len(drift)}エリア, 1エリアあたり取得 {drift[0]['fetches']}回, "
+          f"変化 {drift[0]['changes']}回")
+    print(f"load_columns: {len(columns['temperature_min']):,} 行"
+          f"（{'numpy' if np is not None else 'array'}）")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="天気予報DBのベンチマーク")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    pool = sub.add_parser("pool", help="コネクションプールの効果を測定")
+    pool.add_argument("--ops", type=int, default=2000)
+    pool.set_defaults(func=bench_pool)
+
+    ingest = sub.add_parser("ingest", help="一括挿入の効果を測定")
+    ingest.add_argument("--rows", type=int, default=2000)
+    ingest.set_defaults(func=bench_ingest)
+
+    concurrency = sub.add_parser("concurrency", help="N読み込み+1書き込みのストレステスト")
+    concurrency.add_argument("--readers", type=int, default=4)
+    concurrency.add_argument("--seconds", type=float, default=3.0)
+    concurrency.set_defaults(func=bench_concurrency)
+
+    latest = sub.add_parser("latest", help="最新予報テーブルの効果を測定")
+    latest.add_argument("--rows", type=int, default=10_000_000)
+    latest.add_argument("--queries", type=int, default=200)
+    latest.set_defaults(func=bench_latest)
+
+    fetch = sub.add_parser("fetch", help="並行取得の効果をスタブサーバーで測定")
+    fetch.add_argument("--latency", type=float, default=0.2)
+    fetch.add_argument("--error-rate", type=float, default=0.1)
+    fetch.add_argument("--workers", type=int, default=8)
+    fetch.add_argument("--per-host", type=int, default=4)
+    fetch.set_defaults(func=bench_fetch)
+
+    cache = sub.add_parser("cache", help="HTTPキャッシュの効果をスタブサーバーで測定")
+    cache.add_argument("--latency", type=float, default=0.2)
+    cache.set_defaults(func=bench_cache)
+
+    dedup = sub.add_parser("dedup", help="重複排除によるDBサイズ・書き込み量の削減を測定")
+    dedup.add_argument("--days", type=int, default=7)
+    dedup.add_argument("--poll-minutes", type=int, default=10)
+    dedup.set_defaults(func=bench_dedup)
+
+    parse = sub.add_parser("parse", help="予報JSONパーサーのマイクロベンチマーク")
+    parse.add_argument("--iterations", type=int, default=2000)
+    parse.set_defaults(func=bench_parse)
+
+    sweep = sub.add_parser("sweep", help="エリアごと・府県予報区ごとの取得のリクエスト数を比較")
+    sweep.add_argument("--latency", type=float, default=0.05)
+    sweep.set_defaults(func=bench_sweep)
+
+    startup = sub.add_parser("startup", help="エリアデータ登録を含む起動時間（初回/2回目以降）を測定")
+    startup.add_argument("--launches", type=int, default=20)
+    startup.set_defaults(func=bench_startup)
+
+    render = sub.add_parser("render", help="予報カードの差分描画・使い回しの効果を測定（flet が必要）")
+    render.add_argument("--cards", type=int, default=200)
+    render.add_argument("--refreshes", type=int, default=50)
+    render.set_defaults(func=bench_render)
+
+    switch = sub.add_parser("switch", help="エリア切り替え時の表示用キャッシュの効果を測定")
+    switch.add_argument("--rows", type=int, default=1_000_000)
+    switch.add_argument("--switches", type=int, default=2000)
+    switch.set_defaults(func=bench_switch)
+
+    prefetch = sub.add_parser("prefetch", help="前後のエリアの先読みの効果をスタブサーバーで測定")
+    prefetch.add_argument("--latency", type=float, default=0.2)
+    prefetch.add_argument("--think", type=float, default=0.5, help="1エリアを見ている秒数")
+    prefetch.add_argument("--views", type=int, default=20)
+    prefetch.add_argument("--budget", type=int, default=2)
+    prefetch.add_argument("--delay", type=float, default=0.2, help="先読みを始めるまでの秒数")
+    prefetch.set_defaults(func=bench_prefetch)
+
+    analytics = sub.add_parser("analytics", help="予報履歴の集計クエリの時間を測定")
+    analytics.add_argument("--rows", type=int, default=2_000_000)
+    analytics.set_defaults(func=bench_analytics)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
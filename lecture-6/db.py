@@ -1,135 +1,581 @@
 import sqlite3
+import hashlib
+import json
 import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime
 
+
+# ストレージ設定（接続ごとに適用するPRAGMA）のプロファイル
+STORAGE_PROFILES = {
+    # SQLite標準のロールバックジャーナル（書き込み中は読み込みもブロックされる）
+    "default": {
+        "auto_vacuum": "INCREMENTAL",  # 新規DBのみ有効（保持期間の処理で領域を少しずつ返す）
+        "journal_mode": "DELETE",
+        "synchronous": "FULL",
+    },
+    # WALモード：1つの書き込みと複数の読み込みを並行して実行できる
+    "wal": {
+        "auto_vacuum": "INCREMENTAL",  # journal_mode より先に設定する必要がある
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "mmap_size": 256 * 1024 * 1024,
+        "cache_size": -16000,  # 負の値はKiB単位（約16MB）
+        "busy_timeout": 5000,  # ミリ秒
+    },
+}
+
+
+def area_rows(area_data):
+    """area.json（地方 -> {エリアID: エリア名}）から areas テーブルの行を作る"""
+    return [
+        {"area_id": area_id, "area_name": area_name, "region": region, "display_order": i}
+        for region, areas in area_data.items()
+        for i, (area_id, area_name) in enumerate(areas.items())
+    ]
+
+
+def resolve_storage_profile(profile):
+    """プロファイル名または辞書からPRAGMAの辞書を返す"""
+    if isinstance(profile, dict):
+        return dict(profile)
+    if profile not in STORAGE_PROFILES:
+        raise ValueError(f"不明なストレージプロファイルです: {profile}")
+    return dict(STORAGE_PROFILES[profile])
+
+
+def apply_pragmas(conn, pragmas):
+    """接続にPRAGMAを適用"""
+    for name, value in pragmas.items():
+        conn.execute(f"PRAGMA {name} = {value}")
+
+
+class ConnectionPool:
+    """長寿命のSQLite接続を使い回すスレッド対応コネクションプール"""
+
+    def __init__(self, db_path, max_connections=4, cached_statements=128, timeout=30.0,
+                 pragmas=None):
+        self.db_path = db_path
+        self.max_connections = max_connections
+        self.pragmas = pragmas or {}
+        self.cached_statements = cached_statements
+        self.timeout = timeout
+
+        self._idle = queue.LifoQueue()
+        self._all = []
+        self._lock = threading.Lock()
+        self._closed = False
+        # スレッドごとに「今使っている接続」と入れ子の深さを保持
+        self._local = threading.local()
+
+    def _create(self):
+        """新しい接続を作成（プリペアドステートメントはsqlite3側でキャッシュ）"""
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.timeout,
+            check_same_thread=False,
+            cached_statements=self.cached_statements,
+        )
+        conn.row_factory = sqlite3.Row  # 結果を辞書形式で取得
+        apply_pragmas(conn, self.pragmas)
+        return conn
+
+    def _checkout(self):
+        """アイドル接続を取り出す。上限に達していれば返却を待つ"""
+        if self._closed:
+            raise sqlite3.ProgrammingError("コネクションプールは閉じられています")
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self._closed:
+                raise sqlite3.ProgrammingError("コネクションプールは閉じられています")
+            if len(self._all) < self.max_connections:
+                conn = self._create()
+                self._all.append(conn)
+                return conn
+
+        return self._idle.get(timeout=self.timeout)
+
+    @contextmanager
+    def connection(self):
+        """接続を借りる。同じスレッド内の入れ子呼び出しでは同じ接続を返す"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            # 外側のトランザクションに参加（コミットは外側で行う）
+            self._local.depth += 1
+            try:
+                yield conn
+            finally:
+                self._local.depth -= 1
+            return
+
+        conn = self._checkout()
+        self._local.conn = conn
+        self._local.depth = 1
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            self._local.conn = None
+            self._local.depth = 0
+            self._release(conn)
+
+    def _release(self, conn):
+        """接続を返却する。プールが閉じられた後なら、キューに戻さずに閉じる"""
+        with self._lock:
+            if not self._closed:
+                self._idle.put(conn)
+                return
+            conn.close()
+            if conn in self._all:
+                self._all.remove(conn)
+
+    def close_all(self):
+        """プールを閉じる。アイドル接続はすぐに、使用中の接続は返却時に閉じる"""
+        with self._lock:
+            self._closed = True
+            while True:
+                try:
+                    conn = self._idle.get_nowait()
+                except queue.Empty:
+                    break
+                conn.close()
+                self._all.remove(conn)
+
+
 class WeatherDatabase:
-    def __init__(self, db_path="database/weather.db"):
+    def __init__(self, db_path="database/weather.db", pool_size=4, storage_profile="wal",
+                 verbose=True):
         # パスが相対パスなら、現在のスクリプトからの相対パスに変換
         if not os.path.isabs(db_path):
             db_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), db_path)
-            
+
         # データベースディレクトリが存在しなければ作成
         os.makedirs(os.path.dirname(db_path), exist_ok=True)
-            
+
         self.db_path = db_path
+        self.verbose = verbose
+        self.pragmas = resolve_storage_profile(storage_profile)
+        # 直近の一括挿入の統計（件数, 秒）
+        self.last_ingest = None
+        # 予報を保存したときに呼ぶ関数（引数は保存したエリアIDの集合）
+        self._ingest_listeners = []
+        # pool_size=0 の場合は従来通り呼び出しごとに接続を開閉する
+        if pool_size > 0:
+            self.pool = ConnectionPool(db_path, max_connections=pool_size, pragmas=self.pragmas)
+        else:
+            self.pool = None
         self.create_tables()
-        
+
+    @contextmanager
     def get_connection(self):
-        """データベース接続を取得"""
+        """データベース接続を取得（with文で使用し、終了時にコミット）"""
+        if self.pool is not None:
+            with self.pool.connection() as conn:
+                yield conn
+            return
+
         conn = sqlite3.connect(self.db_path)
         conn.row_factory = sqlite3.Row  # 結果を辞書形式で取得
-        return conn
-        
+        apply_pragmas(conn, self.pragmas)
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def close(self):
+        """プールしている接続をすべて閉じる"""
+        if self.pool is not None:
+            self.pool.close_all()
+
     def create_tables(self):
         """テーブルを作成"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        # エリアテーブル
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS areas (
-            area_id TEXT PRIMARY KEY,
-            area_name TEXT NOT NULL,
-            region TEXT NOT NULL,
-            display_order INTEGER DEFAULT 0
-        )
-        ''')
-        
-        # 天気予報テーブル
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS weather_forecasts (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            area_id TEXT NOT NULL,
-            forecast_date TEXT NOT NULL,
-            weather_code TEXT NOT NULL,
-            weather_text TEXT NOT NULL,
-            temperature_min REAL,
-            temperature_max REAL,
-            rainfall_probability INTEGER,
-            fetch_timestamp TEXT NOT NULL,
-            FOREIGN KEY (area_id) REFERENCES areas(area_id),
-            UNIQUE (area_id, forecast_date, fetch_timestamp)
-        )
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+
+            # エリアテーブル
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS areas (
+                area_id TEXT PRIMARY KEY,
+                area_name TEXT NOT NULL,
+                region TEXT NOT NULL,
+                display_order INTEGER DEFAULT 0
+            )
+            ''')
+
+            # 取り込んだデータのバージョンなど（キーと値）
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS metadata (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            )
+            ''')
+
+            # 天気予報テーブル
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS weather_forecasts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                area_id TEXT NOT NULL,
+                forecast_date TEXT NOT NULL,
+                weather_code TEXT NOT NULL,
+                weather_text TEXT NOT NULL,
+                temperature_min REAL,
+                temperature_max REAL,
+                rainfall_probability INTEGER,
+                fetch_timestamp TEXT NOT NULL,
+                FOREIGN KEY (area_id) REFERENCES areas(area_id),
+                UNIQUE (area_id, forecast_date, fetch_timestamp)
+            )
+            ''')
+
+            # エリアごとの取得履歴を時系列で辿るためのインデックス
+            # （日付指定の検索は UNIQUE 制約のインデックスがそのまま使える）
+            cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_weather_forecasts_area_fetch
+            ON weather_forecasts (area_id, fetch_timestamp)
+            ''')
+
+            # エリア・日付ごとの最新予報（取り込み時にトリガーで更新）
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS latest_forecasts (
+                area_id TEXT NOT NULL,
+                forecast_date TEXT NOT NULL,
+                id INTEGER NOT NULL,
+                weather_code TEXT NOT NULL,
+                weather_text TEXT NOT NULL,
+                temperature_min REAL,
+                temperature_max REAL,
+                rainfall_probability INTEGER,
+                fetch_timestamp TEXT NOT NULL,
+                PRIMARY KEY (area_id, forecast_date)
+            ) WITHOUT ROWID
+            ''')
+
+            cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_weather_forecasts_latest
+            AFTER INSERT ON weather_forecasts
+            BEGIN
+                INSERT INTO latest_forecasts
+                (area_id, forecast_date, id, weather_code, weather_text, temperature_min,
+                 temperature_max, rainfall_probability, fetch_timestamp)
+                VALUES (NEW.area_id, NEW.forecast_date, NEW.id, NEW.weather_code,
+                        NEW.weather_text, NEW.temperature_min, NEW.temperature_max,
+                        NEW.rainfall_probability, NEW.fetch_timestamp)
+                ON CONFLICT (area_id, forecast_date) DO UPDATE SET
+                    id = excluded.id,
+                    weather_code = excluded.weather_code,
+                    weather_text = excluded.weather_text,
+                    temperature_min = excluded.temperature_min,
+                    temperature_max = excluded.temperature_max,
+                    rainfall_probability = excluded.rainfall_probability,
+                    fetch_timestamp = excluded.fetch_timestamp
+                WHERE excluded.fetch_timestamp >= latest_forecasts.fetch_timestamp;
+            END
+            ''')
+
+            self._backfill_latest_forecasts(conn)
+
+    def _backfill_latest_forecasts(self, conn):
+        """既存DBの場合、最新予報テーブルを履歴から作り直す"""
+        if conn.execute("SELECT 1 FROM latest_forecasts LIMIT 1").fetchone():
+            return
+        if not conn.execute("SELECT 1 FROM weather_forecasts LIMIT 1").fetchone():
+            return
+
+        conn.execute('''
+        INSERT INTO latest_forecasts
+        (area_id, forecast_date, id, weather_code, weather_text, temperature_min,
+         temperature_max, rainfall_probability, fetch_timestamp)
+        SELECT f1.area_id, f1.forecast_date, f1.id, f1.weather_code, f1.weather_text,
+               f1.temperature_min, f1.temperature_max, f1.rainfall_probability,
+               f1.fetch_timestamp
+        FROM weather_forecasts f1
+        JOIN (
+            SELECT area_id, forecast_date, MAX(fetch_timestamp) as max_timestamp
+            FROM weather_forecasts
+            GROUP BY area_id, forecast_date
+        ) f2
+        ON f1.area_id = f2.area_id AND f1.forecast_date = f2.forecast_date
+        AND f1.fetch_timestamp = f2.max_timestamp
         ''')
-        
-        conn.commit()
-        conn.close()
-        
+
     def insert_area(self, area_id, area_name, region, display_order=0):
         """エリア情報をデータベースに挿入"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-        INSERT OR REPLACE INTO areas (area_id, area_name, region, display_order)
-        VALUES (?, ?, ?, ?)
-        ''', (area_id, area_name, region, display_order))
-        
-        conn.commit()
-        conn.close()
-        
-    def insert_forecast(self, area_id, forecast_date, weather_code, weather_text, 
+        with self.get_connection() as conn:
+            conn.execute('''
+            INSERT OR REPLACE INTO areas (area_id, area_name, region, display_order)
+            VALUES (?, ?, ?, ?)
+            ''', (area_id, area_name, region, display_order))
+
+    def insert_forecast(self, area_id, forecast_date, weather_code, weather_text,
                         temperature_min, temperature_max, rainfall_probability):
         """天気予報データをデータベースに挿入"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
         current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        
-        cursor.execute('''
-        INSERT INTO weather_forecasts 
-        (area_id, forecast_date, weather_code, weather_text, temperature_min, 
-         temperature_max, rainfall_probability, fetch_timestamp)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (area_id, forecast_date, weather_code, weather_text, temperature_min, 
-              temperature_max, rainfall_probability, current_time))
-        
-        conn.commit()
-        conn.close()
-        
+
+        with self.get_connection() as conn:
+            # 同じ秒に同じエリア・日付が保存済みなら置き換える（insert_forecasts と同じ）
+            conn.execute('''
+            INSERT OR REPLACE INTO weather_forecasts
+            (area_id, forecast_date, weather_code, weather_text, temperature_min,
+             temperature_max, rainfall_probability, fetch_timestamp)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (area_id, forecast_date, weather_code, weather_text, temperature_min,
+                  temperature_max, rainfall_probability, current_time))
+
+        self._notify_ingest({area_id})
+
+    def insert_areas(self, rows):
+        """エリア情報をまとめて1トランザクションで挿入
+
+        Args:
+            rows: area_id, area_name, region, display_order を持つ辞書のリスト
+
+        Returns:
+            int: 挿入した件数
+        """
+        start = time.perf_counter()
+        params = [
+            (row["area_id"], row["area_name"], row["region"], row.get("display_order", 0))
+            for row in rows
+        ]
+
+        with self.get_connection() as conn:
+            conn.executemany('''
+            INSERT OR REPLACE INTO areas (area_id, area_name, region, display_order)
+            VALUES (?, ?, ?, ?)
+            ''', params)
+
+        self._report_ingest("areas", len(params), time.perf_counter() - start)
+        return len(params)
+
+    def get_metadata(self, key, default=None):
+        """metadata テーブルの値"""
+        with self.get_connection() as conn:
+            row = conn.execute("SELECT value FROM metadata WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def sync_areas(self, rows, version):
+        """エリア情報を差分だけ1トランザクションで反映
+
+        保存済みのバージョンと同じなら何もしない。違う場合は、追加・変更された行を
+        upsert し、なくなったエリアを削除して、バージョンを更新する。
+
+        Args:
+            rows: area_id, area_name, region, display_order を持つ辞書のリスト
+            version: rows の元データのバージョン（内容のハッシュなど）
+
+        Returns:
+            dict: 追加・変更・削除した件数。バージョンが同じなら None
+        """
+        start = time.perf_counter()
+        with self.get_connection() as conn:
+            current = conn.execute(
+                "SELECT value FROM metadata WHERE key = 'areas_version'"
+            ).fetchone()
+            if current and current[0] == version:
+                return None
+
+            existing = {
+                row[0]: tuple(row[1:])
+                for row in conn.execute(
+                    "SELECT area_id, area_name, region, display_order FROM areas"
+                )
+            }
+            params = [
+                (row["area_id"], row["area_name"], row["region"], row.get("display_order", 0))
+                for row in rows
+            ]
+            changed = [param for param in params if existing.get(param[0]) != param[1:]]
+            removed = existing.keys() - {param[0] for param in params}
+
+            conn.executemany('''
+            INSERT INTO areas (area_id, area_name, region, display_order)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT (area_id) DO UPDATE SET
+                area_name = excluded.area_name,
+                region = excluded.region,
+                display_order = excluded.display_order
+            ''', changed)
+            conn.executemany("DELETE FROM areas WHERE area_id = ?",
+                             [(area_id,) for area_id in removed])
+            conn.execute('''
+            INSERT INTO metadata (key, value) VALUES ('areas_version', ?)
+            ON CONFLICT (key) DO UPDATE SET value = excluded.value
+            ''', (version,))
+
+        result = {
+            "inserted": sum(1 for param in changed if param[0] not in existing),
+            "updated": sum(1 for param in changed if param[0] in existing),
+            "deleted": len(removed),
+        }
+        self._report_ingest("areas", len(changed) + len(removed), time.perf_counter() - start,
+                            skipped=len(params) - len(changed))
+        return result
+
+    def seed_areas(self, path):
+        """area.json の内容が前回から変わっていればエリア情報を反映する
+
+        ファイルのハッシュが保存済みのものと同じなら、JSONの解析もしない。
+
+        Returns:
+            dict: sync_areas の結果。変更がなければ None
+        """
+        with open(path, "rb") as f:
+            content = f.read()
+        version = hashlib.sha1(content).hexdigest()
+        if self.get_metadata("areas_version") == version:
+            return None
+        return self.sync_areas(area_rows(json.loads(content)), version)
+
+    def insert_forecasts(self, rows, fetch_timestamp=None, dedup=True):
+        """天気予報データをまとめて1トランザクションで挿入
+
+        複数エリア分のレスポンスをまとめて渡してもよい。同じバッチの行には
+        同じ fetch_timestamp が付与される。同じ秒に別の取り込み（更新ボタン・
+        スケジューラ・先読み）が同じエリア・日付を保存した場合は、後の行で置き換える
+        （UNIQUE 制約でバッチ全体が失敗しないように）。
+
+        dedup=True の場合、エリア・日付ごとの最新予報と内容が同じ行は保存しない。
+        気象庁が再発表していない間のポーリングでは履歴が増えない。
+
+        Args:
+            rows: parse_weather_data が返す形式の辞書のリスト
+            fetch_timestamp: 取得日時（省略時は現在時刻）
+            dedup: 変化のない行を保存しないかどうか
+
+        Returns:
+            int: 実際に挿入した件数
+        """
+        start = time.perf_counter()
+        if fetch_timestamp is None:
+            fetch_timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        params = [
+            {
+                "area_id": row["area_id"],
+                "forecast_date": row["forecast_date"],
+                "weather_code": row["weather_code"],
+                "weather_text": row["weather_text"],
+                "temperature_min": row["temperature_min"],
+                "temperature_max": row["temperature_max"],
+                "rainfall_probability": row["rainfall_probability"],
+                "fetch_timestamp": fetch_timestamp,
+            }
+            for row in rows
+        ]
+
+        with self.get_connection() as conn:
+            if dedup:
+                # 最新予報と値がすべて同じ行は挿入しない（NULL同士も同じとみなす）
+                cursor = conn.executemany('''
+                INSERT OR REPLACE INTO weather_forecasts
+                (area_id, forecast_date, weather_code, weather_text, temperature_min,
+                 temperature_max, rainfall_probability, fetch_timestamp)
+                SELECT :area_id, :forecast_date, :weather_code, :weather_text,
+                       :temperature_min, :temperature_max, :rainfall_probability,
+                       :fetch_timestamp
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM latest_forecasts
+                    WHERE area_id = :area_id AND forecast_date = :forecast_date
+                    AND weather_code IS :weather_code AND weather_text IS :weather_text
+                    AND temperature_min IS :temperature_min
+                    AND temperature_max IS :temperature_max
+                    AND rainfall_probability IS :rainfall_probability
+                )
+                ''', params)
+            else:
+                cursor = conn.executemany('''
+                INSERT OR REPLACE INTO weather_forecasts
+                (area_id, forecast_date, weather_code, weather_text, temperature_min,
+                 temperature_max, rainfall_probability, fetch_timestamp)
+                VALUES (:area_id, :forecast_date, :weather_code, :weather_text,
+                        :temperature_min, :temperature_max, :rainfall_probability,
+                        :fetch_timestamp)
+                ''', params)
+            inserted = cursor.rowcount
+
+        self._report_ingest("weather_forecasts", inserted, time.perf_counter() - start,
+                            skipped=len(params) - inserted)
+        if inserted:
+            self._notify_ingest({param["area_id"] for param in params})
+        return inserted
+
+    def add_ingest_listener(self, callback):
+        """予報を保存したときに callback(エリアIDの集合) を呼ぶ（保存したスレッドから呼ばれる）"""
+        self._ingest_listeners.append(callback)
+
+    def _notify_ingest(self, area_ids):
+        for callback in self._ingest_listeners:
+            try:
+                callback(area_ids)
+            except Exception as e:
+                print(f"保存通知の処理エラー: {e}")
+
+    def _report_ingest(self, table, count, elapsed, skipped=0):
+        """一括挿入のスループットを記録・表示"""
+        self.last_ingest = (count, elapsed)
+        if not self.verbose:
+            return
+        rate = (count + skipped) / elapsed if elapsed > 0 else float("inf")
+        detail = f"{elapsed * 1000:.1f}ms, {rate:.0f} rows/sec"
+        if skipped:
+            detail += f", 変化なし {skipped}件をスキップ"
+        print(f"{table}: {count}件を保存しました（{detail}）")
+
     def get_all_areas(self):
         """すべてのエリア情報を取得"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-        SELECT * FROM areas ORDER BY region, display_order, area_name
-        ''')
-        
-        areas = [dict(row) for row in cursor.fetchall()]
-        conn.close()
-        
-        return areas
-    
+        with self.get_connection() as conn:
+            cursor = conn.execute('''
+            SELECT * FROM areas ORDER BY region, display_order, area_name
+            ''')
+
+            return [dict(row) for row in cursor.fetchall()]
+
+    def get_areas_with_forecasts(self, area_ids):
+        """area_ids のうち、最新予報が保存されているエリアIDの集合"""
+        area_ids = list(area_ids)
+        if not area_ids:
+            return set()
+        placeholders = ", ".join("?" * len(area_ids))
+        with self.get_connection() as conn:
+            cursor = conn.execute(
+                f"SELECT DISTINCT area_id FROM latest_forecasts WHERE area_id IN ({placeholders})",
+                area_ids,
+            )
+            return {row[0] for row in cursor.fetchall()}
+
     def get_forecast(self, area_id, date=None):
         """特定エリアの最新予報データを取得"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        if date:
-            # 特定日付の予報を取得
-            cursor.execute('''
-            SELECT * FROM weather_forecasts
-            WHERE area_id = ? AND forecast_date = ?
-            ORDER BY fetch_timestamp DESC
-            LIMIT 1
-            ''', (area_id, date))
-        else:
-            # 最新の予報を全日分取得
-            cursor.execute('''
-            SELECT f1.* FROM weather_forecasts f1
-            JOIN (
-                SELECT area_id, forecast_date, MAX(fetch_timestamp) as max_timestamp
-                FROM weather_forecasts
+        with self.get_connection() as conn:
+            if date:
+                # 特定日付の予報を取得
+                cursor = conn.execute('''
+                SELECT * FROM weather_forecasts
+                WHERE area_id = ? AND forecast_date = ?
+                ORDER BY fetch_timestamp DESC
+                LIMIT 1
+                ''', (area_id, date))
+            else:
+                # 最新の予報を全日分取得（最新予報テーブルの主キー範囲を読むだけ）
+                cursor = conn.execute('''
+                SELECT id, area_id, forecast_date, weather_code, weather_text,
+                       temperature_min, temperature_max, rainfall_probability,
+                       fetch_timestamp
+                FROM latest_forecasts
                 WHERE area_id = ?
-                GROUP BY forecast_date
-            ) f2
-            ON f1.area_id = f2.area_id AND f1.forecast_date = f2.forecast_date 
-            AND f1.fetch_timestamp = f2.max_timestamp
-            ORDER BY f1.forecast_date
-            ''', (area_id,))
-        
-        forecasts = [dict(row) for row in cursor.fetchall()]
-        conn.close()
-        
-        return forecasts
\ No newline at end of file
+                ORDER BY forecast_date
+                ''', (area_id,))
+
+            return [dict(row) for row in cursor.fetchall()]
\ No newline at end of file
@@ -0,0 +1,206 @@
+"""
+気象庁の予報JSONを解析するパーサー
+
+timeSeries を位置ではなく「含んでいるキー」（weatherCodes / pops / temps など）で探し、
+timeDefines の日付で各配列の値を揃える。日付は ISO 文字列の先頭10文字を
+そのまま使い、datetime への変換はしない。
+
+レスポンスに含まれるすべての地域を解析し、__slots__ つきの ForecastRecord を返す。
+形のおかしい地域や系列は飛ばし、残りの解析は続ける。
+"""
+from datetime import date
+
+
+class ForecastRecord:
+    """1地域・1日分の予報（辞書と同じように row["key"] / row.get() で読める）"""
+
+    __slots__ = ("area_id", "area_name", "forecast_date", "weather_code", "weather_text",
+                 "temperature_min", "temperature_max", "rainfall_probability")
+
+    def __init__(self, area_id, area_name, forecast_date, weather_code, weather_text,
+                 temperature_min=None, temperature_max=None, rainfall_probability=None):
+        self.area_id = area_id
+        self.area_name = area_name
+        self.forecast_date = forecast_date
+        self.weather_code = weather_code
+        self.weather_text = weather_text
+        self.temperature_min = temperature_min
+        self.temperature_max = temperature_max
+        self.rainfall_probability = rainfall_probability
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self):
+        return f"ForecastRecord({self.as_dict()!r})"
+
+
+def _value(values, index):
+    """配列の値。範囲外や空文字は None"""
+    if index < len(values):
+        value = values[index]
+        if value != "":
+            return value
+    return None
+
+
+def _find_series(time_series, key):
+    """key を持つ地域が含まれる timeSeries を探す"""
+    for series in time_series:
+        areas = series.get("areas")
+        if areas and key in areas[0]:
+            return series
+    return None
+
+
+def _days(series):
+    """timeDefines の日付部分（YYYY-MM-DD）のリスト"""
+    return [time_define[:10] for time_define in series.get("timeDefines", ())]
+
+
+def _daily_pops(days, pops):
+    """6時間ごとの降水確率を、日ごとの最大値にまとめる"""
+    result = {}
+    for day, pop in zip(days, pops):
+        if pop == "":
+            continue
+        current = result.get(day)
+        if current is None or (current != pop and int(pop) > int(current)):
+            result[day] = pop
+    return result
+
+
+def _daily_temps(series, temps):
+    """気温を日ごとの (最低, 最高) にまとめる（0時が最低、9時が最高）"""
+    result = {}
+    for time_define, temp in zip(series.get("timeDefines", ()), temps):
+        if temp == "":
+            continue
+        day = time_define[:10]
+        low, high = result.get(day, (None, None))
+        if time_define[11:13] == "00":
+            low = temp
+        else:
+            high = temp
+        result[day] = (low, high)
+    return result
+
+
+def _pick(areas, index, count):
+    """天気の地域 index に対応する地域（数が揃っていれば同じ位置、なければ先頭）"""
+    if not areas:
+        return None
+    if len(areas) == count:
+        return areas[index]
+    return areas[0]
+
+
+class ForecastParser:
+    """予報JSONを ForecastRecord のリストに変換する"""
+
+    def __init__(self):
+        self.errors = 0
+
+    def parse(self, json_data):
+        """レスポンス中のすべての地域の予報を返す"""
+        if not json_data:
+            return []
+        if isinstance(json_data, list):
+            return self._parse_forecast(json_data)
+        if isinstance(json_data, dict) and "targetArea" in json_data and "text" in json_data:
+            return self._parse_overview(json_data)
+        self.errors += 1
+        return []
+
+    def _parse_overview(self, json_data):
+        """overview_forecast 形式（地域名と概況文のみ）"""
+        report_date = json_data.get("reportDatetime") or ""
+        return [ForecastRecord(
+            None,
+            json_data.get("targetArea", "不明"),
+            report_date[:10] or date.today().isoformat(),
+            "000",  # 代替コード
+            json_data.get("text", "情報がありません"),
+        )]
+
+    def _parse_forecast(self, reports):
+        short_term = reports[0].get("timeSeries", []) if reports else []
+        weekly = reports[1].get("timeSeries", []) if len(reports) > 1 else []
+
+        weather_series = _find_series(short_term, "weatherCodes")
+        if weather_series is None:
+            self.errors += 1
+            return []
+
+        # 系列ごとの日付は全地域で共通なので一度だけ計算する
+        weather_days = _days(weather_series)
+        pop_series = _find_series(short_term, "pops")
+        pop_days = _days(pop_series) if pop_series else []
+        temp_series = _find_series(short_term, "temps")
+
+        # 週間予報は短期予報で欠けている日を補うためだけに使う（日付 -> 位置）
+        weekly_weather = _find_series(weekly, "pops")
+        weekly_pop_index = {day: i for i, day in enumerate(_days(weekly_weather))} if weekly_weather else {}
+        weekly_weather_by_code = {
+            area["area"]["code"]: area for area in weekly_weather["areas"]
+        } if weekly_weather else {}
+        weekly_temp = _find_series(weekly, "tempsMin")
+        weekly_temp_index = {day: i for i, day in enumerate(_days(weekly_temp))} if weekly_temp else {}
+        weekly_temp_by_code = {
+            area["area"]["code"]: area for area in weekly_temp["areas"]
+        } if weekly_temp else {}
+
+        weather_areas = weather_series["areas"]
+        count = len(weather_areas)
+        records = []
+
+        for index, area in enumerate(weather_areas):
+            try:
+                code = area["area"]["code"]
+                name = area["area"]["name"]
+                codes = area["weatherCodes"]
+                texts = area.get("weathers", ())
+
+                pop_area = _pick(pop_series["areas"], index, count) if pop_series else None
+                pops = _daily_pops(pop_days, pop_area["pops"]) if pop_area else {}
+                weekly_pops = weekly_weather_by_code.get(code, {}).get("pops", ())
+
+                temp_area = _pick(temp_series["areas"], index, count) if temp_series else None
+                temps = _daily_temps(temp_series, temp_area["temps"]) if temp_area else {}
+                station = weekly_temp_by_code.get(temp_area["area"]["code"], {}) if temp_area else {}
+                weekly_mins = station.get("tempsMin", ())
+                weekly_maxs = station.get("tempsMax", ())
+
+                area_records = []
+                for i, day in enumerate(weather_days):
+                    low, high = temps.get(day, (None, None))
+                    pop = pops.get(day)
+
+                    # 短期予報の値を優先し、欠けているものだけ週間予報で補う
+                    weekly_i = weekly_temp_index.get(day)
+                    if weekly_i is not None:
+                        if low is None:
+                            low = _value(weekly_mins, weekly_i)
+                        if high is None:
+                            high = _value(weekly_maxs, weekly_i)
+                    if pop is None and day in weekly_pop_index:
+                        pop = _value(weekly_pops, weekly_pop_index[day])
+
+                    area_records.append(ForecastRecord(
+                        code, name, day, codes[i], _value(texts, i) or "", low, high, pop,
+                    ))
+                records.extend(area_records)
+            except (KeyError, IndexError, TypeError, ValueError):
+                # この地域だけ飛ばして続ける
+                self.errors += 1
+
+        return records
@@ -0,0 +1,191 @@
+"""
+ディスク上のHTTPキャッシュ（ETag / Last-Modified による再検証つき）
+
+URLをキーにレスポンス本文をSQLiteに保存する。TTL内はネットワークに出ず、
+TTLを過ぎたら条件付きGET（If-None-Match / If-Modified-Since）で再検証する。
+合計サイズが上限を超えたら最後に使われたのが古いものから削除する（LRU）。
+
+lecture-5 の JMAWeatherAPI と lecture-6 の WeatherAPIClient で共有する。
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "jma-weather", "http_cache.db")
+
+
+class CachedResponse:
+    """キャッシュから返すレスポンス（requests.Response と同じ使い方ができる）"""
+
+    def __init__(self, url, content, status_code=200, revalidated=False):
+        self.url = url
+        self.content = content
+        self.status_code = status_code
+        self.from_cache = True
+        # 304で再検証したものか、TTL内でネットワークに出なかったものか
+        self.revalidated = revalidated
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8")
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        pass
+
+
+class HTTPCache:
+    """URLをキーにしたディスクキャッシュ"""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=600, max_bytes=64 * 1024 * 1024):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute('''
+        CREATE TABLE IF NOT EXISTS http_cache (
+            url TEXT PRIMARY KEY,
+            etag TEXT,
+            last_modified TEXT,
+            body BLOB NOT NULL,
+            size INTEGER NOT NULL,
+            fetched_at REAL NOT NULL,
+            last_access REAL NOT NULL
+        )
+        ''')
+        self._conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_http_cache_last_access ON http_cache (last_access)
+        ''')
+        self._conn.commit()
+
+    def get(self, url, send, ttl=None):
+        """キャッシュを通してURLを取得
+
+        Args:
+            url: 取得するURL
+            send: 追加ヘッダーの辞書を受け取り requests.Response を返す関数
+            ttl: このURLだけTTL（秒）を変える場合に指定
+
+        Returns:
+            CachedResponse または send が返したレスポンス
+        """
+        ttl = self.ttl if ttl is None else ttl
+        now = time.time()
+
+        with self._lock:
+            entry = self._conn.execute(
+                "SELECT etag, last_modified, body, fetched_at FROM http_cache WHERE url = ?",
+                (url,),
+            ).fetchone()
+
+            # TTL内ならネットワークに出ない
+            if entry and now - entry[3] < ttl:
+                self._conn.execute("UPDATE http_cache SET last_access = ? WHERE url = ?", (now, url))
+                self._conn.commit()
+                self.hits += 1
+                return CachedResponse(url, entry[2])
+
+        headers = {}
+        if entry:
+            if entry[0]:
+                headers["If-None-Match"] = entry[0]
+            if entry[1]:
+                headers["If-Modified-Since"] = entry[1]
+
+        response = send(headers)
+
+        with self._lock:
+            if response.status_code == 304 and entry:
+                # 変更なし：本文はキャッシュのものを使い、TTLを延長
+                now = time.time()
+                self._conn.execute(
+                    "UPDATE http_cache SET fetched_at = ?, last_access = ? WHERE url = ?",
+                    (now, now, url),
+                )
+                self._conn.commit()
+                self.revalidated += 1
+                return CachedResponse(url, entry[2], revalidated=True)
+
+            self.misses += 1
+            if response.status_code == 200:
+                self._store(url, response)
+            return response
+
+    def _store(self, url, response):
+        """レスポンスを保存し、サイズ上限を超えたら古いものから削除"""
+        body = response.content
+        now = time.time()
+        self._conn.execute('''
+        INSERT OR REPLACE INTO http_cache
+        (url, etag, last_modified, body, size, fetched_at, last_access)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (url, response.headers.get("ETag"), response.headers.get("Last-Modified"),
+              body, len(body), now, now))
+
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM http_cache").fetchone()[0]
+        if total > self.max_bytes:
+            for old_url, size in self._conn.execute(
+                "SELECT url, size FROM http_cache WHERE url != ? ORDER BY last_access", (url,)
+            ).fetchall():
+                self._conn.execute("DELETE FROM http_cache WHERE url = ?", (old_url,))
+                self.evictions += 1
+                total -= size
+                if total <= self.max_bytes:
+                    break
+        self._conn.commit()
+
+    def invalidate(self, url=None):
+        """指定URL（省略時は全件）のキャッシュを削除"""
+        with self._lock:
+            if url is None:
+                self._conn.execute("DELETE FROM http_cache")
+            else:
+                self._conn.execute("DELETE FROM http_cache WHERE url = ?", (url,))
+            self._conn.commit()
+
+    def stats(self):
+        """ヒット・ミスなどのカウンタ"""
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM http_cache"
+            ).fetchone()
+        requests_total = self.hits + self.revalidated + self.misses
+        return {
+            "hits": self.hits,
+            "revalidated": self.revalidated,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits + self.revalidated) / requests_total if requests_total else 0.0,
+            "entries": entries,
+            "bytes": size,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+
+def shared_cache():
+    """両クライアントで共有するキャッシュ（プロセス内で1つ）"""
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = HTTPCache()
+        return _shared_cache
@@ -1,14 +1,85 @@
 import flet as ft
-import json
 import os
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from functools import lru_cache
 
 from db import WeatherDatabase
 from api_client import WeatherAPIClient
+from scheduler import RefreshScheduler
+from prefetcher import Prefetcher
+from ui_tasks import BackgroundTasks, UIMetrics
+from ui_render import KeyedList, RenderItem
+from ui_cache import ForecastCache
 
 # 元の気象データJSONファイルのパス
 AREA_JSON_PATH = "area.json"
 
+
+def forecast_signature(forecast):
+    """カードに表示する値（同じなら前回のカードを使い回す）"""
+    return (forecast["forecast_date"], forecast["weather_text"], forecast["temperature_min"],
+            forecast["temperature_max"], forecast["rainfall_probability"])
+
+
+# 曜日の表記（date.weekday() の順）
+WEEKDAYS = ('月', '火', '水', '木', '金', '土', '日')
+
+
+@lru_cache(maxsize=512)
+def format_forecast_date(date_text):
+    """'2025-01-01' を '01/01(水)' の形式にする（同じ日付は計算し直さない）"""
+    date_obj = date.fromisoformat(date_text)
+    return f"{date_obj:%m/%d}({WEEKDAYS[date_obj.weekday()]})"
+
+
+def weather_icon(weather):
+    """天気アイコン（簡易版）"""
+    if "雨" in weather:
+        return "UMBRELLA"
+    if "曇" in weather:
+        return "CLOUD"
+    return "SUNNY"
+
+
+class ForecastCard:
+    """1日分の予報カード（コントロールは最初に1回だけ作り、以降は値を書き換える）"""
+
+    def __init__(self):
+        self.icon = ft.Icon("SUNNY")
+        self.title = ft.Text()
+        self.subtitle = ft.Text()
+        self.control = ft.Card(
+            content=ft.Container(
+                content=ft.Column([
+                    ft.ListTile(
+                        leading=self.icon,
+                        title=self.title,
+                        subtitle=self.subtitle,
+                    )
+                ]),
+                padding=10
+            ),
+            data=self,
+        )
+
+    def show(self, forecast):
+        """予報の値を表示し、カードのコントロールを返す"""
+        weather = forecast["weather_text"]
+        temp_min = forecast["temperature_min"]
+        temp_max = forecast["temperature_max"]
+        rain_prob = forecast["rainfall_probability"]
+
+        self.icon.name = weather_icon(weather)
+        self.title.value = f"{format_forecast_date(forecast['forecast_date'])}: {weather}"
+        self.subtitle.value = f"気温: {temp_min or '?'}℃～{temp_max or '?'}℃  降水確率: {rain_prob or '?'}%"
+        return self.control
+
+
+def build_forecast_card(forecast):
+    """1日分の予報カードを作成"""
+    return ForecastCard().show(forecast)
+
+
 class WeatherApp:
     def __init__(self, page: ft.Page):
         self.page = page
@@ -20,30 +91,47 @@ class WeatherApp:
         # データベースとAPIクライアントの初期化
         self.db = WeatherDatabase()
         self.api = WeatherAPIClient()
+
+        # 通信・DB保存はワーカースレッドで行い、古くなった結果は捨てる
+        self.tasks = BackgroundTasks(self.page)
+        self.metrics = UIMetrics()
+
+        # 最近表示したエリアの予報（予報が保存されたエリアの分は破棄）
+        self.forecast_cache = ForecastCache()
+        self.db.add_ingest_listener(self.forecast_cache.invalidate_areas)
         
         # エリアデータの初期化（DBに登録）
         self.initialize_area_data()
         
+        # 表示中のエリアの前後（同じ地方）をバックグラウンドで先読み
+        self.prefetcher = Prefetcher(self.db, self.api, self.db.get_all_areas())
+        
         # UIコンポーネントの初期化
         self.setup_ui()
         
         # 初期データの読み込み
         self.load_initial_data()
+
+        # 全エリアの予報をバックグラウンドで定期更新
+        self.scheduler = RefreshScheduler(
+            self.db, self.api,
+            [area["area_id"] for area in self.db.get_all_areas()],
+            on_update=self.on_background_update,
+        )
+        self.scheduler.start()
         
     def initialize_area_data(self):
-        """JSONファイルからエリアデータを読み込んでDBに登録"""
+        """JSONファイルからエリアデータを読み込んでDBに登録（内容が変わったときだけ）"""
         # JSONファイルが存在すれば読み込む
         if os.path.exists(AREA_JSON_PATH):
             try:
-                with open(AREA_JSON_PATH, 'r', encoding='utf-8') as f:
-                    area_data = json.load(f)
-                
-                # エリアデータをDBに登録
-                for region, areas in area_data.items():
-                    for i, (area_id, area_name) in enumerate(areas.items()):
-                        self.db.insert_area(area_id, area_name, region, i)
-                        
-                print("エリアデータをDBに登録しました")
+                # 前回と同じ内容ならスキップし、変わっていれば差分だけ1トランザクションで反映
+                result = self.db.seed_areas(AREA_JSON_PATH)
+                if result is None:
+                    print("エリアデータは最新です")
+                else:
+                    print(f"エリアデータをDBに登録しました（追加 {result['inserted']}件, "
+                          f"変更 {result['updated']}件, 削除 {result['deleted']}件）")
             except Exception as e:
                 print(f"エリアデータの読み込みエラー: {e}")
         else:
@@ -83,13 +171,15 @@ class WeatherApp:
         self.date_button.on_click = lambda _: self.date_picker.pick_date()
         
         # 日付選択の結果を表示
+        self.selected_date = None
         self.selected_date_text = ft.Text("すべての予報を表示中", italic=True)
         
         # 読み込み中表示
         self.loading = ft.ProgressBar(visible=False, width=300)
         
-        # 天気表示エリア
-        self.weather_cards = ft.Column(spacing=10, scroll=ft.ScrollMode.AUTO)
+        # 天気表示エリア（表示中の範囲だけ作り、変わったカードだけ送る）
+        self.weather_cards = ft.ListView(spacing=10, expand=True, on_scroll_interval=100)
+        self.cards = KeyedList(self.weather_cards)
         
         # ステータスメッセージ
         self.status_text = ft.Text("", italic=True, size=12)
@@ -149,146 +239,157 @@ class WeatherApp:
         """エリア選択時の処理"""
         if not self.area_dropdown.value:
             return
-            
+
+        started = self.metrics.start()
         area_id = self.area_dropdown.value
-        
-        # DBから予報データを取得
-        forecasts = self.db.get_forecast(area_id)
-        
+
+        # 前のエリアの取得中なら、その結果は表示しない
+        self.tasks.cancel()
+        self.loading.visible = False
+
+        # 予報データを取得（最近表示したエリアならキャッシュから）
+        forecasts = self.load_forecast(area_id)
+
         # データがない場合はAPIから取得
         if not forecasts:
             self.status_text.value = "データをAPIから取得します..."
             self.page.update()
-            self.fetch_and_store_weather(area_id)
+            self.fetch_and_store_weather(area_id, started)
         else:
             # 取得したデータを表示
             self.update_weather_display(forecasts)
-        
+            self.metrics.painted("on_area_changed", started)
+
+        self.metrics.handler_done("on_area_changed", started)
+
+        # 次に選ばれそうな前後のエリアを先読み（前のエリアの先読みはキャンセル）
+        self.prefetcher.on_viewed(area_id)
+
+    def load_forecast(self, area_id, date=None):
+        """予報をキャッシュまたはDBから取得"""
+        forecasts = self.forecast_cache.get_or_load(
+            area_id, date, lambda: self.db.get_forecast(area_id, date)
+        )
+        self.metrics.cache_stats("forecast_cache", self.forecast_cache.stats())
+        return forecasts
+
     def on_update_clicked(self, e):
         """更新ボタンクリック時の処理"""
         if not self.area_dropdown.value:
             self.status_text.value = "エリアを選択してください"
             self.page.update()
             return
-            
+
+        started = self.metrics.start()
         area_id = self.area_dropdown.value
-        
+
         # APIからデータを取得してDBに保存
-        self.fetch_and_store_weather(area_id)
+        self.fetch_and_store_weather(area_id, started)
+        self.metrics.handler_done("on_update_clicked", started)
 
     def on_date_changed(self, e):
         """日付選択時の処理"""
         if e.date is None:
+            self.selected_date = None
             self.selected_date_text.value = "すべての予報を表示中"
             self.page.update()
             
             # すべての予報を表示
             if self.area_dropdown.value:
-                forecasts = self.db.get_forecast(self.area_dropdown.value)
+                forecasts = self.load_forecast(self.area_dropdown.value)
                 self.update_weather_display(forecasts)
             return
         
         # 選択された日付を文字列に変換
         selected_date = e.date.strftime('%Y-%m-%d')
+        self.selected_date = selected_date
         self.selected_date_text.value = f"選択日: {selected_date}"
         self.page.update()
         
         # 選択された日付の予報を表示
         if self.area_dropdown.value:
-            forecasts = self.db.get_forecast(self.area_dropdown.value, selected_date)
+            forecasts = self.load_forecast(self.area_dropdown.value, selected_date)
             self.update_weather_display(forecasts)
         
-    def fetch_and_store_weather(self, area_id):
-        """APIからデータを取得してDBに保存"""
+    def on_background_update(self, area_id):
+        """スケジューラが新しい予報を保存したときの処理（別スレッドから呼ばれる）"""
+        if area_id != self.area_dropdown.value:
+            return
+
+        forecasts = self.load_forecast(area_id, self.selected_date)
+        self.update_weather_display(forecasts)
+        self.status_text.value = f"自動更新しました（{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}）"
+        self.page.update()
+
+    def fetch_and_store_weather(self, area_id, started=None):
+        """APIからデータを取得してDBに保存（通信・解析・保存はワーカースレッドで実行）"""
+        if started is None:
+            started = self.metrics.start()
+
         self.loading.visible = True
         self.page.update()
-        
-        # APIからデータ取得
-        json_data = self.api.get_weather(area_id)
-        
-        if not json_data:
-            self.status_text.value = "データの取得に失敗しました"
+
+        def work(token):
+            # APIからデータ取得
+            json_data = self.api.get_weather(area_id)
+
+            # 取得中に別のエリアが選ばれたら、以降の処理はしない
+            if not json_data or token.cancelled:
+                return None
+
+            # レスポンスに含まれる府県内のすべての地域をパースしてDBに一括保存
+            all_forecasts = self.api.parse_all_areas(json_data, [area_id])
+            self.db.insert_forecasts(all_forecasts)
+
+            # 表示するのは選択中のエリアの分だけ
+            return [forecast for forecast in all_forecasts if forecast["area_id"] == area_id]
+
+        def done(forecasts):
             self.loading.visible = False
+            if forecasts is None:
+                self.status_text.value = "データの取得に失敗しました"
+                self.page.update()
+                return
+
+            # 取得したデータを表示
+            self.update_weather_display(forecasts)
+            self.status_text.value = f"データを更新しました（{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}）"
             self.page.update()
-            return
-            
-        # データをパース
-        forecasts = self.api.parse_weather_data(json_data, area_id)
-        
-        # DBに保存
-        for forecast in forecasts:
-            self.db.insert_forecast(
-                forecast["area_id"],
-                forecast["forecast_date"],
-                forecast["weather_code"],
-                forecast["weather_text"],
-                forecast["temperature_min"],
-                forecast["temperature_max"],
-                forecast["rainfall_probability"]
-            )
-        
-        # 取得したデータを表示
-        self.update_weather_display(forecasts)
-        
-        self.loading.visible = False
-        self.status_text.value = f"データを更新しました（{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}）"
-        self.page.update()
-        
+            self.metrics.painted("fetch_and_store_weather", started)
+
+        def failed(error):
+            self.loading.visible = False
+            self.status_text.value = f"データの保存に失敗しました: {error}"
+            self.page.update()
+
+        self.tasks.submit(work, done, failed)
+
     def update_weather_display(self, forecasts):
-        """天気予報表示の更新"""
-        self.weather_cards.controls.clear()
+        """天気予報表示の更新（前回と同じ内容のカードは作り直さない）"""
+        started = self.metrics.start()
         
         if not forecasts:
-            self.weather_cards.controls.append(
-                ft.Text("データがありません。更新ボタンを押してください。")
-            )
-            self.page.update()
-            return
-            
-        # 地域名を表示
-        area_name = forecasts[0].get("area_name", "不明")
-        self.weather_cards.controls.append(
-            ft.Text(f"{area_name}の天気予報", size=20, weight=ft.FontWeight.BOLD)
-        )
-        
-        # 各日の予報を表示
-        for forecast in forecasts:
-            date = forecast["forecast_date"]
-            weather = forecast["weather_text"]
-            temp_min = forecast["temperature_min"]
-            temp_max = forecast["temperature_max"]
-            rain_prob = forecast["rainfall_probability"]
-            
-            # 日付フォーマット
-            date_obj = datetime.strptime(date, '%Y-%m-%d')
-            date_str = date_obj.strftime('%m/%d') + f"({['月','火','水','木','金','土','日'][date_obj.weekday()]})"
+            items = [RenderItem("empty", None, lambda: ft.Text(
+                "データがありません。更新ボタンを押してください。"
+            ))]
+        else:
+            # 地域名を表示
+            area_name = forecasts[0].get("area_name", "不明")
+            items = [RenderItem("title", area_name, lambda: ft.Text(
+                f"{area_name}の天気予報", size=20, weight=ft.FontWeight.BOLD
+            ))]
             
-            # 天気アイコン（簡易版）
-            weather_icon = "SUNNY"  # デフォルト
-            if "雨" in weather:
-                weather_icon = "UMBRELLA"
-            elif "曇" in weather:
-                weather_icon = "CLOUD"
-                
-            # カード作成
-            card = ft.Card(
-                content=ft.Container(
-                    content=ft.Column([
-                        ft.ListTile(
-                            leading=ft.Icon(weather_icon),
-                            title=ft.Text(f"{date_str}: {weather}"),
-                            subtitle=ft.Text(
-                                f"気温: {temp_min or '?'}℃～{temp_max or '?'}℃  降水確率: {rain_prob or '?'}%"
-                            )
-                        )
-                    ]),
-                    padding=10
-                )
+            # 各日の予報を表示（表示位置ごとのカードを使い回し、値だけ書き換える）
+            items.extend(
+                RenderItem(("day", i), forecast_signature(forecast),
+                           lambda forecast=forecast: build_forecast_card(forecast),
+                           lambda card, forecast=forecast: card.data.show(forecast))
+                for i, forecast in enumerate(forecasts)
             )
-            
-            self.weather_cards.controls.append(card)
-            
-        self.page.update()
+        
+        stats = self.cards.render(items)
+        self.weather_cards.update()
+        self.metrics.rendered("update_weather_display", stats, started)
 
 def main(page: ft.Page):
     """アプリケーションのエントリーポイント"""
@@ -0,0 +1,188 @@
+"""
+次に見られそうなエリアの予報を先に取得する
+
+ドロップダウンは地方・表示順に並んでいて、ユーザーは前後のエリアを順に
+見ていくことが多い。表示中のエリアと同じ地方の前後 radius 件のうち、
+まだDBに予報がないものを府県予報区ごとにまとめてバックグラウンドで取得・保存する。
+
+- 別のエリアが選ばれたら、それまでの先読みはキャンセルする（取得中のものは保存まで行う）
+- 同時に取得するのは、すべての地方を合わせて max_concurrent 件まで
+- 取得の開始は min_interval 秒以上あける
+- 表示から delay 秒たっても同じエリアを見ているときだけ始める（素早く切り替えている間は取得しない）
+- 表示中のエリアと同じ府県予報区のエリアは、表示のための取得でまとめて保存されるので先読みしない
+"""
+import threading
+import time
+
+from api_client import group_by_office, office_code
+
+
+class Prefetcher:
+    """表示中のエリアの前後（同じ地方）を先読みしてDBに保存する"""
+
+    def __init__(self, db, api, areas, radius=2, max_concurrent=2, min_interval=0.5,
+                 delay=0.2, verbose=True):
+        """
+        Args:
+            areas: get_all_areas() の結果（ドロップダウンと同じ並び）
+        """
+        self.db = db
+        self.api = api
+        self.radius = radius
+        self.min_interval = min_interval
+        self.delay = delay
+        self.verbose = verbose
+
+        # 地方ごとのエリアIDの並びと、各エリアの位置
+        self.regions = {}
+        self.positions = {}
+        for area in areas:
+            ids = self.regions.setdefault(area["region"], [])
+            self.positions[area["area_id"]] = (area["region"], len(ids))
+            ids.append(area["area_id"])
+
+        # 全地方で共有する同時取得数の上限
+        self._budget = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self._next_start = 0.0
+        self.generation = 0
+
+        self._threads = []
+        # 取得中の府県予報区（重複して取得しない）
+        self._fetching = set()
+
+        self.requests = 0
+        self.stored_areas = 0
+        self.cancelled = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def neighbours(self, area_id):
+        """同じ地方の前後のエリア（近い順: +1, -1, +2, -2, ...）"""
+        if area_id not in self.positions:
+            return []
+        region, index = self.positions[area_id]
+        ids = self.regions[region]
+        result = []
+        for distance in range(1, self.radius + 1):
+            for i in (index + distance, index - distance):
+                if 0 <= i < len(ids):
+                    result.append(ids[i])
+        return result
+
+    def on_viewed(self, area_id):
+        """エリアが表示されたときに呼ぶ。前回の先読みはキャンセルされる"""
+        with self._lock:
+            self.generation += 1
+            generation = self.generation
+
+        office = office_code(area_id)
+        with self._lock:
+            busy = self._fetching | {office}
+        candidates = [candidate for candidate in self.neighbours(area_id)
+                      if office_code(candidate) not in busy]
+        if not candidates:
+            return
+        stored = self.db.get_areas_with_forecasts(candidates)
+        targets = [candidate for candidate in candidates if candidate not in stored]
+        if not targets:
+            return
+
+        thread = threading.Thread(target=self._run, args=(generation, targets),
+                                  name="prefetcher", daemon=True)
+        with self._lock:
+            self._threads = [t for t in self._threads if t.is_alive()]
+            self._threads.append(thread)
+        thread.start()
+
+    def cancel(self):
+        """実行待ちの先読みをすべてキャンセル"""
+        with self._lock:
+            self.generation += 1
+
+    def close(self, timeout=None):
+        """キャンセルし、取得中のものが終わるまで待つ"""
+        self.cancel()
+        with self._lock:
+            threads = list(self._threads)
+        for thread in threads:
+            thread.join(timeout)
+
+    def _cancelled(self, generation):
+        return self.generation != generation
+
+    def _acquire(self, generation):
+        """同時取得数の枠を待つ。待っている間にキャンセルされたら False"""
+        while not self._budget.acquire(timeout=0.1):
+            if self._cancelled(generation):
+                return False
+        if self._cancelled(generation):
+            self._budget.release()
+            return False
+        return True
+
+    def _throttle(self):
+        """前回の取得開始から min_interval 秒あける"""
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start)
+            self._next_start = start + self.min_interval
+        if start > now:
+            time.sleep(start - now)
+
+    def _run(self, generation, targets):
+        deadline = time.monotonic() + self.delay
+        while time.monotonic() < deadline:
+            if self._cancelled(generation):
+                return
+            time.sleep(min(0.05, self.delay))
+
+        # 近いエリアを含む府県予報区から順に取得する
+        for office, area_ids in group_by_office(targets).items():
+            if not self._acquire(generation):
+                self._count("cancelled")
+                return
+            try:
+                self._throttle()
+                if self._cancelled(generation):
+                    self._count("cancelled")
+                    return
+                self._fetch(office, area_ids)
+            except Exception as e:
+                print(f"先読みエラー（{office}）: {e}")
+            finally:
+                self._budget.release()
+
+    def _count(self, name, n=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + n)
+
+    def _fetch(self, office, area_ids):
+        with self._lock:
+            if office in self._fetching:
+                return
+            self._fetching.add(office)
+            self.requests += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            json_data = self.api.get_weather(area_ids[0])
+            if not json_data:
+                return
+            forecasts = self.api.parse_all_areas(json_data, area_ids)
+            self.db.insert_forecasts(forecasts)
+        finally:
+            with self._lock:
+                self._fetching.discard(office)
+                self.in_flight -= 1
+        self._count("stored_areas", len({forecast["area_id"] for forecast in forecasts}))
+        if self.verbose:
+            print(f"[prefetch] {office}: {', '.join(area_ids)} を先読みしました")
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "stored_areas": self.stored_areas,
+            "cancelled": self.cancelled,
+            "max_in_flight": self.max_in_flight,
+        }
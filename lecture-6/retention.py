@@ -0,0 +1,195 @@
+"""
+予報履歴の保持期間・間引き・領域回収
+
+ルール（エリア・予報日ごと）:
+1. 取得日時の新しい keep_latest 件はそのまま残す
+2. それより古いものは、取得日ごとに最後の1件だけ残す（1日1スナップショットに間引く）
+3. 予報日が horizon_days 日より前のものは削除する
+
+削除は小さなチャンクごとにコミットし、最後に incremental_vacuum で
+空きページを少しずつファイルから切り詰めるので、DBを長くロックしない。
+
+使い方:
+    python retention.py [--keep 3] [--horizon-days 90] [--chunk 500]
+"""
+import argparse
+import time
+from datetime import date, timedelta
+
+from db import WeatherDatabase
+
+
+class RetentionPolicy:
+    """保持ルールの設定"""
+
+    def __init__(self, keep_latest=3, horizon_days=90, chunk_size=500, vacuum_pages=256,
+                 time_budget=None):
+        self.keep_latest = keep_latest
+        self.horizon_days = horizon_days
+        # 1トランザクションで削除する行数
+        self.chunk_size = chunk_size
+        # 1回の incremental_vacuum で返すページ数
+        self.vacuum_pages = vacuum_pages
+        # 秒。超えたら途中で切り上げ、次回の実行で続きを処理する
+        self.time_budget = time_budget
+
+
+def _page_stats(conn):
+    """(ページサイズ, ページ数, 空きページ数)"""
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+    freelist = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    return page_size, page_count, freelist
+
+
+class RetentionManager:
+    """保持ルールを少しずつ適用する"""
+
+    def __init__(self, db, policy=None):
+        self.db = db
+        self.policy = policy or RetentionPolicy()
+
+    def _out_of_time(self, started):
+        budget = self.policy.time_budget
+        return budget is not None and time.perf_counter() - started > budget
+
+    def _delete_ids(self, ids, started):
+        """idのリストをチャンクごとに削除し、削除できた件数を返す"""
+        deleted = 0
+        chunk = self.policy.chunk_size
+        for i in range(0, len(ids), chunk):
+            if self._out_of_time(started):
+                break
+            with self.db.get_connection() as conn:
+                conn.executemany("DELETE FROM weather_forecasts WHERE id = ?",
+                                 [(row_id,) for row_id in ids[i:i + chunk]])
+            deleted += len(ids[i:i + chunk])
+        return deleted
+
+    def _expired_ids(self, area_id, cutoff):
+        """予報日が保持期間を過ぎた行"""
+        with self.db.get_connection() as conn:
+            rows = conn.execute('''
+            SELECT id FROM weather_forecasts
+            WHERE area_id = ? AND forecast_date < ?
+            ''', (area_id, cutoff)).fetchall()
+        return [row[0] for row in rows]
+
+    def _downsample_ids(self, area_id):
+        """最新 keep_latest 件より古く、かつその取得日の最後の1件でない行"""
+        with self.db.get_connection() as conn:
+            rows = conn.execute('''
+            SELECT id FROM (
+                SELECT id,
+                       ROW_NUMBER() OVER (
+                           PARTITION BY forecast_date
+                           ORDER BY fetch_timestamp DESC
+                       ) AS rn,
+                       ROW_NUMBER() OVER (
+                           PARTITION BY forecast_date, substr(fetch_timestamp, 1, 10)
+                           ORDER BY fetch_timestamp DESC
+                       ) AS day_rn
+                FROM weather_forecasts
+                WHERE area_id = ?
+            )
+            WHERE rn > ? AND day_rn > 1
+            ''', (area_id, self.policy.keep_latest)).fetchall()
+        return [row[0] for row in rows]
+
+    def _vacuum(self, started):
+        """空きページを少しずつファイルから切り詰める"""
+        with self.db.get_connection() as conn:
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+                # 既存DBは auto_vacuum=INCREMENTAL になっていない（一度 VACUUM が必要）
+                return False
+
+        while not self._out_of_time(started):
+            with self.db.get_connection() as conn:
+                if conn.execute("PRAGMA freelist_count").fetchone()[0] == 0:
+                    break
+                conn.execute(f"PRAGMA incremental_vacuum({self.policy.vacuum_pages})").fetchall()
+        return True
+
+    def run(self, today=None):
+        """保持ルールを適用し、結果を辞書で返す"""
+        started = time.perf_counter()
+        today = today or date.today()
+        cutoff = (today - timedelta(days=self.policy.horizon_days)).isoformat()
+
+        with self.db.get_connection() as conn:
+            page_size, pages_before, _ = _page_stats(conn)
+            # latest_forecasts ではなく履歴から。途中で止まったエリアや、最新予報が
+            # 削除済みのエリアに残った行も、次回の実行で処理される
+            area_ids = [row[0] for row in conn.execute(
+                "SELECT DISTINCT area_id FROM weather_forecasts"
+            ).fetchall()]
+
+        expired = 0
+        downsampled = 0
+        # 削除しきれなかった行が残っていれば False（次回の実行で続きを処理する）
+        complete = True
+        for area_id in area_ids:
+            if self._out_of_time(started):
+                complete = False
+                break
+
+            ids = self._expired_ids(area_id, cutoff)
+            deleted = self._delete_ids(ids, started)
+            expired += deleted
+            if deleted < len(ids):
+                complete = False
+                break
+            # 期限切れの行をすべて削除してから、最新予報からも外す
+            with self.db.get_connection() as conn:
+                conn.execute('''
+                DELETE FROM latest_forecasts WHERE area_id = ? AND forecast_date < ?
+                ''', (area_id, cutoff))
+
+            ids = self._downsample_ids(area_id)
+            deleted = self._delete_ids(ids, started)
+            downsampled += deleted
+            if deleted < len(ids):
+                complete = False
+                break
+
+        vacuumed = self._vacuum(started)
+
+        with self.db.get_connection() as conn:
+            _, pages_after, freelist = _page_stats(conn)
+
+        return {
+            "expired_rows": expired,
+            "downsampled_rows": downsampled,
+            "bytes_reclaimed": (pages_before - pages_after) * page_size,
+            # incremental_vacuum が使えないDBでは、空きページとして再利用される量
+            "bytes_free": freelist * page_size,
+            "incremental_vacuum": vacuumed,
+            "complete": complete,
+            "elapsed_sec": time.perf_counter() - started,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="予報履歴の保持ルールを適用")
+    parser.add_argument("--keep", type=int, default=3, help="そのまま残す最新スナップショット数")
+    parser.add_argument("--horizon-days", type=int, default=90, help="これより古い予報日は削除")
+    parser.add_argument("--chunk", type=int, default=500, help="1トランザクションで削除する行数")
+    parser.add_argument("--time-budget", type=float, default=None, help="最大実行秒数")
+    args = parser.parse_args()
+
+    db = WeatherDatabase()
+    policy = RetentionPolicy(args.keep, args.horizon_days, args.chunk, time_budget=args.time_budget)
+    report = RetentionManager(db, policy).run()
+    db.close()
+
+    print(f"期限切れで削除: {report['expired_rows']}件")
+    print(f"間引きで削除: {report['downsampled_rows']}件")
+    print(f"回収したサイズ: {report['bytes_reclaimed'] / 1024:.1f} KB")
+    if not report["incremental_vacuum"]:
+        print(f"incremental_vacuum が無効なDBです（再利用可能な空き: {report['bytes_free'] / 1024:.1f} KB）")
+    if not report["complete"]:
+        print("時間切れのため途中で終了しました。次回の実行で続きを処理します。")
+
+
+if __name__ == "__main__":
+    main()
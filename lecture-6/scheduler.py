@@ -0,0 +1,126 @@
+"""
+予報DBを常に新しい状態に保つバックグラウンド更新スケジューラ
+"""
+import threading
+import time
+from datetime import datetime
+
+from api_client import group_by_office
+
+
+def get_report_datetime(json_data):
+    """APIレスポンスから発表日時（reportDatetime）を取り出す"""
+    if isinstance(json_data, list) and json_data:
+        return json_data[0].get("reportDatetime")
+    if isinstance(json_data, dict):
+        return json_data.get("reportDatetime")
+    return None
+
+
+class RefreshScheduler:
+    """全エリアの予報を定期的に取得してDBに保存するスケジューラ
+
+    エリアは府県予報区（office）ごとにまとめ、1回の取得で府県内のすべての
+    地域の予報を保存する。起動直後に全府県予報区をまとめて取得し、その後は
+    interval 秒で一巡するよう、1つずつ間隔をずらして更新する。発表日時が
+    前回と同じ府県予報区は保存しない。
+    """
+
+    def __init__(self, db, api, area_ids, interval=600, on_update=None):
+        self.db = db
+        self.api = api
+        self.area_ids = list(area_ids)
+        self.offices = group_by_office(self.area_ids)
+        self.interval = interval
+        # 新しい予報を保存したときに area_id を渡して呼ばれる（UIへの通知用）
+        self.on_update = on_update
+
+        # 府県予報区ごとの最後に保存した発表日時
+        self.report_times = {}
+        self.last_refresh = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """バックグラウンドスレッドで開始"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="refresh-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """停止（実行中の取得が終わるまで待つ）"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        self._safely(self.refresh_all)
+
+        # 1府県予報区あたりの間隔をずらして、全体を interval 秒で一巡する
+        offices = list(self.offices)
+        stagger = self.interval / max(1, len(offices))
+        index = 0
+        while not self._stop.wait(stagger):
+            if not offices:
+                continue
+            self._safely(self.refresh_office, offices[index % len(offices)])
+            index += 1
+
+    def _safely(self, func, *args):
+        """1回の失敗でスケジューラが止まらないようにする"""
+        try:
+            func(*args)
+        except Exception as e:
+            print(f"バックグラウンド更新エラー: {e}")
+
+    def refresh_all(self):
+        """全府県予報区を並行取得し、更新のあったものを1トランザクションで保存"""
+        self._store(self.api.get_forecasts_by_office(self.area_ids))
+
+    def refresh_area(self, area_id):
+        """エリアを含む府県予報区を取得して、更新があれば保存"""
+        self._store(self.api.get_forecasts_by_office([area_id]))
+
+    def refresh_office(self, office):
+        """1府県予報区を取得して、更新があれば保存"""
+        self._store(self.api.get_forecasts_by_office(self.offices.get(office, [office])))
+
+    def _store(self, results):
+        rows = []
+        updated = []
+
+        with self._lock:
+            for office, (json_data, forecasts) in results.items():
+                if not json_data:
+                    continue
+                self.last_refresh[office] = time.time()
+
+                # 発表日時が変わっていなければスキップ
+                report_time = get_report_datetime(json_data)
+                if report_time and self.report_times.get(office) == report_time:
+                    continue
+                if not forecasts:
+                    continue
+                rows.extend(forecasts)
+                updated.append((office, report_time))
+
+            if rows:
+                self.db.insert_forecasts(rows)
+            for office, report_time in updated:
+                self.report_times[office] = report_time
+
+        if updated:
+            print(f"バックグラウンド更新: {len(updated)}府県予報区（{datetime.now().strftime('%H:%M:%S')}）")
+        for area_id in dict.fromkeys(row["area_id"] for row in rows):
+            self._notify(area_id)
+
+    def _notify(self, area_id):
+        if self.on_update is None:
+            return
+        try:
+            self.on_update(area_id)
+        except Exception as e:
+            print(f"更新通知の処理エラー: {e}")
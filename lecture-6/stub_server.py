@@ -0,0 +1,132 @@
+"""
+気象庁APIのスタブHTTPサーバー（ベンチマーク・動作確認用）
+
+レイテンシとエラー（503）を擬似的に発生させながら、
+fixtures/ の予報JSONを、地域コードを要求された府県予報区のものに書き換えて返す。
+ETagつきで、If-None-Match が一致すれば304を返す。
+
+使い方:
+    python stub_server.py [--port 8765] [--latency 0.2] [--error-rate 0.1]
+"""
+import argparse
+import hashlib
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+FORECAST_PATH = re.compile(r"^/bosai/forecast/data/forecast/(\d+)\.json$")
+
+
+def load_fixture(name="forecast_130000.json"):
+    """予報JSONのフィクスチャを読み込む"""
+    with open(os.path.join(FIXTURE_DIR, name), "rb") as f:
+        return f.read()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """予報エンドポイントだけを模したハンドラ"""
+
+    # HTTP/1.1 にしてKeep-Aliveを有効にする
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        with server.stats_lock:
+            server.request_count += 1
+
+        time.sleep(server.latency)
+
+        if random.random() < server.error_rate:
+            self.send_body(503, b'{"error": "service unavailable"}')
+            return
+
+        match = FORECAST_PATH.match(self.path)
+        if not match:
+            self.send_body(404, b'{"error": "not found"}')
+            return
+
+        payload, etag = server.payload_for(match.group(1))
+        if self.headers.get("If-None-Match") == etag:
+            with server.stats_lock:
+                server.not_modified_count += 1
+            self.send_body(304, b"", etag)
+            return
+
+        self.send_body(200, payload, etag)
+
+    def send_body(self, status, body, etag=None):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        if etag:
+            self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # リクエストごとのログは出さない
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    """レイテンシ・エラー率を設定できるスタブサーバー"""
+
+    daemon_threads = True
+
+    def __init__(self, port=0, latency=0.2, error_rate=0.0, payload=None):
+        super().__init__(("127.0.0.1", port), StubHandler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.payload = payload if payload is not None else load_fixture()
+        self._payloads = {}
+        self.request_count = 0
+        self.not_modified_count = 0
+        self.stats_lock = threading.Lock()
+
+    def payload_for(self, code):
+        """地域コードに合わせて、フィクスチャの地域コード（130xxx）を書き換えた本文とETag"""
+        with self.stats_lock:
+            if code not in self._payloads:
+                payload = self.payload.replace(b'"130', b'"' + code[:3].encode())
+                self._payloads[code] = (payload, '"%s"' % hashlib.sha1(payload).hexdigest())
+            return self._payloads[code]
+
+    @property
+    def base_url(self):
+        """予報エンドポイントのベースURL"""
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/bosai/forecast/data/forecast/"
+
+    def start(self):
+        """バックグラウンドスレッドで起動"""
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self
+
+    def stop(self):
+        """停止"""
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="気象庁APIのスタブサーバー")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--error-rate", type=float, default=0.1)
+    args = parser.parse_args()
+
+    server = StubServer(args.port, args.latency, args.error_rate)
+    print(f"スタブサーバーを起動しました: {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+UIで表示した予報のメモリキャッシュ
+
+(エリアID, 日付) ごとに直近の結果を LRU で保持し、ドロップダウンで
+最近見たエリアに戻ったときはDBやネットワークを使わずに表示する。
+
+- ttl 秒を過ぎたものは使わない
+- 空の結果（予報のないエリア）はキャッシュしない
+- WeatherDatabase.add_ingest_listener に invalidate_areas を登録すると、
+  予報が保存されたエリアの分は破棄される（get_or_load の読み込み中に破棄された分も保存しない）
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class ForecastCache:
+    """(エリアID, 日付) ごとの予報の LRU キャッシュ"""
+
+    def __init__(self, max_entries=32, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (保存時刻, 値)
+        # エリアID -> 破棄した回数（読み込み中に破棄された結果を保存しないため）
+        self._generations = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, area_id, date=None):
+        """キャッシュされた値。なければ None"""
+        key = (area_id, date)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] > self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, area_id, date, value, generation=None):
+        """値を保存する。generation を渡すと、その後に破棄されていれば保存しない"""
+        key = (area_id, date)
+        with self._lock:
+            if generation is not None and self._generations.get(area_id, 0) != generation:
+                return
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_load(self, area_id, date, load):
+        """キャッシュになければ load() の結果を保存して返す
+
+        空の結果（まだ予報がない）は保存しない。保存すると、予報を取得したあとも
+        破棄されるまで空のまま表示され、そのたびにAPIから取得し直すことになる。
+        load() の間に invalidate_areas でそのエリアが破棄された場合も、古いかもしれない
+        結果なので保存しない。
+        """
+        value = self.get(area_id, date)
+        if value is None:
+            with self._lock:
+                generation = self._generations.get(area_id, 0)
+            value = load()
+            if value:
+                self.put(area_id, date, value, generation)
+        return value
+
+    def invalidate_areas(self, area_ids):
+        """指定したエリアの分をすべて破棄"""
+        with self._lock:
+            for area_id in area_ids:
+                self._generations[area_id] = self._generations.get(area_id, 0) + 1
+            for key in [key for key in self._entries if key[0] in area_ids]:
+                del self._entries[key]
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """ヒット率などの統計"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+            }
@@ -0,0 +1,116 @@
+"""
+予報カードの差分描画
+
+KeyedList は ListView の controls をキーごとに管理する。
+
+- 内容（signature）が前回と同じ項目は、前回のコントロールをそのまま使う。
+  Flet は変更のないコントロールを送らないので、送られるのは変わったカードだけになる。
+- 変わった項目は、update() があれば前回のコントロールの値だけを書き換え、
+  なければ build() で作り直す。新しい項目は build() で作る。
+  統計の controls_sent には、作ったものと書き換えたものの両方のコントロール数を数える。
+- 最初は batch_size 件だけ作り、スクロールが末尾に近づいたら続きを作る。
+"""
+import time
+
+
+# 子のコントロールを持つ公開属性（Card/Container の content、Column/Row/ListView の controls、
+# ListTile の leading/title/subtitle/trailing、Text の spans）
+CHILD_ATTRIBUTES = ("content", "controls", "leading", "title", "subtitle", "trailing", "spans")
+
+
+def count_controls(control):
+    """control 以下のコントロール数（自身を含む）
+
+    Flet の非公開の _get_children() は使わず、公開属性をたどる。
+    """
+    count = 1
+    for name in CHILD_ATTRIBUTES:
+        child = getattr(control, name, None)
+        if child is None or isinstance(child, str):
+            continue
+        for item in child if isinstance(child, list) else (child,):
+            count += count_controls(item)
+    return count
+
+
+class RenderItem:
+    """表示する1項目（key で同じ項目を判定し、signature が同じなら作り直さない）
+
+    update(control) を渡すと、内容が変わったときに前回のコントロールを
+    書き換えて使う（key を表示位置にすれば、位置ごとのコントロールプールになる）。
+    """
+
+    __slots__ = ("key", "signature", "build", "update")
+
+    def __init__(self, key, signature, build, update=None):
+        self.key = key
+        self.signature = signature
+        self.build = build
+        self.update = update
+
+
+class KeyedList:
+    """ListView などの controls を差分で更新する"""
+
+    def __init__(self, view, batch_size=30, threshold=300):
+        self.view = view
+        self.batch_size = batch_size
+        # 末尾まで残り何ピクセルで続きを作るか
+        self.threshold = threshold
+        self._rendered = {}   # key -> (signature, control)
+        self._previous = {}   # 前回の描画のうち、まだ使い回していないもの
+        self._pending = []    # まだコントロールを作っていない項目
+        self.last_stats = None
+        view.on_scroll = self._on_scroll
+
+    def _materialize(self, item, stats):
+        """前回と同じ内容ならそのコントロールを、違えば新しく作ったものを返す"""
+        previous = self._previous.pop(item.key, None)
+        if previous is not None and previous[0] == item.signature:
+            stats["reused"] += 1
+            control = previous[1]
+        elif previous is not None and item.update is not None:
+            stats["updated"] += 1
+            control = item.update(previous[1])
+            # 書き換えたコントロールも update() で送られる（変わった値だけだが、数は作り直しと同じに数える）
+            stats["controls_sent"] += count_controls(control)
+        else:
+            stats["built"] += 1
+            control = item.build()
+            stats["controls_sent"] += count_controls(control)
+        self._rendered[item.key] = (item.signature, control)
+        return control
+
+    def render(self, items):
+        """items（RenderItem のリスト）で controls を置き換え、統計を返す
+
+        view.update() は呼び出し側で行う。
+        """
+        started = time.perf_counter()
+        stats = {"built": 0, "reused": 0, "updated": 0, "controls_sent": 0}
+
+        # 前回の描画で作ったものだけを使い回しの候補にする（続きを作るときにも使う）
+        self._previous = self._rendered
+        self._rendered = {}
+        self._pending = list(items[self.batch_size:])
+        self.view.controls = [self._materialize(item, stats) for item in items[:self.batch_size]]
+
+        stats["deferred"] = len(self._pending)
+        stats["elapsed_ms"] = (time.perf_counter() - started) * 1000
+        self.last_stats = stats
+        return stats
+
+    def load_more(self):
+        """まだ作っていない項目を batch_size 件だけ追加する"""
+        if not self._pending:
+            return None
+        stats = {"built": 0, "reused": 0, "updated": 0, "controls_sent": 0}
+        batch, self._pending = self._pending[:self.batch_size], self._pending[self.batch_size:]
+        self.view.controls.extend(self._materialize(item, stats) for item in batch)
+        self.view.update()
+        stats["deferred"] = len(self._pending)
+        return stats
+
+    def _on_scroll(self, e):
+        if self._pending and e.pixels >= e.max_scroll_extent - self.threshold:
+            self.load_more()
@@ -0,0 +1,130 @@
+"""
+Fletのイベントハンドラから重い処理（通信・解析・DB保存）を切り離すための部品
+
+- BackgroundTasks: page.run_thread でワーカースレッドに処理を投げる。
+  新しい処理を投げたり cancel() したりすると、それより前の処理の結果は捨てられる。
+- UIMetrics: ハンドラの処理時間と、操作から結果が描画されるまでの時間、
+  描画1回あたりに作ったコントロール数と更新にかかった時間を記録する。
+"""
+import threading
+import time
+
+
+class CancelToken:
+    """処理の途中で「もう不要になったか」を確認するためのトークン"""
+
+    def __init__(self, tasks, generation):
+        self._tasks = tasks
+        self.generation = generation
+
+    @property
+    def cancelled(self):
+        return self._tasks.generation != self.generation
+
+
+class BackgroundTasks:
+    """最新の処理の結果だけをUIに反映するバックグラウンド実行"""
+
+    def __init__(self, page):
+        self.page = page
+        self.generation = 0
+        self._lock = threading.Lock()
+
+    def submit(self, work, on_done, on_error=None):
+        """work(token) をワーカースレッドで実行し、最新のままなら on_done(result) を呼ぶ
+
+        それまでに投げた処理はキャンセル扱いになる。
+        """
+        with self._lock:
+            self.generation += 1
+            token = CancelToken(self, self.generation)
+        self.page.run_thread(self._run, token, work, on_done, on_error)
+        return token
+
+    def cancel(self):
+        """実行中の処理の結果をすべて捨てる"""
+        with self._lock:
+            self.generation += 1
+
+    def _run(self, token, work, on_done, on_error):
+        try:
+            result = work(token)
+        except Exception as e:
+            if token.cancelled:
+                return
+            if on_error is not None:
+                on_error(e)
+            else:
+                print(f"バックグラウンド処理エラー: {e}")
+            return
+
+        if token.cancelled:
+            # ユーザーが別の地域を選んだなど、古くなった結果は捨てる
+            return
+        on_done(result)
+
+
+class UIMetrics:
+    """ハンドラのレイテンシと初回描画までの時間を記録"""
+
+    def __init__(self, verbose=True):
+        self.verbose = verbose
+        self.handler_ms = []
+        self.first_paint_ms = []
+        self.update_ms = []
+        self.controls_sent = []
+
+    @staticmethod
+    def start():
+        """計測開始時刻"""
+        return time.perf_counter()
+
+    def handler_done(self, name, started):
+        """イベントハンドラから戻るまでの時間を記録"""
+        elapsed = (time.perf_counter() - started) * 1000
+        self.handler_ms.append(elapsed)
+        if self.verbose:
+            print(f"[metrics] {name}: ハンドラ {elapsed:.1f}ms")
+
+    def painted(self, name, started):
+        """操作から結果を描画するまでの時間を記録"""
+        elapsed = (time.perf_counter() - started) * 1000
+        self.first_paint_ms.append(elapsed)
+        if self.verbose:
+            print(f"[metrics] {name}: 初回描画 {elapsed:.1f}ms")
+
+    def rendered(self, name, stats, started):
+        """差分描画の結果（KeyedList.render の統計）と、update() までの時間を記録"""
+        elapsed = (time.perf_counter() - started) * 1000
+        self.update_ms.append(elapsed)
+        self.controls_sent.append(stats["controls_sent"])
+        if self.verbose:
+            print(f"[metrics] {name}: 更新 {elapsed:.1f}ms  作成 {stats['built']}件"
+                  f"  書き換え {stats['updated']}件  再利用 {stats['reused']}件"
+                  f"（送信コントロール {stats['controls_sent']}個）"
+                  f"  未作成 {stats['deferred']}件")
+
+    def cache_stats(self, name, stats):
+        """キャッシュのヒット率を表示"""
+        if self.verbose:
+            print(f"[metrics] {name}: ヒット率 {stats['hit_rate']:.0%}"
+                  f"（ヒット {stats['hits']} / ミス {stats['misses']}, {stats['entries']}件保持）")
+
+    def summary(self):
+        """中央値と最大値"""
+        def describe(values):
+            if not values:
+                return {"count": 0}
+            ordered = sorted(values)
+            return {
+                "count": len(ordered),
+                "p50_ms": ordered[len(ordered) // 2],
+                "max_ms": ordered[-1],
+            }
+
+        return {
+            "handler": describe(self.handler_ms),
+            "first_paint": describe(self.first_paint_ms),
+            "update": describe(self.update_ms),
+            "controls_sent": sum(self.controls_sent),
+        }